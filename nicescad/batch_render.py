@@ -0,0 +1,461 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+render whole directory trees of OpenSCAD and BlockSCAD files
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from nicescad.blockscad_converter import BlockscadConversion, BlockscadConverter
+from nicescad.dependencies import DependencyGraph
+from nicescad.openscad import OpenScad
+from nicescad.render_scheduler import RenderScheduler
+from nicescad.scad_parser import Block, IfStatement, Instantiation, ScadParser
+
+
+@dataclass
+class BatchRenderResult:
+    """
+    the outcome of rendering a single input file
+
+    Attributes:
+        input_path (str): the OpenSCAD or BlockSCAD input file
+        output_path (str): the rendered file
+        status (str): rendered, cached, skipped or failed
+        seconds (float): the time it took
+        error (str): the error message of a failed render
+        mesh_stats (dict): the mesh statistics of a rendered stl file
+    """
+
+    RENDERED = "rendered"
+    CACHED = "cached"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    input_path: str
+    output_path: str
+    status: str
+    seconds: float = 0.0
+    error: Optional[str] = None
+    mesh_stats: Optional[Dict[str, Any]] = None
+
+
+class BatchRenderer:
+    """
+    Renders every .scad (and BlockSCAD .xml) file below a root directory
+    with a bounded number of parallel openscad processes.
+
+    The directory structure is mirrored in the output directory. The
+    include/use dependency graph and the fingerprints of the rendered
+    inputs are kept in the output directory so that only inputs whose
+    transitive dependencies changed are rendered again. Files that are
+    included by other inputs, or used by them without having top level
+    geometry of their own, are libraries and not rendered on their own.
+    A part that an assembly uses is still rendered.
+    """
+
+    # the dependency graph and fingerprints of the last run
+    STATE_FILE = ".nicescad_deps.json"
+
+    def __init__(
+        self,
+        oscad: OpenScad,
+        root_path: str,
+        output_dir: str,
+        export_format: str = "stl",
+        workers: int = None,
+        force: bool = False,
+        blockscad: bool = True,
+    ):
+        """
+        constructor
+
+        Args:
+            oscad (OpenScad): the OpenSCAD wrapper to render with
+            root_path (str): the directory to search for input files
+            output_dir (str): the directory to write the results to
+            export_format (str): the output format given as file suffix e.g. stl, 3mf or off
+            workers (int): the number of parallel renders - defaults to the number of cpus
+            force (bool): render even if the output is up to date
+            blockscad (bool): convert and render BlockSCAD .xml files as well
+        """
+        self.oscad = oscad
+        self.root_path = os.path.abspath(root_path)
+        self.output_dir = os.path.abspath(output_dir)
+        self.export_format = export_format.lstrip(".")
+        self.scheduler = RenderScheduler(max_workers=workers)
+        self.force = force
+        self.blockscad = blockscad
+        # created on first use - one converter so that its model client and cache are reused
+        self.blockscad_converter: Optional[BlockscadConverter] = None
+        # the BlockSCAD conversions of the current run by input file
+        self.conversions: Dict[str, BlockscadConversion] = {}
+        self.graph = oscad.dependency_graph
+        self.state_path = os.path.join(self.output_dir, BatchRenderer.STATE_FILE)
+        # the fingerprints of the inputs at the time of their last successful render
+        self.fingerprints: Dict[str, str] = {}
+        self.state_loaded = False
+        # the input files left out as libraries with the reason
+        self.libraries: Dict[str, str] = {}
+
+    def find_inputs(self) -> List[str]:
+        """
+        find the input files below my root path - without the libraries
+        of other input files
+
+        Returns:
+            List[str]: the sorted paths of the input files
+        """
+        suffixes = {".scad"}
+        if self.blockscad:
+            suffixes.add(".xml")
+        inputs = [
+            str(path)
+            for path in Path(self.root_path).rglob("*")
+            if path.suffix in suffixes and path.is_file()
+            # do not pick up results of an earlier batch in a nested output directory
+            and not str(path).startswith(self.output_dir + os.sep)
+        ]
+        self.libraries = {}
+        used = {}
+        for input_path in inputs:
+            if not input_path.endswith(".scad"):
+                continue
+            for kind, dep_path in self.direct_dependencies(input_path):
+                rel_path = os.path.relpath(input_path, self.root_path)
+                if kind == "include":
+                    # the geometry of an included file is part of the including design
+                    self.libraries[dep_path] = f"included by {rel_path}"
+                elif kind == "use":
+                    used.setdefault(dep_path, f"used by {rel_path}")
+        for dep_path, reason in used.items():
+            if dep_path not in self.libraries and not self.has_geometry(dep_path):
+                self.libraries[dep_path] = f"{reason} without top level geometry"
+        # libraries outside of the root e.g. MCAD are no inputs in the first place
+        self.libraries = {
+            path: reason for path, reason in self.libraries.items() if path in inputs
+        }
+        inputs = sorted(set(inputs) - set(self.libraries))
+        return inputs
+
+    def direct_dependencies(self, scad_path: str) -> List[Tuple[str, str]]:
+        """
+        get the include/use dependencies of the given file
+
+        Args:
+            scad_path (str): the OpenSCAD file
+
+        Returns:
+            List[Tuple[str, str]]: the kind and resolved absolute path of each dependency
+        """
+        try:
+            with open(scad_path, "r") as scad_file:
+                source = scad_file.read()
+        except (OSError, UnicodeDecodeError):
+            return []
+        base_dir = os.path.dirname(scad_path)
+        dependencies = []
+        for kind, name in DependencyGraph.parse_dependencies(source):
+            if kind in ("include", "use"):
+                dep_path = self.graph.resolve(kind, name, base_dir)
+                if dep_path is not None:
+                    dependencies.append((kind, dep_path))
+        return dependencies
+
+    def has_geometry(self, scad_path: str) -> bool:
+        """
+        check whether the given file instantiates anything at the top level
+        or only defines modules, functions and variables
+
+        Args:
+            scad_path (str): the OpenSCAD file
+
+        Returns:
+            bool: True if rendering the file on its own makes sense
+        """
+        try:
+            with open(scad_path, "r") as scad_file:
+                source = scad_file.read()
+        except (OSError, UnicodeDecodeError):
+            return True
+        statements = ScadParser().parse(source).statements
+        has_geometry = any(
+            isinstance(statement, (Instantiation, IfStatement, Block))
+            for statement in statements
+        )
+        return has_geometry
+
+    def changed_inputs(self, changed_paths: List[str]) -> List[str]:
+        """
+        get the input files affected by changes of the given files
+
+        Args:
+            changed_paths (List[str]): the changed, added or removed files e.g. a library
+
+        Returns:
+            List[str]: the sorted paths of the input files to render again
+        """
+        inputs = sorted(self.graph.dependents(changed_paths, self.find_inputs()))
+        return inputs
+
+    def load_state(self):
+        """
+        load the dependency graph and fingerprints of the last run (if any)
+        """
+        self.state_loaded = True
+        if os.path.isfile(self.state_path):
+            try:
+                with open(self.state_path) as json_file:
+                    state = json.load(json_file)
+                self.graph.load_dict(state.get("graph", {}))
+                self.fingerprints = state.get("fingerprints", {})
+            except (OSError, ValueError, TypeError):
+                # a damaged state only costs a full render
+                self.fingerprints = {}
+
+    def save_state(self):
+        """
+        save the dependency graph and fingerprints for the next run
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        state = {"graph": self.graph.to_dict(), "fingerprints": self.fingerprints}
+        with open(self.state_path, "w") as json_file:
+            json.dump(state, json_file)
+
+    def output_path_for(self, input_path: str, suffix: str = None) -> str:
+        """
+        get the output path for the given input path
+
+        Args:
+            input_path (str): the input file
+            suffix (str): the suffix of the output file - defaults to the export format
+
+        Returns:
+            str: the path of the output file in the mirrored directory structure
+        """
+        if suffix is None:
+            suffix = f".{self.export_format}"
+        rel_path = os.path.relpath(input_path, self.root_path)
+        output_path = os.path.join(
+            self.output_dir, os.path.splitext(rel_path)[0] + suffix
+        )
+        return output_path
+
+    def is_up_to_date(self, input_path: str, output_path: str) -> bool:
+        """
+        check whether neither the given input nor any of its dependencies
+        changed since the given output was rendered
+
+        Args:
+            input_path (str): the input file
+            output_path (str): the output file
+
+        Returns:
+            bool: True if the output does not need to be rendered again
+        """
+        if self.force or not os.path.isfile(output_path):
+            return False
+        fingerprint = self.fingerprints.get(input_path)
+        if fingerprint is not None:
+            return fingerprint == self.graph.fingerprint(input_path)
+        # no record of an earlier run - compare with the newest input
+        up_to_date = os.path.getmtime(output_path) >= self.graph.mtime(input_path)
+        return up_to_date
+
+    async def convert_blockscad_async(self, xml_paths: List[str]):
+        """
+        convert the given BlockSCAD files to OpenSCAD files next to their outputs -
+        as one batch so that the requests to the model are bounded and identical
+        documents are only sent once
+
+        Args:
+            xml_paths (List[str]): the BlockSCAD files
+        """
+        if not xml_paths:
+            return
+        if self.blockscad_converter is None:
+            self.blockscad_converter = BlockscadConverter()
+        scad_paths = []
+        for xml_path in xml_paths:
+            scad_path = self.output_path_for(xml_path, ".scad")
+            os.makedirs(os.path.dirname(scad_path), exist_ok=True)
+            scad_paths.append(scad_path)
+        conversions = await self.blockscad_converter.convert_batch_async(
+            xml_paths, scad_paths=scad_paths
+        )
+        for conversion in conversions:
+            self.conversions[conversion.xml_path] = conversion
+
+    async def render_one(self, input_path: str) -> BatchRenderResult:
+        """
+        render the given input file
+
+        Args:
+            input_path (str): the OpenSCAD or BlockSCAD file
+
+        Returns:
+            BatchRenderResult: the outcome
+        """
+        start = time.time()
+        output_path = self.output_path_for(input_path)
+        result = BatchRenderResult(input_path, output_path, BatchRenderResult.FAILED)
+        if await asyncio.to_thread(self.is_up_to_date, input_path, output_path):
+            result.status = BatchRenderResult.SKIPPED
+            return result
+        self.fingerprints.pop(input_path, None)
+        try:
+            # taken before the render so that changes during the render are not missed
+            fingerprint = await asyncio.to_thread(self.graph.fingerprint, input_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            scad_path = input_path
+            if input_path.endswith(".xml"):
+                if input_path not in self.conversions:
+                    await self.convert_blockscad_async([input_path])
+                conversion = self.conversions.pop(input_path)
+                if conversion.error is not None:
+                    result.error = conversion.error
+                    result.seconds = time.time() - start
+                    return result
+                scad_path = conversion.scad_path
+            with open(scad_path, "r") as scad_file:
+                openscad_str = scad_file.read()
+            render_result = await self.oscad.openscad_str_to_file(
+                openscad_str, output_path, source_path=scad_path
+            )
+            if render_result.returncode == 0:
+                cache_hit = getattr(render_result, "cache_hit", False)
+                result.status = (
+                    BatchRenderResult.CACHED
+                    if cache_hit
+                    else BatchRenderResult.RENDERED
+                )
+                mesh_stats = getattr(render_result, "mesh_stats", None)
+                if mesh_stats is not None:
+                    result.mesh_stats = mesh_stats.to_dict()
+                self.fingerprints[input_path] = fingerprint
+            else:
+                result.error = render_result.kill_reason or render_result.stderr.strip()
+        except Exception as ex:
+            result.error = f"{type(ex).__name__}: {ex}"
+        result.seconds = time.time() - start
+        return result
+
+    async def render_all_async(
+        self,
+        on_result: Callable[[BatchRenderResult], None] = None,
+        inputs: List[str] = None,
+    ) -> List[BatchRenderResult]:
+        """
+        render all input files in parallel
+
+        Args:
+            on_result (Callable): optional callback for each finished input
+            inputs (List[str]): the input files to render - defaults to all input files
+
+        Returns:
+            List[BatchRenderResult]: the outcomes in input order
+        """
+
+        async def render(input_path: str) -> BatchRenderResult:
+            result = await self.scheduler.run(
+                "batch", lambda: self.render_one(input_path)
+            )
+            if on_result:
+                on_result(result)
+            return result
+
+        if not self.state_loaded:
+            self.load_state()
+        if inputs is None:
+            inputs = await asyncio.to_thread(self.find_inputs)
+        # all inputs are queued at once
+        self.scheduler.max_queue_depth = max(len(inputs), 1)
+        try:
+            xml_paths = []
+            for input_path in inputs:
+                if input_path.endswith(".xml"):
+                    output_path = self.output_path_for(input_path)
+                    if not await asyncio.to_thread(
+                        self.is_up_to_date, input_path, output_path
+                    ):
+                        xml_paths.append(input_path)
+            await self.convert_blockscad_async(xml_paths)
+            results = await asyncio.gather(
+                *[render(input_path) for input_path in inputs]
+            )
+        finally:
+            self.save_state()
+        return list(results)
+
+    def summary(
+        self, results: List[BatchRenderResult], seconds: float
+    ) -> Dict[str, Any]:
+        """
+        get a machine readable summary of the given results
+
+        Args:
+            results (List[BatchRenderResult]): the outcomes
+            seconds (float): the total wall clock time
+
+        Returns:
+            Dict[str, Any]: counts by status, timings, the individual outcomes and
+                the files left out as libraries
+        """
+        counts = {
+            status: sum(1 for result in results if result.status == status)
+            for status in [
+                BatchRenderResult.RENDERED,
+                BatchRenderResult.CACHED,
+                BatchRenderResult.SKIPPED,
+                BatchRenderResult.FAILED,
+            ]
+        }
+        summary = {
+            "root_path": self.root_path,
+            "output_dir": self.output_dir,
+            "format": self.export_format,
+            "workers": self.scheduler.max_workers,
+            "total": len(results),
+            **counts,
+            "seconds": seconds,
+            "render_seconds": sum(result.seconds for result in results),
+            "results": [asdict(result) for result in results],
+            "libraries": [
+                {"input_path": path, "reason": reason}
+                for path, reason in sorted(self.libraries.items())
+            ],
+        }
+        return summary
+
+    def run(
+        self,
+        summary_path: str = None,
+        on_result: Callable[[BatchRenderResult], None] = None,
+    ) -> Dict[str, Any]:
+        """
+        render all input files and write the summary
+
+        Args:
+            summary_path (str): where to write the json summary - defaults to summary.json in the output directory
+            on_result (Callable): optional callback for each finished input
+
+        Returns:
+            Dict[str, Any]: the summary
+        """
+        start = time.time()
+        results = asyncio.run(self.render_all_async(on_result))
+        summary = self.summary(results, time.time() - start)
+        if summary_path is None:
+            summary_path = os.path.join(self.output_dir, "summary.json")
+        os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+        with open(summary_path, "w") as json_file:
+            json.dump(summary, json_file, indent=2)
+        return summary
@@ -0,0 +1,536 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+deterministic compiler from BlockSCAD XML to OpenSCAD code
+"""
+
+import io
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+# the precedence of generated expressions - higher binds tighter
+ATOM = 10
+UNARY = 8
+
+
+class BlockscadCompileError(Exception):
+    """
+    raised when a document is not a BlockSCAD XML document or is broken
+    """
+
+
+class UnsupportedBlockError(BlockscadCompileError):
+    """
+    raised for a block type the compiler does not know
+
+    Attributes:
+        block_type (str): the type of the block
+    """
+
+    def __init__(self, block_type: str):
+        super().__init__(f"unsupported BlockSCAD block type {block_type}")
+        self.block_type = block_type
+
+
+def local_name(tag: str) -> str:
+    """
+    get the tag name without the namespace
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+class BlockscadCompiler:
+    """
+    Compiles BlockSCAD XML (https://www.blockscad3d.com/editor/) to OpenSCAD
+    code without any network access - the same document always gives the
+    same code.
+
+    The document is read with a streaming parser and each top level block
+    is compiled and released as soon as it has been read. Documents with
+    block types the compiler does not know raise an UnsupportedBlockError.
+    """
+
+    # increase when the generated code changes e.g. to invalidate cached results
+    VERSION = 1
+
+    HEADER = [
+        "// OpenSCAD",
+        "// converted from BlockSCAD XML by nicescad's blockscad converter",
+        "// according to",
+        "// https://github.com/WolfgangFahl/nicescad/issues/23",
+        "// support reading and converting blockscad files #23",
+    ]
+
+    # operator, precedence and operand precedences of math_arithmetic etc.
+    BINARY_OPERATORS = {
+        "ADD": ("+", 6),
+        "MINUS": ("-", 6),
+        "MULTIPLY": ("*", 7),
+        "DIVIDE": ("/", 7),
+        "EQ": ("==", 4),
+        "NEQ": ("!=", 4),
+        "LT": ("<", 5),
+        "LTE": ("<=", 5),
+        "GT": (">", 5),
+        "GTE": (">=", 5),
+        "AND": ("&&", 3),
+        "OR": ("||", 2),
+    }
+
+    # math_single and math_trig functions
+    FUNCTIONS = {
+        "ROOT": "sqrt",
+        "ABS": "abs",
+        "LN": "ln",
+        "LOG10": "log",
+        "EXP": "exp",
+        "SIN": "sin",
+        "COS": "cos",
+        "TAN": "tan",
+        "ASIN": "asin",
+        "ACOS": "acos",
+        "ATAN": "atan",
+    }
+
+    # the statements with the children of the set operations
+    SET_OPERATIONS = {
+        "union": "PLUS",
+        "difference": "MINUS",
+        "intersection": "WITH",
+        "hull": "WITH",
+    }
+
+    def __init__(self, indent: str = "  "):
+        """
+        constructor
+
+        Args:
+            indent (str): the indentation of nested statements
+        """
+        self.indent = indent
+        self.statement_compilers: Dict[str, Callable[[ET.Element], List[str]]] = {
+            "sphere": self.sphere,
+            "cube": self.cube,
+            "cylinder": self.cylinder,
+            "circle": self.circle,
+            "square": self.square,
+            "translate": self.translate,
+            "simplerotate": self.simplerotate,
+            "fancyrotate": self.fancyrotate,
+            "scale": self.scale,
+            "fancymirror": self.fancymirror,
+            "color": self.color,
+            "union": self.set_operation,
+            "difference": self.set_operation,
+            "intersection": self.set_operation,
+            "hull": self.set_operation,
+            "controls_for": self.controls_for,
+            "controls_if": self.controls_if,
+            "variables_set": self.variables_set,
+            "procedures_defnoreturn": self.procedures_defnoreturn,
+            "procedures_defreturn": self.procedures_defreturn,
+            "procedures_callnoreturn": self.procedures_callnoreturn,
+        }
+        self.expression_compilers: Dict[
+            str, Callable[[ET.Element], Tuple[str, int]]
+        ] = {
+            "math_number": self.math_number,
+            "math_angle": self.math_number,
+            "variables_get": self.variables_get,
+            "math_arithmetic": self.binary,
+            "logic_compare": self.binary,
+            "logic_operation": self.binary,
+            "math_single": self.math_single,
+            "math_trig": self.math_single,
+            "math_constant": self.math_constant,
+            "math_modulo": self.math_modulo,
+            "logic_boolean": self.logic_boolean,
+            "logic_negate": self.logic_negate,
+            "logic_ternary": self.logic_ternary,
+            "procedures_callreturn": self.procedures_callreturn,
+        }
+
+    def compile_file(self, xml_path: str) -> str:
+        """
+        compile the given BlockSCAD XML file
+
+        Args:
+            xml_path (str): the path of the file
+
+        Returns:
+            str: the OpenSCAD code
+        """
+        with open(xml_path, "rb") as xml_file:
+            scad_code = self.compile_stream(xml_file)
+        return scad_code
+
+    def compile_string(self, xml_content: str) -> str:
+        """
+        compile the given BlockSCAD XML
+        """
+        return self.compile_stream(io.BytesIO(xml_content.encode("utf-8")))
+
+    def compile_stream(self, source: BinaryIO) -> str:
+        """
+        compile the BlockSCAD XML read from the given stream
+
+        Args:
+            source (BinaryIO): the XML document
+
+        Returns:
+            str: the OpenSCAD code
+
+        Raises:
+            BlockscadCompileError: if the document is not a BlockSCAD XML document
+            UnsupportedBlockError: if the document has a block type that is not supported
+        """
+        lines = list(BlockscadCompiler.HEADER)
+        root = None
+        depth = 0
+        try:
+            for event, element in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = element
+                        if not root.tag.startswith("{https://blockscad3d.com"):
+                            raise BlockscadCompileError("not a BlockSCAD XML document")
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1 and local_name(element.tag) == "block":
+                    if element.get("disabled") != "true":
+                        lines.extend(self.statements(element))
+                    # the block has been compiled
+                    root.clear()
+        except ET.ParseError as ex:
+            raise BlockscadCompileError(f"invalid XML: {ex}")
+        scad_code = "\n".join(lines) + "\n"
+        return scad_code
+
+    def child(
+        self, element: ET.Element, tag: str, name: str = None
+    ) -> Optional[ET.Element]:
+        """
+        get the first child with the given tag and name attribute
+        """
+        for child in element:
+            if local_name(child.tag) == tag and (
+                name is None or child.get("name") == name
+            ):
+                return child
+        return None
+
+    def field(self, block: ET.Element, name: str, default: str = None) -> str:
+        """
+        get the text of the given field of the given block
+        """
+        field = self.child(block, "field", name)
+        if field is None or field.text is None:
+            if default is None:
+                raise BlockscadCompileError(
+                    f"{block.get('type')} block without {name} field"
+                )
+            return default
+        return field.text.strip()
+
+    def chain(self, block: Optional[ET.Element]) -> Iterator[ET.Element]:
+        """
+        get the given block and the blocks following it
+        """
+        while block is not None:
+            if block.get("disabled") != "true":
+                yield block
+            next_element = self.child(block, "next")
+            block = None if next_element is None else self.child(next_element, "block")
+
+    def statements(self, block: Optional[ET.Element]) -> List[str]:
+        """
+        compile the given block and the blocks following it
+        """
+        lines = []
+        for chained in self.chain(block):
+            block_type = chained.get("type")
+            compiler = self.statement_compilers.get(block_type)
+            if compiler is None:
+                raise UnsupportedBlockError(block_type)
+            lines.extend(compiler(chained))
+        return lines
+
+    def statement_blocks(self, block: ET.Element, name: str) -> List[ET.Element]:
+        """
+        get the blocks of the given statement input of the given block
+        """
+        statement = self.child(block, "statement", name)
+        if statement is None:
+            return []
+        return list(self.chain(self.child(statement, "block")))
+
+    def indented(self, lines: List[str]) -> List[str]:
+        return [f"{self.indent}{line}" for line in lines]
+
+    def with_children(self, head: str, lines: List[str]) -> List[str]:
+        """
+        wrap the given child statements
+        """
+        return [f"{head} {{", *self.indented(lines), "}"]
+
+    def value_expr(self, block: ET.Element, name: str, precedence: int = 0) -> str:
+        """
+        compile the given value input of the given block
+
+        Args:
+            block (ET.Element): the block
+            name (str): the name of the value input
+            precedence (int): the precedence of the surrounding expression - the
+                expression is parenthesized if it binds less tightly
+
+        Returns:
+            str: the expression
+        """
+        value = self.child(block, "value", name)
+        # a block plugged into the input replaces its shadow
+        inner = None
+        if value is not None:
+            inner = self.child(value, "block")
+            if inner is None or inner.get("disabled") == "true":
+                inner = self.child(value, "shadow")
+        if inner is None:
+            return "undef"
+        block_type = inner.get("type")
+        compiler = self.expression_compilers.get(block_type)
+        if compiler is None:
+            raise UnsupportedBlockError(block_type)
+        expr, expr_precedence = compiler(inner)
+        if expr_precedence < precedence:
+            expr = f"({expr})"
+        return expr
+
+    def center(self, block: ET.Element) -> str:
+        return self.field(block, "CENTERDROPDOWN", "false").lower()
+
+    def sphere(self, block: ET.Element) -> List[str]:
+        return [f"sphere(r = {self.value_expr(block, 'RAD')});"]
+
+    def cube(self, block: ET.Element) -> List[str]:
+        size = ", ".join(
+            self.value_expr(block, name) for name in ("XVAL", "YVAL", "ZVAL")
+        )
+        return [f"cube([{size}], center = {self.center(block)});"]
+
+    def cylinder(self, block: ET.Element) -> List[str]:
+        r1 = self.value_expr(block, "RAD1")
+        r2 = self.value_expr(block, "RAD2")
+        height = self.value_expr(block, "HEIGHT")
+        return [
+            f"cylinder(r1 = {r1}, r2 = {r2}, h = {height}, center = {self.center(block)});"
+        ]
+
+    def circle(self, block: ET.Element) -> List[str]:
+        return [f"circle(r = {self.value_expr(block, 'RAD')});"]
+
+    def square(self, block: ET.Element) -> List[str]:
+        size = ", ".join(self.value_expr(block, name) for name in ("XVAL", "YVAL"))
+        return [f"square([{size}], center = {self.center(block)});"]
+
+    def vector(self, block: ET.Element) -> str:
+        coordinates = [
+            self.value_expr(block, name) for name in ("XVAL", "YVAL", "ZVAL")
+        ]
+        return f"[{', '.join(coordinates)}]"
+
+    def transform(self, head: str, block: ET.Element) -> List[str]:
+        lines = []
+        for child in self.statement_blocks(block, "A"):
+            lines.extend(self.statements_of(child))
+        return self.with_children(head, lines)
+
+    def statements_of(self, block: ET.Element) -> List[str]:
+        """
+        compile the given block only - without the blocks following it
+        """
+        block_type = block.get("type")
+        compiler = self.statement_compilers.get(block_type)
+        if compiler is None:
+            raise UnsupportedBlockError(block_type)
+        return compiler(block)
+
+    def translate(self, block: ET.Element) -> List[str]:
+        return self.transform(f"translate({self.vector(block)})", block)
+
+    def simplerotate(self, block: ET.Element) -> List[str]:
+        return self.transform(f"rotate({self.vector(block)})", block)
+
+    def fancyrotate(self, block: ET.Element) -> List[str]:
+        angle = self.value_expr(block, "AVAL")
+        return self.transform(f"rotate(a = {angle}, v = {self.vector(block)})", block)
+
+    def scale(self, block: ET.Element) -> List[str]:
+        return self.transform(f"scale({self.vector(block)})", block)
+
+    def fancymirror(self, block: ET.Element) -> List[str]:
+        return self.transform(f"mirror({self.vector(block)})", block)
+
+    def color(self, block: ET.Element) -> List[str]:
+        hex_color = self.field(block, "COLOR").lstrip("#")
+        if len(hex_color) != 6:
+            raise BlockscadCompileError(f"invalid color #{hex_color}")
+        rgb = [int(hex_color[i : i + 2], 16) / 255 for i in (0, 2, 4)]
+        components = ", ".join(f"{round(component, 3):g}" for component in rgb)
+        return self.transform(f"color([{components}])", block)
+
+    def set_operation(self, block: ET.Element) -> List[str]:
+        """
+        compile a union, difference, intersection or hull - the first
+        child is the A statement, the others follow in document order
+        """
+        block_type = block.get("type")
+        prefix = BlockscadCompiler.SET_OPERATIONS[block_type]
+        lines = []
+        for statement in block:
+            name = statement.get("name") or ""
+            if local_name(statement.tag) != "statement":
+                continue
+            if name != "A" and not name.startswith(prefix):
+                continue
+            blocks = list(self.chain(self.child(statement, "block")))
+            child_lines = []
+            for child in blocks:
+                child_lines.extend(self.statements_of(child))
+            if len(blocks) > 1 and block_type in ("difference", "intersection"):
+                # several objects in one input act as one operand
+                child_lines = self.with_children("union()", child_lines)
+            lines.extend(child_lines)
+        return self.with_children(f"{block_type}()", lines)
+
+    def controls_for(self, block: ET.Element) -> List[str]:
+        if self.field(block, "HULL", "FALSE").upper() == "TRUE":
+            # chained hulls have no direct OpenSCAD counterpart
+            raise UnsupportedBlockError("controls_for with hull")
+        var = self.field(block, "VAR")
+        start = self.value_expr(block, "FROM")
+        step = self.value_expr(block, "BY")
+        end = self.value_expr(block, "TO")
+        loop_range = (
+            f"[{start} : {end}]" if step == "1" else f"[{start} : {step} : {end}]"
+        )
+        lines = []
+        for child in self.statement_blocks(block, "DO"):
+            lines.extend(self.statements_of(child))
+        return self.with_children(f"for ({var} = {loop_range})", lines)
+
+    def controls_if(self, block: ET.Element) -> List[str]:
+        mutation = self.child(block, "mutation")
+        elseifs = int(mutation.get("elseif", "0")) if mutation is not None else 0
+        has_else = mutation is not None and mutation.get("else") == "1"
+        lines = []
+        for i in range(elseifs + 1):
+            condition = self.value_expr(block, f"IF{i}")
+            body = []
+            for child in self.statement_blocks(block, f"DO{i}"):
+                body.extend(self.statements_of(child))
+            keyword = "if" if i == 0 else "} else if"
+            lines.append(f"{keyword} ({condition}) {{")
+            lines.extend(self.indented(body))
+        if has_else:
+            body = []
+            for child in self.statement_blocks(block, "ELSE"):
+                body.extend(self.statements_of(child))
+            lines.append("} else {")
+            lines.extend(self.indented(body))
+        lines.append("}")
+        return lines
+
+    def variables_set(self, block: ET.Element) -> List[str]:
+        return [f"{self.field(block, 'VAR')} = {self.value_expr(block, 'VALUE')};"]
+
+    def params(self, block: ET.Element) -> str:
+        mutation = self.child(block, "mutation")
+        if mutation is None:
+            return ""
+        names = [arg.get("name") for arg in mutation if local_name(arg.tag) == "arg"]
+        return ", ".join(names)
+
+    def procedures_defnoreturn(self, block: ET.Element) -> List[str]:
+        lines = []
+        for child in self.statement_blocks(block, "STACK"):
+            lines.extend(self.statements_of(child))
+        name = self.field(block, "NAME")
+        return self.with_children(f"module {name}({self.params(block)})", lines)
+
+    def procedures_defreturn(self, block: ET.Element) -> List[str]:
+        name = self.field(block, "NAME")
+        expr = self.value_expr(block, "RETURN")
+        return [f"function {name}({self.params(block)}) = {expr};"]
+
+    def call(self, block: ET.Element) -> str:
+        mutation = self.child(block, "mutation")
+        if mutation is None or not mutation.get("name"):
+            raise BlockscadCompileError(f"{block.get('type')} block without name")
+        arg_count = len([arg for arg in mutation if local_name(arg.tag) == "arg"])
+        args = ", ".join(self.value_expr(block, f"ARG{i}") for i in range(arg_count))
+        return f"{mutation.get('name')}({args})"
+
+    def procedures_callnoreturn(self, block: ET.Element) -> List[str]:
+        return [f"{self.call(block)};"]
+
+    def procedures_callreturn(self, block: ET.Element) -> Tuple[str, int]:
+        return self.call(block), ATOM
+
+    def math_number(self, block: ET.Element) -> Tuple[str, int]:
+        number = self.field(block, "NUM", "0")
+        precedence = UNARY if number.startswith("-") else ATOM
+        return number, precedence
+
+    def variables_get(self, block: ET.Element) -> Tuple[str, int]:
+        return self.field(block, "VAR"), ATOM
+
+    def binary(self, block: ET.Element) -> Tuple[str, int]:
+        op = self.field(block, "OP")
+        if op == "POWER":
+            return (
+                f"pow({self.value_expr(block, 'A')}, {self.value_expr(block, 'B')})",
+                ATOM,
+            )
+        if op not in BlockscadCompiler.BINARY_OPERATORS:
+            raise UnsupportedBlockError(f"{block.get('type')} {op}")
+        operator, precedence = BlockscadCompiler.BINARY_OPERATORS[op]
+        # the right operand needs parentheses at the same precedence e.g. a - (b - c)
+        left = self.value_expr(block, "A", precedence)
+        right = self.value_expr(block, "B", precedence + 1)
+        return f"{left} {operator} {right}", precedence
+
+    def math_single(self, block: ET.Element) -> Tuple[str, int]:
+        op = self.field(block, "OP")
+        if op == "NEG":
+            return f"-{self.value_expr(block, 'NUM', UNARY)}", UNARY
+        arg = self.value_expr(block, "NUM")
+        if op == "POW10":
+            return f"pow(10, {arg})", ATOM
+        if op not in BlockscadCompiler.FUNCTIONS:
+            raise UnsupportedBlockError(f"{block.get('type')} {op}")
+        return f"{BlockscadCompiler.FUNCTIONS[op]}({arg})", ATOM
+
+    def math_constant(self, block: ET.Element) -> Tuple[str, int]:
+        constant = self.field(block, "CONSTANT")
+        if constant != "PI":
+            raise UnsupportedBlockError(f"math_constant {constant}")
+        return "PI", ATOM
+
+    def math_modulo(self, block: ET.Element) -> Tuple[str, int]:
+        dividend = self.value_expr(block, "DIVIDEND", 7)
+        divisor = self.value_expr(block, "DIVISOR", 8)
+        return f"{dividend} % {divisor}", 7
+
+    def logic_boolean(self, block: ET.Element) -> Tuple[str, int]:
+        return self.field(block, "BOOL").lower(), ATOM
+
+    def logic_negate(self, block: ET.Element) -> Tuple[str, int]:
+        return f"!{self.value_expr(block, 'BOOL', UNARY)}", UNARY
+
+    def logic_ternary(self, block: ET.Element) -> Tuple[str, int]:
+        condition = self.value_expr(block, "IF", 2)
+        then_expr = self.value_expr(block, "THEN", 1)
+        else_expr = self.value_expr(block, "ELSE", 1)
+        return f"{condition} ? {then_expr} : {else_expr}", 1
@@ -22,14 +22,50 @@ The code was created by the OpenAI ChatGPT model in response to the following pr
 - "keep the prompt list in the comments to be able to reproduce the results."
 - "If the OpenAI API key is not available in the environment variables, look for it in a JSON file at `~/.openai/openai_api_key.json`."
 - "If the OpenAI API key is not found, throw an exception."
+
+Since 2026-10-17 the XML is compiled locally by the BlockscadCompiler and the language
+model is only a cached fallback for blocks the compiler does not support.
 """
 
+import asyncio
 import json
 import os
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Union
+from typing import List, Optional, Tuple, Union
+
+from openai import AsyncOpenAI, OpenAI
 
-import openai
+from nicescad.blockscad_compiler import (
+    BlockscadCompileError,
+    BlockscadCompiler,
+    UnsupportedBlockError,
+)
+from nicescad.lru_cache import LruCache
+from nicescad.render_cache import RenderCache
+
+
+@dataclass
+class BlockscadConversion:
+    """
+    the outcome of converting a BlockSCAD XML file in a batch
+
+    Attributes
+    ----------
+    xml_path : str
+        the BlockSCAD XML file
+    scad_path : str
+        the SCAD file - None if the conversion failed
+    source : str
+        compiler, cache or model
+    error : str
+        the error message of a failed conversion
+    """
+
+    xml_path: str
+    scad_path: Optional[str] = None
+    source: Optional[str] = None
+    error: Optional[str] = None
 
 
 class BlockscadConverter:
@@ -43,33 +79,83 @@ class BlockscadConverter:
     -------
     convert_to_scad(scad_path: str) -> Union[str, None]
         Converts the BlockSCAD XML file to a SCAD file and returns the SCAD file path.
+    convert_file(xml_path: str, scad_path: str) -> str
+        Converts the given BlockSCAD XML file to a SCAD file.
+    convert_with_llm(xml_content: str) -> str
+        Converts BlockSCAD XML with the OpenAI language model API - results are cached.
+    convert_batch_async(xml_paths: List[str], scad_dir: str) -> List[BlockscadConversion]
+        Converts many BlockSCAD XML files with a bounded number of model requests in flight.
     """
 
-    def __init__(self, xml_path: str):
+    # increase when the prompt changes - results of older prompts are not reused
+    PROMPT_VERSION = 2
+    DEFAULT_MODEL = "gpt-4o-mini"
+    # the conversions of the language model shared by all converters
+    default_cache: Optional[LruCache] = None
+
+    def __init__(
+        self,
+        xml_path: str = None,
+        base_url: str = None,
+        model: str = None,
+        api_key: str = None,
+        cache: LruCache = None,
+        max_in_flight: int = 4,
+    ):
         """
         Parameters
         ----------
         xml_path : str
             path to the input BlockSCAD XML file
+        base_url : str
+            the OpenAI compatible endpoint e.g. a local stand-in server - default: OPENAI_BASE_URL or api.openai.com
+        model : str
+            the model to use - default: NICESCAD_BLOCKSCAD_MODEL or DEFAULT_MODEL
+        api_key : str
+            the API key - default: OPENAI_API_KEY or ~/.openai/openai_api_key.json
+        cache : LruCache
+            the cache for the model's results - default: kept in ~/.nicescad/cache/blockscad
+        max_in_flight : int
+            the maximum number of concurrent model requests of a batch
         """
         self.xml_path = xml_path
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.model = model or os.getenv(
+            "NICESCAD_BLOCKSCAD_MODEL", BlockscadConverter.DEFAULT_MODEL
+        )
+        self.api_key = api_key
+        if cache is None:
+            cache = BlockscadConverter.get_default_cache()
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        # the clients are created on first use and reused for all requests
+        self.client: Optional[OpenAI] = None
+        self.async_client: Optional[AsyncOpenAI] = None
 
-    def convert_to_scad(self, scad_path: str) -> Union[str, None]:
+    @classmethod
+    def get_default_cache(cls) -> LruCache:
+        """
+        get the cache shared by all converters without an explicit cache
         """
-        Converts the BlockSCAD XML file to a SCAD file using the OpenAI language model API.
+        if cls.default_cache is None:
+            cache_dir = Path.home() / ".nicescad" / "cache" / "blockscad"
+            # the results are not rendered files - keep them for a year
+            disk_cache = RenderCache(str(cache_dir), max_age=365 * 24 * 3600)
+            cls.default_cache = LruCache(
+                capacity=256, disk_cache=disk_cache, suffix=".scad"
+            )
+        return cls.default_cache
 
-        Parameters
-        ----------
-        scad_path : str
-            path to the output SCAD file
+    def get_api_key(self) -> str:
+        """
+        Load the API key from the constructor, the environment or a JSON file.
 
         Returns
         -------
-        Union[str, None]
-            path to the output SCAD file if conversion is successful, None otherwise
+        str
+            the API key - a placeholder for a custom endpoint without key
         """
-        # Load the API key from the environment or a JSON file
-        openai_api_key = os.getenv("OPENAI_API_KEY")
+        openai_api_key = self.api_key or os.getenv("OPENAI_API_KEY")
         json_file = Path.home() / ".openai" / "openai_api_key.json"
 
         if openai_api_key is None and json_file.is_file():
@@ -78,57 +164,125 @@ class BlockscadConverter:
                 openai_api_key = data.get("OPENAI_API_KEY")
 
         if openai_api_key is None:
+            if self.base_url:
+                # e.g. a local stand-in server that does not check keys
+                return "none"
             raise ValueError(
                 "No OpenAI API key found. Please set the 'OPENAI_API_KEY' environment variable or store it in `~/.openai/openai_api_key.json`."
             )
+        return openai_api_key
 
-        openai.api_key = openai_api_key
+    def cache_key(self, xml_content: str) -> str:
+        """
+        get the cache key of the model's result for the given XML
+        """
+        key = RenderCache.compute_key(
+            "blockscad", BlockscadConverter.PROMPT_VERSION, self.model, xml_content
+        )
+        return key
 
-        # Read the XML file
-        with open(self.xml_path, "r") as file:
+    def read_xml(self, xml_path: str) -> str:
+        """
+        read the given BlockSCAD XML file
+        """
+        with open(xml_path, "r", encoding="utf-8-sig") as file:
             xml_content = file.read()
+        return xml_content
 
-        # Check if the XML content is a BlockSCAD XML
-        if '<xml xmlns="https://blockscad3d.com' not in xml_content:
-            msg = f"The file at {self.xml_path} is not a valid BlockSCAD XML file."
-            raise Exception(msg)
-
-        # Use the API to convert the XML to SCAD
-        response = openai.Completion.create(
-            engine="text-davinci-002",
-            prompt=f"""Convert the following BlockSCAD XML to OpenSCAD and make sure to add a preamble comment (verbatim):
-// OpenSCAD 
+    def prompt(self, xml_content: str) -> str:
+        """
+        get the conversion prompt for the given XML
+        """
+        return f"""Convert the following BlockSCAD XML to OpenSCAD and make sure to add a preamble comment (verbatim):
+// OpenSCAD
 // converted from BlockSCAD XML by nicescad's blockscad converter
-// according to 
+// according to
 // https://github.com/WolfgangFahl/nicescad/issues/23
 // support reading and converting blockscad files #23
-//
-make sure to convert as direct as possible e.g. 
-translate,rotate,cylinder,sphere,cube,color which are available in OpenScad should be           
-used as such. 
-Use all parameters e.g. prefer cube(10,10,10,center=true) to cube(10) when the parameters are available in
+make sure to convert as direct as possible e.g.
+translate,rotate,cylinder,sphere,cube,color which are available in OpenScad should be
+used as such.
+Use all parameters e.g. prefer cube([10,10,10],center=true) to cube(10) when the parameters are available in
 the original xml file.
 <field name="CENTERDROPDOWN">false</field> e.g. leads to center=false
-Add the original color command using a color name when applicable e.g. color("green");.
-Try high reproduceability by not making any assumptions and keeping the structure intact. So do not add an initial translate. 
+Try high reproduceability by not making any assumptions and keeping the structure intact. So do not add an initial translate.
 
 Do not add extra empty comments.
 Avoid any empty lines - really - never add whitespace that harms getting always the same result.
-Always use // line comments never /* 
+Always use // line comments never /*
 Always indent with two spaces.
 Make sure commands end with a semicolon.
+Answer with the OpenSCAD code only.
 
 Here is the BlockSCAD XML:\n{xml_content}
-""",
-            temperature=0.5,
-            max_tokens=1000,
-        )
+"""
 
-        scad_content = response.choices[0].text.strip()
+    def request(self, xml_content: str) -> dict:
+        """
+        get the chat completion request for the given XML
+        """
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": self.prompt(xml_content)}],
+            "temperature": 0,
+            "max_tokens": 2000,
+        }
 
-        # A very basic check to see if the SCAD content seems okay
+    def check_result(self, scad_content: str, name: str) -> str:
+        """
+        A very basic check to see if the SCAD content seems okay
+        """
+        scad_content = scad_content.strip()
+        if scad_content.startswith("```"):
+            # a markdown code block
+            scad_content = scad_content.strip("`").split("\n", 1)[-1].strip()
         if not scad_content.startswith("// OpenSCAD"):
-            msg = f"The conversion of {self.xml_path} failed - the // OpenSCAD comment is missing in:\n {scad_content}."
+            msg = f"The conversion of {name} failed - the // OpenSCAD comment is missing in:\n {scad_content}."
+            raise Exception(msg)
+        return scad_content + "\n"
+
+    def convert_to_scad(self, scad_path: str) -> Union[str, None]:
+        """
+        Converts the BlockSCAD XML file to a SCAD file.
+
+        Parameters
+        ----------
+        scad_path : str
+            path to the output SCAD file
+
+        Returns
+        -------
+        Union[str, None]
+            path to the output SCAD file if conversion is successful, None otherwise
+        """
+        return self.convert_file(self.xml_path, scad_path)
+
+    def convert_file(self, xml_path: str, scad_path: str) -> str:
+        """
+        Converts the given BlockSCAD XML file to a SCAD file.
+
+        The file is compiled locally by the BlockscadCompiler - the OpenAI language
+        model API is only used for documents with blocks the compiler does not support.
+
+        Parameters
+        ----------
+        xml_path : str
+            path to the input BlockSCAD XML file
+        scad_path : str
+            path to the output SCAD file
+
+        Returns
+        -------
+        str
+            path to the output SCAD file
+        """
+        xml_content = self.read_xml(xml_path)
+        try:
+            scad_content = BlockscadCompiler().compile_string(xml_content)
+        except UnsupportedBlockError:
+            scad_content = self.convert_with_llm(xml_content, xml_path)
+        except BlockscadCompileError as ex:
+            msg = f"The file at {xml_path} is not a valid BlockSCAD XML file: {ex}"
             raise Exception(msg)
 
         # Write the SCAD code to the output file
@@ -136,3 +290,135 @@ Here is the BlockSCAD XML:\n{xml_content}
             scad_file.write(scad_content)
 
         return scad_path
+
+    def convert_with_llm(self, xml_content: str, name: str = None) -> str:
+        """
+        Converts BlockSCAD XML to SCAD code using the OpenAI language model API.
+
+        The same XML is only sent once - later conversions are served from the cache.
+
+        Parameters
+        ----------
+        xml_content : str
+            the BlockSCAD XML
+        name : str
+            the name of the XML file for error messages
+
+        Returns
+        -------
+        str
+            the SCAD code
+        """
+        key = self.cache_key(xml_content)
+        scad_content = self.cache.get(key)
+        if scad_content is None:
+            if self.client is None:
+                self.client = OpenAI(api_key=self.get_api_key(), base_url=self.base_url)
+            response = self.client.chat.completions.create(**self.request(xml_content))
+            scad_content = self.check_result(
+                response.choices[0].message.content or "", name or self.xml_path
+            )
+            self.cache.put(key, scad_content)
+        return scad_content
+
+    async def convert_with_llm_async(
+        self, xml_content: str, name: str, semaphore: asyncio.Semaphore
+    ) -> Tuple[str, str]:
+        """
+        Converts BlockSCAD XML to SCAD code using the OpenAI language model API.
+
+        Parameters
+        ----------
+        xml_content : str
+            the BlockSCAD XML
+        name : str
+            the name of the XML file for error messages
+        semaphore : asyncio.Semaphore
+            limits the number of requests in flight
+
+        Returns
+        -------
+        Tuple[str, str]
+            the SCAD code and its source - cache or model
+        """
+        key = self.cache_key(xml_content)
+        scad_content = self.cache.get(key)
+        if scad_content is not None:
+            return scad_content, "cache"
+        async with semaphore:
+            if self.async_client is None:
+                self.async_client = AsyncOpenAI(
+                    api_key=self.get_api_key(), base_url=self.base_url
+                )
+            response = await self.async_client.chat.completions.create(
+                **self.request(xml_content)
+            )
+        scad_content = self.check_result(
+            response.choices[0].message.content or "", name
+        )
+        self.cache.put(key, scad_content)
+        return scad_content, "model"
+
+    async def convert_batch_async(
+        self, xml_paths: List[str], scad_dir: str = None, scad_paths: List[str] = None
+    ) -> List[BlockscadConversion]:
+        """
+        Converts the given BlockSCAD XML files to SCAD files in the given directory.
+
+        Files are compiled locally where possible - the others are sent to the model
+        concurrently with at most max_in_flight requests at a time. Identical
+        documents are only sent once.
+
+        Parameters
+        ----------
+        xml_paths : List[str]
+            the BlockSCAD XML files
+        scad_dir : str
+            the directory for the SCAD files - named like the XML files
+        scad_paths : List[str]
+            the SCAD file of each XML file instead of a common directory
+
+        Returns
+        -------
+        List[BlockscadConversion]
+            the outcome for each file in the given order
+        """
+        if scad_paths is None:
+            os.makedirs(scad_dir, exist_ok=True)
+            scad_paths = [
+                os.path.join(scad_dir, f"{Path(xml_path).stem}.scad")
+                for xml_path in xml_paths
+            ]
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        # concurrent conversions of the same document share one request
+        pending = {}
+
+        async def convert(xml_path: str, scad_path: str) -> BlockscadConversion:
+            conversion = BlockscadConversion(xml_path)
+            try:
+                xml_content = await asyncio.to_thread(self.read_xml, xml_path)
+                try:
+                    scad_content = BlockscadCompiler().compile_string(xml_content)
+                    conversion.source = "compiler"
+                except UnsupportedBlockError:
+                    key = self.cache_key(xml_content)
+                    task = pending.get(key)
+                    if task is None:
+                        task = asyncio.ensure_future(
+                            self.convert_with_llm_async(
+                                xml_content, xml_path, semaphore
+                            )
+                        )
+                        pending[key] = task
+                    scad_content, conversion.source = await asyncio.shield(task)
+                with open(scad_path, "w") as scad_file:
+                    scad_file.write(scad_content)
+                conversion.scad_path = scad_path
+            except Exception as ex:
+                conversion.error = f"{type(ex).__name__}: {ex}"
+            return conversion
+
+        conversions = await asyncio.gather(
+            *[convert(*paths) for paths in zip(xml_paths, scad_paths)]
+        )
+        return list(conversions)
@@ -0,0 +1,304 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+include/use dependency graph of OpenSCAD files
+"""
+
+import hashlib
+import os
+import platform
+import re
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+@dataclass
+class FileEntry:
+    """
+    the parsed state of a single file of a DependencyGraph
+
+    Attributes:
+        mtime_ns (int): the modification time the entry was computed for
+        size (int): the size in bytes the entry was computed for
+        digest (str): the sha256 hex digest of the content
+        deps (List[str]): the resolved absolute paths of the direct dependencies
+        missing (List[str]): the names of dependencies that could not be resolved
+    """
+
+    mtime_ns: int
+    size: int
+    digest: str
+    deps: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        convert me to a dict e.g. for json serialization
+        """
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FileEntry":
+        """
+        create a file entry from the given dict
+        """
+        return cls(**data)
+
+
+class DependencyGraph:
+    """
+    Tracks which files an OpenSCAD design depends on via include<>,
+    use<> and import()/surface() of literal file names.
+
+    Files are only read again when their modification time or size
+    changed so that checking a whole catalog of designs for changes
+    costs little more than a stat call per file.
+    """
+
+    # include/use statements and file imports - comments and strings are
+    # matched as well so that statements inside them are skipped
+    DEPENDENCY_PATTERN = re.compile(
+        r"(?P<comment>//[^\n]*|/\*.*?\*/)"
+        r"|\b(?P<kind>include|use)\s*<(?P<name>[^>\n]+)>"
+        r"|\b(?:import|surface)\s*\(\s*(?:file\s*=\s*)?\"(?P<file>(?:\\.|[^\"\\])*)\""
+        r"|(?P<string>\"(?:\\.|[^\"\\])*\")",
+        re.DOTALL,
+    )
+
+    def __init__(self, library_paths: List[str] = None):
+        """
+        constructor
+
+        Args:
+            library_paths (List[str]): the directories to resolve include/use names in
+                after the directory of the including file - defaults to OPENSCADPATH
+                and the user library directory of OpenSCAD
+        """
+        if library_paths is None:
+            library_paths = DependencyGraph.default_library_paths()
+        self.library_paths = [os.path.abspath(path) for path in library_paths]
+        self.entries: Dict[str, FileEntry] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def default_library_paths() -> List[str]:
+        """
+        get the library directories OpenSCAD searches by default
+
+        Returns:
+            List[str]: the OPENSCADPATH directories followed by the user library directory
+        """
+        paths = [
+            path
+            for path in os.environ.get("OPENSCADPATH", "").split(os.pathsep)
+            if path
+        ]
+        if platform.system() == "Linux":
+            user_libraries = Path.home() / ".local" / "share" / "OpenSCAD" / "libraries"
+        else:
+            user_libraries = Path.home() / "Documents" / "OpenSCAD" / "libraries"
+        paths.append(str(user_libraries))
+        return paths
+
+    @classmethod
+    def parse_dependencies(cls, source: str) -> List[Tuple[str, str]]:
+        """
+        find the dependencies in the given OpenSCAD source
+
+        Args:
+            source (str): the OpenSCAD code
+
+        Returns:
+            List[Tuple[str, str]]: the kind (include, use or import) and file name of each dependency
+        """
+        dependencies = []
+        for match in cls.DEPENDENCY_PATTERN.finditer(source):
+            if match.group("kind"):
+                dependencies.append((match.group("kind"), match.group("name").strip()))
+            elif match.group("file"):
+                dependencies.append(("import", match.group("file")))
+        return dependencies
+
+    def resolve(self, kind: str, name: str, base_dir: str) -> Optional[str]:
+        """
+        resolve the given dependency name the way OpenSCAD does
+
+        Args:
+            kind (str): include, use or import
+            name (str): the file name as given in the source
+            base_dir (str): the directory of the file containing the statement
+
+        Returns:
+            Optional[str]: the absolute path or None if the file can not be found
+        """
+        search_dirs = [base_dir]
+        if kind != "import":
+            search_dirs.extend(self.library_paths)
+        for search_dir in search_dirs:
+            path = os.path.join(search_dir, os.path.expanduser(name))
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+        return None
+
+    def entry(self, path: str) -> Optional[FileEntry]:
+        """
+        get the entry for the given file - parsing it again if it changed
+
+        Args:
+            path (str): the absolute path of the file
+
+        Returns:
+            Optional[FileEntry]: the entry or None if the file does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.entries.pop(path, None)
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+        # files with missing dependencies are parsed again since the missing files might show up
+        if (
+            entry
+            and not entry.missing
+            and entry.mtime_ns == stat.st_mtime_ns
+            and entry.size == stat.st_size
+        ):
+            return entry
+        with open(path, "rb") as dep_file:
+            content = dep_file.read()
+        entry = FileEntry(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            digest=hashlib.sha256(content).hexdigest(),
+        )
+        # only OpenSCAD sources have dependencies - not imported meshes or images
+        if path.endswith(".scad"):
+            base_dir = os.path.dirname(path)
+            source = content.decode("utf-8", errors="replace")
+            for kind, name in DependencyGraph.parse_dependencies(source):
+                dep_path = self.resolve(kind, name, base_dir)
+                if dep_path is None:
+                    entry.missing.append(name)
+                elif dep_path not in entry.deps and dep_path != path:
+                    entry.deps.append(dep_path)
+        with self.lock:
+            self.entries[path] = entry
+        return entry
+
+    def transitive(self, path: str) -> List[str]:
+        """
+        get all files the given file depends on directly or indirectly
+
+        Args:
+            path (str): the file
+
+        Returns:
+            List[str]: the sorted absolute paths of the dependencies
+        """
+        path = os.path.abspath(path)
+        seen = {path}
+        todo = [path]
+        while todo:
+            entry = self.entry(todo.pop())
+            if entry is None:
+                continue
+            for dep_path in entry.deps:
+                if dep_path not in seen:
+                    seen.add(dep_path)
+                    todo.append(dep_path)
+        seen.discard(path)
+        return sorted(seen)
+
+    def fingerprint(self, path: str) -> str:
+        """
+        get a hash of the content of the given file and all its dependencies
+
+        the fingerprint changes if any transitive input changes and only then
+
+        Args:
+            path (str): the file
+
+        Returns:
+            str: the sha256 hex digest
+        """
+        path = os.path.abspath(path)
+        sha = hashlib.sha256()
+        for dep_path in [path, *self.transitive(path)]:
+            entry = self.entry(dep_path)
+            if entry is None:
+                sha.update(f"{dep_path}:missing\n".encode())
+                continue
+            sha.update(f"{dep_path}:{entry.digest}\n".encode())
+            for name in entry.missing:
+                # the design changes when a missing library shows up
+                sha.update(f"{dep_path}:missing:{name}\n".encode())
+        return sha.hexdigest()
+
+    def mtime(self, path: str) -> float:
+        """
+        get the newest modification time of the given file and its dependencies
+
+        Args:
+            path (str): the file
+
+        Returns:
+            float: the modification time in seconds since the epoch
+        """
+        paths = [os.path.abspath(path), *self.transitive(path)]
+        mtime = max(os.path.getmtime(p) for p in paths if os.path.isfile(p))
+        return mtime
+
+    def dependents(
+        self, changed_paths: Iterable[str], candidates: Iterable[str] = None
+    ) -> Set[str]:
+        """
+        get the files that are affected by changes of the given files
+
+        Args:
+            changed_paths (Iterable[str]): the changed, added or removed files
+            candidates (Iterable[str]): optional files to consider e.g. all designs
+                of a catalog - by default all files known to this graph
+
+        Returns:
+            Set[str]: the affected files including changed candidates themselves
+        """
+        changed = {os.path.abspath(path) for path in changed_paths}
+        if candidates is None:
+            with self.lock:
+                candidates = list(self.entries)
+        affected = set()
+        for candidate in candidates:
+            candidate = os.path.abspath(candidate)
+            if candidate in changed or changed.intersection(self.transitive(candidate)):
+                affected.add(candidate)
+        return affected
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        convert me to a dict e.g. for json serialization
+        """
+        with self.lock:
+            files = {path: entry.to_dict() for path, entry in self.entries.items()}
+        return {"library_paths": self.library_paths, "files": files}
+
+    def load_dict(self, data: Dict[str, Any]):
+        """
+        restore the entries of an earlier run from the given dict
+
+        entries for different library paths are ignored since the
+        dependencies might resolve to other files
+
+        Args:
+            data (Dict[str, Any]): the result of an earlier to_dict
+        """
+        if data.get("library_paths") != self.library_paths:
+            return
+        with self.lock:
+            for path, entry in data.get("files", {}).items():
+                self.entries.setdefault(path, FileEntry.from_dict(entry))
@@ -0,0 +1,130 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+watch a design file and its include/use dependencies for changes
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional, Set
+
+from watchfiles import awatch
+
+from nicescad.dependencies import DependencyGraph
+
+
+class FileWatcher:
+    """
+    Watches an OpenSCAD file and all files it includes or uses and calls
+    back once a burst of changes has settled.
+
+    Only the newest change is handled: a callback that is still running
+    when newer changes arrive is cancelled before the next one starts.
+    The parent directories are watched instead of the files themselves
+    since many editors save by replacing the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_change: Callable[[Set[str]], Awaitable[None]],
+        dependency_graph: DependencyGraph = None,
+        debounce: float = 0.3,
+        force_polling: bool = None,
+    ):
+        """
+        constructor
+
+        Args:
+            path (str): the file to watch
+            on_change (Callable): called with the set of changed paths
+            dependency_graph (DependencyGraph): the graph to find the dependencies with
+            debounce (float): the time in seconds without further changes before the callback
+            force_polling (bool): poll instead of using inotify - default: auto detect
+        """
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.graph = dependency_graph or DependencyGraph()
+        self.debounce = debounce
+        self.force_polling = force_polling
+        self.watched: Set[str] = set()
+        self.stop_event: Optional[asyncio.Event] = None
+        self.watch_task: Optional[asyncio.Task] = None
+        self.change_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """
+        is this watcher started and not stopped yet?
+        """
+        return self.watch_task is not None and not self.watch_task.done()
+
+    def watched_paths(self) -> Set[str]:
+        """
+        get the file and its transitive dependencies
+
+        Returns:
+            Set[str]: the absolute paths to watch
+        """
+        paths = {self.path, *self.graph.transitive(self.path)}
+        return paths
+
+    def start(self):
+        """
+        start watching - needs a running event loop
+        """
+        if not self.running:
+            self.stop_event = asyncio.Event()
+            self.watch_task = asyncio.ensure_future(self.watch())
+
+    async def stop(self):
+        """
+        stop watching and cancel a callback in flight
+        """
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for task in (self.watch_task, self.change_task):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self.watch_task = None
+        self.change_task = None
+
+    async def watch(self):
+        """
+        watch the directories of the watched paths until stopped - the
+        watch is set up again when the dependencies change
+        """
+        while not self.stop_event.is_set():
+            self.watched = await asyncio.to_thread(self.watched_paths)
+            dirs = {os.path.dirname(path) for path in self.watched}
+            dirs = [watch_dir for watch_dir in dirs if os.path.isdir(watch_dir)]
+            watched = self.watched
+            async for changes in awatch(
+                *dirs,
+                watch_filter=lambda _change, path: os.path.abspath(path) in watched,
+                debounce=int(self.debounce * 1000 * 4),
+                step=int(self.debounce * 1000),
+                stop_event=self.stop_event,
+                recursive=False,
+                force_polling=self.force_polling,
+            ):
+                changed = {os.path.abspath(path) for _change, path in changes}
+                await self.handle_change(changed)
+                if await asyncio.to_thread(self.watched_paths) != watched:
+                    # an include/use was added or removed
+                    break
+
+    async def handle_change(self, changed: Set[str]):
+        """
+        cancel the callback in flight (if any) and call back for the given changes
+
+        Args:
+            changed (Set[str]): the changed paths
+        """
+        if self.change_task is not None and not self.change_task.done():
+            self.change_task.cancel()
+            await asyncio.gather(self.change_task, return_exceptions=True)
+        self.change_task = asyncio.ensure_future(self.on_change(changed))
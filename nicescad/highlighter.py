@@ -0,0 +1,231 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+cached and incremental syntax highlighting of OpenSCAD code
+"""
+
+import hashlib
+import re
+from typing import List
+
+from pygments import highlight
+from pygments.formatters.html import HtmlFormatter
+from pygments.lexer import RegexLexer, words
+from pygments.token import (
+    Comment,
+    Keyword,
+    Name,
+    Number,
+    Operator,
+    Punctuation,
+    String,
+    Text,
+)
+
+from nicescad.lru_cache import LruCache
+
+
+class OpenSCADLexer(RegexLexer):
+    """
+    Lexer for OpenSCAD, a language for creating solid 3D CAD models.
+
+    Attributes:
+        name (str): The name of the lexer.
+        aliases (list of str): A list of strings that can be used as aliases for the lexer.
+        filenames (list of str): A list of strings that define filename patterns that match this lexer.
+    """
+
+    name = "OpenSCAD"
+    aliases = ["openscad"]
+    filenames = ["*.scad"]
+
+    # keywords, constants and builtins have to be matched before identifiers
+    tokens = {
+        "root": [
+            (r"\s+", Text.Whitespace),
+            (r"//.*?$", Comment.Single),
+            (r"(?s:/\*.*?\*/)", Comment.Multiline),
+            (r'"(\\\\|\\"|[^"])*"', String),
+            (
+                words(
+                    (
+                        "module",
+                        "function",
+                        "if",
+                        "else",
+                        "for",
+                        "intersection_for",
+                        "let",
+                        "each",
+                        "assert",
+                        "echo",
+                        "include",
+                        "use",
+                    ),
+                    suffix=r"\b",
+                ),
+                Keyword,
+            ),
+            (words(("true", "false", "undef", "PI"), suffix=r"\b"), Keyword.Constant),
+            (
+                words(
+                    (
+                        "cube",
+                        "sphere",
+                        "cylinder",
+                        "polyhedron",
+                        "square",
+                        "circle",
+                        "polygon",
+                        "text",
+                        "import",
+                        "scale",
+                        "resize",
+                        "color",
+                        "offset",
+                        "minkowski",
+                        "hull",
+                        "render",
+                        "surface",
+                        "rotate",
+                        "translate",
+                        "mirror",
+                        "multmatrix",
+                        "projection",
+                        "rotate_extrude",
+                        "linear_extrude",
+                        "union",
+                        "difference",
+                        "intersection",
+                        "children",
+                    ),
+                    suffix=r"\b",
+                ),
+                Name.Builtin,
+            ),
+            (r"\$\w+", Name.Variable.Magic),
+            (r"[A-Za-z_]\w*", Name.Variable),
+            (r"(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?", Number),
+            (r"\+\+|--|&&|\|\|", Operator),
+            (r"[=+\-*/%&|^<>!]=?|[?:#]", Operator),
+            (r"[\[\]{}();,.]", Punctuation),
+        ],
+    }
+
+
+class ScadHighlighter:
+    """
+    Highlights OpenSCAD code as html with pygments.
+
+    Results are cached by the content hash of the code. The code is split
+    into segments at line ends that are not inside a comment or string and
+    only segments that changed since earlier calls are tokenized again.
+    The result is the same as highlighting the whole code at once.
+    """
+
+    # the tokens that may span lines - matched the way the lexer does
+    SPAN_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\\\|\\"|[^"])*"', re.DOTALL)
+
+    def __init__(self, capacity: int = 16, segment_capacity: int = 20000):
+        """
+        constructor
+
+        Args:
+            capacity (int): the number of highlighted documents to keep
+            segment_capacity (int): the number of highlighted segments to keep
+        """
+        # the segments keep their blank lines - see highlight_segments
+        self.lexer = OpenSCADLexer(stripnl=False)
+        self.formatter = HtmlFormatter()
+        self.segment_formatter = HtmlFormatter(nowrap=True)
+        self.documents = LruCache(capacity)
+        self.segments = LruCache(segment_capacity)
+        # the wrapper of the formatter's output around the highlighted lines
+        self.prefix, self.suffix = highlight("x", self.lexer, self.formatter).split(
+            highlight("x", self.lexer, self.segment_formatter), 1
+        )
+
+    def split_segments(self, code: str) -> List[str]:
+        """
+        split the given code into segments that can be tokenized independently
+
+        Args:
+            code (str): the OpenSCAD code
+
+        Returns:
+            List[str]: the segments - each ends with a newline
+        """
+        if not code.endswith("\n"):
+            # like the lexer
+            code += "\n"
+        # the positions of line ends inside comments and strings
+        inside = set()
+        for match in ScadHighlighter.SPAN_PATTERN.finditer(code):
+            if "\n" in match.group():
+                start = match.start()
+                pos = code.find("\n", start, match.end())
+                while pos != -1:
+                    inside.add(pos)
+                    pos = code.find("\n", pos + 1, match.end())
+        segments = []
+        start = 0
+        pos = code.find("\n")
+        while pos != -1:
+            if pos not in inside:
+                segments.append(code[start : pos + 1])
+                start = pos + 1
+            pos = code.find("\n", pos + 1)
+        return segments
+
+    def highlight_segments(self, code: str) -> str:
+        """
+        highlight the given code reusing the cached segments
+
+        Args:
+            code (str): the OpenSCAD code
+
+        Returns:
+            str: the html
+        """
+        # normalized like the lexer does for the whole code
+        code = code.replace("\r\n", "\n").replace("\r", "\n").strip("\n")
+        segments = self.split_segments(code)
+        html_segments = [self.segments.get(segment) for segment in segments]
+        missing = [
+            segment for segment, html in zip(segments, html_segments) if html is None
+        ]
+        if missing:
+            # one pass for all changed segments - the formatter emits a line per line
+            html = highlight("".join(missing), self.lexer, self.segment_formatter)
+            lines = [f"{line}\n" for line in html.split("\n")[:-1]]
+            fresh = {}
+            offset = 0
+            for segment in missing:
+                count = segment.count("\n")
+                fresh[segment] = "".join(lines[offset : offset + count])
+                offset += count
+            for i, segment in enumerate(segments):
+                if html_segments[i] is None:
+                    html_segments[i] = fresh[segment]
+                    self.segments.put(segment, fresh[segment])
+        html = self.prefix + "".join(html_segments) + self.suffix
+        return html
+
+    def highlight(self, code: str) -> str:
+        """
+        highlight the given code
+
+        Args:
+            code (str): the OpenSCAD code
+
+        Returns:
+            str: the html
+        """
+        key = hashlib.sha256(code.encode()).hexdigest()
+        html = self.documents.get(key)
+        if html is None:
+            html = self.highlight_segments(code)
+            self.documents.put(key, html)
+        return html
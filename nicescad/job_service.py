@@ -0,0 +1,234 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+headless render jobs with polling and local callbacks
+"""
+
+import asyncio
+import ipaddress
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from nicescad.job_store import JobRecord, JobStore
+
+
+class JobService:
+    """
+    Runs the render jobs of a JobStore with a fixed number of workers.
+
+    Jobs that were running when the server stopped are queued again on
+    start. When a job is finished its state is posted to its callback url
+    which must point to the local machine. Finished jobs and their result
+    files are removed after max_age seconds.
+    """
+
+    # finished jobs are kept for a day by default
+    MAX_AGE = 24 * 3600.0
+
+    def __init__(
+        self,
+        store: JobStore,
+        result_dir: str,
+        run_job: Callable[[JobRecord, str, Callable[[str], None]], Awaitable[None]],
+        workers: int = 1,
+        progress_interval: float = 0.5,
+        max_age: float = None,
+    ):
+        """
+        constructor
+
+        Args:
+            store (JobStore): the persistent job store
+            result_dir (str): the directory for the result files
+            run_job (Callable): renders the given job to the given result path - raises on failure
+            workers (int): the number of jobs to run concurrently
+            progress_interval (float): the minimum time in seconds between progress updates in the store
+            max_age (float): the time in seconds to keep finished jobs and their results - defaults to MAX_AGE
+        """
+        self.store = store
+        self.result_dir = result_dir
+        os.makedirs(self.result_dir, exist_ok=True)
+        self.run_job = run_job
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.max_age = max_age if max_age is not None else JobService.MAX_AGE
+        self.worker_tasks: List[asyncio.Task] = []
+        self.running: Dict[str, asyncio.Task] = {}
+        self.wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def is_local_url(url: str) -> bool:
+        """
+        check whether the given url is an http(s) url of the local machine
+
+        Args:
+            url (str): the url to check
+
+        Returns:
+            bool: True if the url points to a loopback address
+        """
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return False
+        if parsed.hostname == "localhost":
+            return True
+        try:
+            local = ipaddress.ip_address(parsed.hostname).is_loopback
+        except ValueError:
+            local = False
+        return local
+
+    def start(self):
+        """
+        requeue interrupted jobs, expire old ones and start the workers - needs a running event loop
+        """
+        self.store.requeue_interrupted()
+        self.expire()
+        self.wakeup = asyncio.Event()
+        for _ in range(self.workers):
+            self.worker_tasks.append(asyncio.ensure_future(self.work()))
+
+    async def stop(self):
+        """
+        stop the workers - running jobs are queued again on the next start
+        """
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    def submit(self, job: JobRecord) -> JobRecord:
+        """
+        submit the given job
+
+        Args:
+            job (JobRecord): the job to run
+
+        Returns:
+            JobRecord: the queued job
+        """
+        job.status = JobRecord.QUEUED
+        self.store.add(job)
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[JobRecord]:
+        """
+        cancel the job with the given id
+
+        Args:
+            job_id (str): the id of the job
+
+        Returns:
+            Optional[JobRecord]: the job or None if there is no such job
+        """
+        job = self.store.get(job_id)
+        if job is None or job.finished:
+            return job
+        self.store.update(job_id, status=JobRecord.CANCELLED, error="cancelled")
+        task = self.running.get(job_id)
+        if task is not None:
+            task.cancel()
+        job = self.store.get(job_id)
+        return job
+
+    def expire(self) -> int:
+        """
+        remove the finished jobs older than my max age together with their result files
+
+        Returns:
+            int: the number of removed jobs
+        """
+        jobs = self.store.expire(self.max_age)
+        for job in jobs:
+            result_path = self.result_path(job)
+            if os.path.isfile(result_path):
+                os.remove(result_path)
+        return len(jobs)
+
+    def result_path(self, job: JobRecord) -> str:
+        """
+        get the path of the result file of the given job
+        """
+        path = os.path.join(self.result_dir, f"{job.job_id}.{job.format}")
+        return path
+
+    async def work(self):
+        """
+        run queued jobs one at a time until cancelled
+        """
+        while True:
+            job = self.store.claim_next()
+            if job is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            task = asyncio.ensure_future(self.run(job))
+            self.running[job.job_id] = task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():
+                    # the service is stopping - the job stays running and gets requeued
+                    task.cancel()
+                    raise
+            finally:
+                self.running.pop(job.job_id, None)
+
+    async def run(self, job: JobRecord):
+        """
+        run the given job and record its outcome
+
+        Args:
+            job (JobRecord): the running job
+        """
+        last_update = 0.0
+
+        def on_progress(line: str):
+            nonlocal last_update
+            now = time.time()
+            if line.strip() and now - last_update >= self.progress_interval:
+                last_update = now
+                self.store.update(job.job_id, progress=line.strip())
+
+        result_path = self.result_path(job)
+        try:
+            await self.run_job(job, result_path, on_progress)
+            self.store.update(
+                job.job_id,
+                status=JobRecord.DONE,
+                progress="done",
+                result_path=result_path,
+            )
+        except asyncio.CancelledError:
+            if self.store.get(job.job_id).status != JobRecord.CANCELLED:
+                raise
+        except Exception as ex:
+            self.store.update(job.job_id, status=JobRecord.FAILED, error=str(ex))
+        await self.notify(job.job_id)
+        self.expire()
+
+    async def notify(self, job_id: str):
+        """
+        post the state of the given job to its callback url
+
+        Args:
+            job_id (str): the id of the finished job
+        """
+        job = self.store.get(job_id)
+        if not job.callback_url:
+            return
+        try:
+            await asyncio.to_thread(
+                requests.post, job.callback_url, json=job.to_dict(), timeout=10
+            )
+        except requests.RequestException:
+            # the client can still poll for the state
+            pass
@@ -0,0 +1,263 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+persistent store of headless render jobs
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class JobRecord:
+    """
+    a headless render job
+
+    Attributes:
+        job_id (str): the unique id of the job
+        source (str): the SolidPython or OpenSCAD source
+        language (str): python or scad
+        format (str): the export format e.g. stl or 3mf
+        mode (str): the render mode - final or preview
+        callback_url (str): optional local url to post the final job state to
+        status (str): one of queued, running, done, failed or cancelled
+        progress (str): the last progress line of openscad
+        error (str): the error message of a failed job
+        result_path (str): the path of the result file of a done job
+        created (float): the creation time
+        updated (float): the time of the last change
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    source: str
+    language: str = "scad"
+    format: str = "stl"
+    mode: str = "final"
+    callback_url: Optional[str] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    progress: str = ""
+    error: Optional[str] = None
+    result_path: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+
+    @property
+    def finished(self) -> bool:
+        """
+        is this job done, failed or cancelled?
+        """
+        return self.status in (JobRecord.DONE, JobRecord.FAILED, JobRecord.CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        get the public state of this job e.g. for the job api - without the
+        source and the server side result path
+
+        Returns:
+            Dict[str, Any]: the job state
+        """
+        record = asdict(self)
+        del record["source"]
+        del record["result_path"]
+        return record
+
+
+class JobStore:
+    """
+    Keeps render jobs in a SQLite database so that queued work
+    survives a restart of the server.
+    """
+
+    COLUMNS = [f.name for f in fields(JobRecord)]
+
+    def __init__(self, db_path: str):
+        """
+        constructor
+
+        Args:
+            db_path (str): the path of the SQLite database file - ":memory:" for a transient store
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                language TEXT NOT NULL,
+                format TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                callback_url TEXT,
+                status TEXT NOT NULL,
+                progress TEXT,
+                error TEXT,
+                result_path TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+                )""")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)"
+            )
+
+    def _to_record(self, row: Optional[sqlite3.Row]) -> Optional[JobRecord]:
+        """
+        convert the given database row to a job record
+        """
+        if row is None:
+            return None
+        return JobRecord(**{column: row[column] for column in JobStore.COLUMNS})
+
+    def add(self, job: JobRecord) -> JobRecord:
+        """
+        add the given job
+
+        Args:
+            job (JobRecord): the job
+
+        Returns:
+            JobRecord: the job
+        """
+        columns = ", ".join(JobStore.COLUMNS)
+        placeholders = ", ".join("?" for _ in JobStore.COLUMNS)
+        values = [getattr(job, column) for column in JobStore.COLUMNS]
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", values
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """
+        get the job with the given id
+
+        Args:
+            job_id (str): the id of the job
+
+        Returns:
+            Optional[JobRecord]: the job or None if there is no such job
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE job_id=?", (job_id,)
+            ).fetchone()
+        return self._to_record(row)
+
+    def update(self, job_id: str, **kwargs) -> bool:
+        """
+        update the given fields of the job with the given id
+
+        Args:
+            job_id (str): the id of the job
+            **kwargs: the fields to change
+
+        Returns:
+            bool: True if the job exists
+        """
+        kwargs["updated"] = time.time()
+        assignments = ", ".join(f"{column}=?" for column in kwargs)
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id=?",
+                [*kwargs.values(), job_id],
+            )
+        return cursor.rowcount > 0
+
+    def claim_next(self) -> Optional[JobRecord]:
+        """
+        get the oldest queued job and mark it as running
+
+        Returns:
+            Optional[JobRecord]: the job or None if no job is queued
+        """
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE status=? ORDER BY created LIMIT 1",
+                (JobRecord.QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._to_record(row)
+            job.status = JobRecord.RUNNING
+            job.updated = time.time()
+            self.connection.execute(
+                "UPDATE jobs SET status=?, updated=? WHERE job_id=?",
+                (job.status, job.updated, job.job_id),
+            )
+        return job
+
+    def requeue_interrupted(self) -> int:
+        """
+        put jobs that were running when the server stopped back into the queue
+
+        Returns:
+            int: the number of requeued jobs
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET status=?, progress='', updated=? WHERE status=?",
+                (JobRecord.QUEUED, time.time(), JobRecord.RUNNING),
+            )
+        return cursor.rowcount
+
+    def jobs(self, status: str = None) -> List[JobRecord]:
+        """
+        get the jobs oldest first
+
+        Args:
+            status (str): optional status to filter by
+
+        Returns:
+            List[JobRecord]: the jobs
+        """
+        query = "SELECT * FROM jobs"
+        params = ()
+        if status is not None:
+            query += " WHERE status=?"
+            params = (status,)
+        with self.lock:
+            rows = self.connection.execute(
+                f"{query} ORDER BY created", params
+            ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def expire(self, max_age: float) -> List[JobRecord]:
+        """
+        remove the finished jobs that did not change for the given time
+
+        Args:
+            max_age (float): the time in seconds to keep finished jobs
+
+        Returns:
+            List[JobRecord]: the removed jobs e.g. to delete their result files
+        """
+        finished = (JobRecord.DONE, JobRecord.FAILED, JobRecord.CANCELLED)
+        placeholders = ", ".join("?" for _ in finished)
+        params = (*finished, time.time() - max_age)
+        where = f"status IN ({placeholders}) AND updated<?"
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                f"SELECT * FROM jobs WHERE {where}", params
+            ).fetchall()
+            self.connection.execute(f"DELETE FROM jobs WHERE {where}", params)
+        return [self._to_record(row) for row in rows]
+
+    def close(self):
+        """
+        close the database connection
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,132 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+in memory least recently used cache with an optional on-disk tier
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from nicescad.render_cache import RenderCache, RenderCacheStats
+
+
+class LruCache:
+    """
+    A least recently used cache for text values with a time to live.
+
+    Misses of the in memory tier are looked up in the optional on-disk
+    tier (a RenderCache) which survives restarts and is shared between
+    processes.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        ttl: Optional[float] = None,
+        disk_cache: Optional[RenderCache] = None,
+        suffix: str = ".txt",
+    ):
+        """
+        constructor
+
+        Args:
+            capacity (int): the maximum number of entries in memory
+            ttl (float): the time to live of an entry in seconds - None for no expiry
+            disk_cache (RenderCache): optional on-disk tier
+            suffix (str): the file suffix of the entries in the on-disk tier
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.disk_cache = disk_cache
+        self.suffix = suffix
+        self.entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.stats = RenderCacheStats()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        get the value for the given key and count the hit or miss
+
+        Args:
+            key (str): the key
+
+        Returns:
+            Optional[str]: the value or None if there is no valid entry
+        """
+        value = None
+        entry = self.entries.get(key)
+        if entry is not None:
+            created, value = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self.entries[key]
+                self.stats.evictions += 1
+                value = None
+            else:
+                self.entries.move_to_end(key)
+        if value is None and self.disk_cache is not None:
+            path = self.disk_cache.lookup(key, self.suffix)
+            if path is not None:
+                with open(path, "r", encoding="utf-8") as text_file:
+                    value = text_file.read()
+                self._put(key, value)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def _put(self, key: str, value: str):
+        """
+        put the given value into the in memory tier evicting the least recently used entries
+        """
+        self.entries[key] = (time.time(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def put(self, key: str, value: str):
+        """
+        store the given value under the given key in all tiers
+
+        Args:
+            key (str): the key
+            value (str): the value
+        """
+        self._put(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.store_text(key, self.suffix, value)
+        self.stats.stores += 1
+
+    def clear(self):
+        """
+        remove all entries from all tiers
+        """
+        self.entries.clear()
+        if self.disk_cache is not None:
+            self.disk_cache.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        get the statistics of this cache e.g. for a status endpoint
+
+        Returns:
+            Dict[str, Any]: size, capacity, ttl and the hit/miss counters
+        """
+        stats = {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "ttl": self.ttl,
+            "disk": self.disk_cache.cache_dir if self.disk_cache else None,
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "stores": self.stats.stores,
+            "evictions": self.stats.evictions,
+            "hit_rate": self.stats.hit_rate,
+        }
+        return stats
@@ -0,0 +1,329 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+triangle meshes loaded from STL files as NumPy arrays
+"""
+
+import os
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+
+# the record layout of a triangle in a binary STL file
+STL_TRIANGLE_DTYPE = np.dtype(
+    [
+        ("normal", "<f4", (3,)),
+        ("vertices", "<f4", (3, 3)),
+        ("attr", "<u2"),
+    ]
+)
+STL_HEADER_SIZE = 80
+
+
+@dataclass
+class MeshStats:
+    """
+    statistics of a triangle mesh
+    """
+
+    triangle_count: int
+    vertex_count: int
+    bbox_min: List[float]
+    bbox_max: List[float]
+    volume: float
+    surface_area: float
+    watertight: bool
+
+    @property
+    def size(self) -> List[float]:
+        """
+        the extent of the bounding box
+        """
+        size = [bmax - bmin for bmin, bmax in zip(self.bbox_min, self.bbox_max)]
+        return size
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        convert me to a dict e.g. for json serialization
+        """
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MeshStats":
+        """
+        create mesh statistics from the given dict
+        """
+        return cls(**data)
+
+    def __str__(self) -> str:
+        size = "x".join(f"{extent:.1f}" for extent in self.size)
+        tight = "watertight" if self.watertight else "not watertight"
+        text = f"{self.triangle_count} triangles, {self.vertex_count} vertices, size {size}, volume {self.volume:.1f}, area {self.surface_area:.1f}, {tight}"
+        return text
+
+
+class Mesh:
+    """
+    An indexed triangle mesh with vertices as a (n,3) float array
+    and faces as a (m,3) int array of vertex indices.
+    """
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray):
+        """
+        constructor
+
+        Args:
+            vertices (np.ndarray): (n,3) array of vertex coordinates
+            faces (np.ndarray): (m,3) array of vertex indices
+        """
+        self.vertices = vertices
+        self.faces = faces
+
+    @classmethod
+    def from_triangles(cls, triangles: np.ndarray) -> "Mesh":
+        """
+        create an indexed mesh from a triangle soup deduplicating the vertices
+
+        Args:
+            triangles (np.ndarray): (m,3,3) array of triangle corner coordinates
+
+        Returns:
+            Mesh: the indexed mesh
+        """
+        corners = np.ascontiguousarray(triangles, dtype=np.float64).reshape(-1, 3)
+        vertices, inverse = np.unique(corners, axis=0, return_inverse=True)
+        faces = inverse.reshape(-1, 3)
+        mesh = cls(vertices, faces)
+        return mesh
+
+    @staticmethod
+    def is_binary_stl(stl_path: str) -> bool:
+        """
+        check whether the given STL file is in binary format
+
+        the size of a binary STL file is fully determined by its triangle count
+        which makes the check robust against binary files starting with "solid"
+
+        Args:
+            stl_path (str): the path of the STL file
+
+        Returns:
+            bool: True if the file is a binary STL file
+        """
+        size = os.path.getsize(stl_path)
+        if size < STL_HEADER_SIZE + 4:
+            return False
+        with open(stl_path, "rb") as stl_file:
+            stl_file.seek(STL_HEADER_SIZE)
+            count = int.from_bytes(stl_file.read(4), "little")
+        binary = size == STL_HEADER_SIZE + 4 + count * STL_TRIANGLE_DTYPE.itemsize
+        return binary
+
+    @classmethod
+    def read_stl_triangles(cls, stl_path: str) -> np.ndarray:
+        """
+        read the triangles of the given binary or ASCII STL file
+
+        binary files are memory mapped
+
+        Args:
+            stl_path (str): the path of the STL file
+
+        Returns:
+            np.ndarray: (m,3,3) array of triangle corner coordinates
+        """
+        if cls.is_binary_stl(stl_path):
+            if os.path.getsize(stl_path) == STL_HEADER_SIZE + 4:
+                # memory mapping an empty range is not possible
+                return np.zeros((0, 3, 3), dtype=np.float32)
+            records = np.memmap(
+                stl_path,
+                dtype=STL_TRIANGLE_DTYPE,
+                mode="r",
+                offset=STL_HEADER_SIZE + 4,
+            )
+            triangles = records["vertices"]
+        else:
+            with open(stl_path, "r") as stl_file:
+                text = stl_file.read()
+            coords = re.findall(r"vertex\s+(\S+)\s+(\S+)\s+(\S+)", text)
+            triangles = np.array(coords, dtype=np.float64).reshape(-1, 3, 3)
+        return triangles
+
+    @classmethod
+    def load(cls, stl_path: str) -> "Mesh":
+        """
+        load an indexed mesh from the given binary or ASCII STL file
+
+        Args:
+            stl_path (str): the path of the STL file
+
+        Returns:
+            Mesh: the mesh
+        """
+        triangles = cls.read_stl_triangles(stl_path)
+        mesh = cls.from_triangles(triangles)
+        return mesh
+
+    @property
+    def triangles(self) -> np.ndarray:
+        """
+        the (m,3,3) array of triangle corner coordinates
+        """
+        return self.vertices[self.faces]
+
+    def edge_counts(self) -> np.ndarray:
+        """
+        count how many faces share each undirected edge
+
+        Returns:
+            np.ndarray: the number of faces for each distinct edge
+        """
+        edges = np.concatenate(
+            [self.faces[:, [0, 1]], self.faces[:, [1, 2]], self.faces[:, [2, 0]]]
+        )
+        edges.sort(axis=1)
+        _, counts = np.unique(edges, axis=0, return_counts=True)
+        return counts
+
+    def stats(self) -> MeshStats:
+        """
+        compute the statistics of this mesh
+
+        the volume is the sum of the signed volumes of the tetrahedra
+        spanned by the origin and each triangle - it is only meaningful
+        for watertight meshes
+
+        Returns:
+            MeshStats: the statistics
+        """
+        triangle_count = len(self.faces)
+        if triangle_count == 0:
+            stats = MeshStats(
+                0, len(self.vertices), [0.0] * 3, [0.0] * 3, 0.0, 0.0, False
+            )
+            return stats
+        tri = self.triangles
+        v0, v1, v2 = tri[:, 0], tri[:, 1], tri[:, 2]
+        cross = np.cross(v1 - v0, v2 - v0)
+        surface_area = 0.5 * np.linalg.norm(cross, axis=1).sum()
+        volume = np.einsum("ij,ij->i", v0, np.cross(v1, v2)).sum() / 6.0
+        watertight = bool(np.all(self.edge_counts() == 2))
+        stats = MeshStats(
+            triangle_count=triangle_count,
+            vertex_count=len(self.vertices),
+            bbox_min=self.vertices.min(axis=0).tolist(),
+            bbox_max=self.vertices.max(axis=0).tolist(),
+            volume=float(abs(volume)),
+            surface_area=float(surface_area),
+            watertight=watertight,
+        )
+        return stats
+
+    def cluster(self, cell_size: float) -> "Mesh":
+        """
+        simplify this mesh by vertex clustering
+
+        all vertices within the same cell of a grid with the given cell size
+        are merged into their mean - triangles that collapse and duplicate
+        triangles are dropped
+
+        Args:
+            cell_size (float): the edge length of the grid cells
+
+        Returns:
+            Mesh: the simplified mesh
+        """
+        origin = self.vertices.min(axis=0)
+        cells = np.floor((self.vertices - origin) / cell_size).astype(np.int64)
+        # a scalar cell id is much faster to sort than rows
+        dims = cells.max(axis=0) + 1
+        cell_ids = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+        _, cluster, counts = np.unique(
+            cell_ids, return_inverse=True, return_counts=True
+        )
+        cluster = cluster.reshape(-1)
+        sums = np.zeros((len(counts), 3), dtype=np.float64)
+        np.add.at(sums, cluster, self.vertices)
+        vertices = sums / counts[:, None]
+        faces = cluster[self.faces]
+        keep = (
+            (faces[:, 0] != faces[:, 1])
+            & (faces[:, 1] != faces[:, 2])
+            & (faces[:, 2] != faces[:, 0])
+        )
+        faces = faces[keep]
+        # rotate each face to start with its smallest index keeping the orientation
+        shift = faces.argmin(axis=1)
+        rows = np.arange(len(faces))[:, None]
+        canonical = faces[rows, (shift[:, None] + np.arange(3)) % 3]
+        n = len(counts)
+        if n**3 < 2**63:
+            face_ids = (canonical[:, 0] * n + canonical[:, 1]) * n + canonical[:, 2]
+            _, first = np.unique(face_ids, return_index=True)
+        else:
+            _, first = np.unique(canonical, axis=0, return_index=True)
+        faces = canonical[np.sort(first)]
+        # drop the vertices that are not referenced any more
+        used, faces = np.unique(faces, return_inverse=True)
+        mesh = Mesh(vertices[used], faces.reshape(-1, 3))
+        return mesh
+
+    def decimate(self, target_triangles: int, max_resolution: int = 2048) -> "Mesh":
+        """
+        reduce this mesh to at most the given number of triangles by
+        vertex clustering on the finest grid that meets the budget
+
+        Args:
+            target_triangles (int): the triangle budget
+            max_resolution (int): the maximum number of grid cells along the longest bounding box edge
+
+        Returns:
+            Mesh: the decimated mesh - myself if I am already within the budget
+        """
+        if len(self.faces) <= target_triangles:
+            return self
+        extent = float((self.vertices.max(axis=0) - self.vertices.min(axis=0)).max())
+        if extent <= 0:
+            return Mesh(self.vertices[:0], self.faces[:0])
+        # a single cell collapses all triangles so there always is a solution
+        best = None
+        low, high = 1, max_resolution
+        # binary search for the finest resolution within the budget
+        while low <= high:
+            resolution = (low + high) // 2
+            # slightly enlarge the cells to keep the maximum on the grid
+            mesh = self.cluster(extent * (1 + 1e-9) / resolution)
+            if len(mesh.faces) <= target_triangles:
+                best = mesh
+                low = resolution + 1
+            else:
+                high = resolution - 1
+        return best
+
+    def save_binary_stl(self, stl_path: str, header: str = "nicescad"):
+        """
+        save this mesh as a binary STL file
+
+        Args:
+            stl_path (str): the path of the STL file
+            header (str): the header text
+        """
+        tri = self.triangles
+        records = np.zeros(len(tri), dtype=STL_TRIANGLE_DTYPE)
+        cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        norms = np.linalg.norm(cross, axis=1, keepdims=True)
+        records["normal"] = np.divide(
+            cross, norms, out=np.zeros_like(cross), where=norms > 0
+        )
+        records["vertices"] = tri
+        with open(stl_path, "wb") as stl_file:
+            stl_file.write(
+                header.encode()[:STL_HEADER_SIZE].ljust(STL_HEADER_SIZE, b"\0")
+            )
+            stl_file.write(np.uint32(len(tri)).tobytes())
+            stl_file.write(records.tobytes())
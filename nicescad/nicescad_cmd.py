@@ -6,9 +6,12 @@ Created on 2023-07-19
 
 import sys
 from argparse import ArgumentParser
+from pathlib import Path
 
 from ngwidgets.cmd import WebserverCmd
 
+from nicescad.batch_render import BatchRenderer, BatchRenderResult
+from nicescad.openscad import OpenScad
 from nicescad.webserver import NiceScadWebServer
 
 
@@ -30,20 +33,123 @@ class NiceScadCmd(WebserverCmd):
         override the default argparser call
         """
         parser = super().getArgParser(description, version_msg)
-        parser.add_argument(
-            "-v",
-            "--verbose",
-            action="store_true",
-            help="show verbose output [default: %(default)s]",
-        )
         parser.add_argument(
             "-rp",
             "--root_path",
             default=NiceScadWebServer.examples_path(),
             help="path to scad files [default: %(default)s]",
         )
+        parser.add_argument(
+            "--render_workers",
+            type=int,
+            help="maximum number of concurrent openscad renders [default: number of cpus]",
+        )
+        parser.add_argument(
+            "--render_queue",
+            type=int,
+            default=100,
+            help="maximum number of waiting render jobs [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--render_timeout",
+            type=float,
+            default=120.0,
+            help="wall clock and cpu time limit of a render in seconds [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--warm_workers",
+            type=int,
+            default=0,
+            help="number of pre-started openscad processes to keep per render mode - 0 to start openscad per render [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--live_delay",
+            type=float,
+            default=1.0,
+            help="idle time in seconds after typing before a live preview is rendered [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--no_prerender",
+            action="store_true",
+            help="do not prerender the examples and stored designs at startup",
+        )
+        parser.add_argument(
+            "--prerender_interval",
+            type=float,
+            default=0,
+            help="seconds between refreshes of the prerendered examples and designs - 0 to prerender at startup only [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--render_dir",
+            help="render all .scad and BlockSCAD .xml files below the given directory instead of starting the webserver",
+        )
+        parser.add_argument(
+            "--output_dir",
+            default=str(Path.home() / ".nicescad" / "render"),
+            help="directory for the results of --render_dir [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--format",
+            default="stl",
+            help="output format of --render_dir e.g. stl, 3mf, off or amf [default: %(default)s]",
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="number of parallel renders of --render_dir [default: number of cpus]",
+        )
+        parser.add_argument(
+            "--summary",
+            help="path of the json summary of --render_dir [default: summary.json in the output directory]",
+        )
         return parser
 
+    def handle_args(self, args) -> bool:
+        """
+        handle the batch rendering or start the webserver
+        """
+        if getattr(args, "render_dir", None):
+            # skip starting the webserver
+            super(WebserverCmd, self).handle_args(args)
+            self.render_dir(args)
+            return True
+        handled = super().handle_args(args)
+        return handled
+
+    def render_dir(self, args):
+        """
+        render all files below args.render_dir and write the summary
+
+        Args:
+            args: the command line arguments
+        """
+        oscad = OpenScad()
+        renderer = BatchRenderer(
+            oscad,
+            root_path=args.render_dir,
+            output_dir=args.output_dir,
+            export_format=args.format,
+            workers=args.jobs,
+            force=args.force,
+        )
+
+        def show(result: BatchRenderResult):
+            if not args.quiet and (args.verbose or result.status == result.FAILED):
+                msg = f"{result.status:8} {result.seconds:6.1f}s {result.input_path}"
+                if result.error:
+                    msg += f"\n{result.error}"
+                print(msg, flush=True)
+
+        summary = renderer.run(summary_path=args.summary, on_result=show)
+        if not args.quiet:
+            print(
+                f"{summary['total']} files: {summary['rendered']} rendered, {summary['cached']} cached, "
+                f"{summary['skipped']} skipped, {summary['failed']} failed in {summary['seconds']:.1f}s"
+            )
+        if summary["failed"] > 0:
+            self.exit_code = 1
+
 
 def main(argv: list = None):
     """
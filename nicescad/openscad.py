@@ -6,61 +6,41 @@ Created on 2023-07-19
 This module contains the class OpenScad, a wrapper for OpenScad.
 """
 
+import asyncio
+import atexit
+import glob
+import hashlib
 import os
 import platform
+import re
+import shutil
 import tempfile
-from typing import Awaitable
-
-from pygments import highlight
-from pygments.formatters.html import HtmlFormatter
-from pygments.lexer import RegexLexer
-from pygments.token import (
-    Comment,
-    Keyword,
-    Name,
-    Number,
-    Operator,
-    Punctuation,
-    String,
-    Text,
-)
-
-from nicescad.process import Subprocess
-
-
-class OpenSCADLexer(RegexLexer):
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from nicescad.dependencies import DependencyGraph
+from nicescad.highlighter import OpenSCADLexer  # noqa: F401
+from nicescad.highlighter import ScadHighlighter
+from nicescad.mesh import Mesh, MeshStats
+from nicescad.openscad_pool import OpenScadWorkerPool
+from nicescad.process import ResourceLimits, Subprocess
+from nicescad.render_cache import RenderCache
+from nicescad.scad_validator import ScadValidator, ValidationIssue
+
+
+class OpenScadError(Exception):
     """
-    Lexer for OpenSCAD, a language for creating solid 3D CAD models.
+    raised when openscad fails to render a design
 
     Attributes:
-        name (str): The name of the lexer.
-        aliases (list of str): A list of strings that can be used as aliases for the lexer.
-        filenames (list of str): A list of strings that define filename patterns that match this lexer.
+        returncode (int): the return code of openscad
+        stderr (str): the error output of openscad
     """
 
-    name = "OpenSCAD"
-    aliases = ["openscad"]
-    filenames = ["*.scad"]
-
-    tokens = {
-        "root": [
-            (r"\s+", Text.Whitespace),
-            (r"//.*?$", Comment.Single),
-            (r"/\*.*?\*/", Comment.Multiline),
-            (r"[a-z_][\w]*", Name.Variable),
-            (r"\d+", Number.Integer),
-            (r"\+\+|--", Operator),
-            (r"[=+\-*/%&|^<>!]=?", Operator),
-            (r"[\[\]{}();,.]", Punctuation),
-            (r'"(\\\\|\\"|[^"])*"', String),
-            (r"\b(module|if|else|for|let|echo)\b", Keyword),
-            (r"\b(true|false|undef)\b", Keyword.Constant),
-            (
-                r"\b(cube|sphere|cylinder|polyhedron|square|circle|polygon|import|scale|resize|color|offset|minkowski|hull|render|surface|rotate|translate|mirror|multmatrix|projection|rotate_extrude|linear_extrude)\b",
-                Name.Builtin,
-            ),
-        ],
-    }
+    def __init__(self, msg: str, returncode: int = None, stderr: str = ""):
+        super().__init__(msg)
+        self.returncode = returncode
+        self.stderr = stderr
 
 
 class OpenScad:
@@ -68,41 +48,139 @@ class OpenScad:
     A wrapper for OpenScad (https://openscad.org/).
     """
 
+    # prefix of the per render scratch files and of owned temporary directories
+    SCRATCH_PREFIX = "nicescad_"
+    # scratch files older than this (in seconds) are considered stale
+    SCRATCH_MAX_AGE = 3600
+    # render modes
+    FINAL = "final"
+    PREVIEW = "preview"
+    # tokens to compare code by - comments and whitespace do not change a design
+    TOKEN_PATTERN = re.compile(
+        r'(?P<string>"(?:\\.|[^"\\])*")|(?P<comment>//[^\n]*|/\*.*?\*/)|(?P<space>\s+)|(?P<other>[^"\s/]+|.)',
+        re.DOTALL,
+    )
+
     def __init__(self, scad_prepend: str = "", **kw) -> None:
         """
         Initializes the OpenScad object.
+
+        Args:
+            scad_prepend (str): OpenSCAD code to prepend to each design
+            **kw: optional openscad_exec, render_cache (a RenderCache or None to disable caching),
+                  limits (ResourceLimits for each render - default from OPENSCAD_TIMEOUT,
+                  OPENSCAD_CPU_LIMIT and OPENSCAD_MEMORY_LIMIT) and lod_budgets
+                  (the triangle budgets of the level of detail meshes), image_size
+                  (width and height of png images) and dependency_graph
+                  (the DependencyGraph of the files rendered in place)
         """
         self.scad_prepend = scad_prepend
         self.openscad_exec = None
         self.openscad_tmp_dir = None
+        self.openscad_version = None
         if "OPENSCAD_EXEC" in os.environ:
             self.openscad_exec = os.environ["OPENSCAD_EXEC"]
         if "OPENSCAD_TMP_DIR" in os.environ:
             self.openscad_tmp_dir = os.environ["OPENSCAD_TMP_DIR"]
         if self.openscad_tmp_dir is not None:
             self.tmp_dir = self.openscad_tmp_dir
+            self.cleanup_stale_scratch_files()
         else:
-            self.tmp_dir = tempfile.mkdtemp()
+            OpenScad.cleanup_orphaned_tmp_dirs()
+            self.tmp_dir = tempfile.mkdtemp(
+                prefix=f"{OpenScad.SCRATCH_PREFIX}{os.getpid()}_"
+            )
+            atexit.register(shutil.rmtree, self.tmp_dir, ignore_errors=True)
         if "openscad_exec" in kw:
             self.openscad_exec = kw["openscad_exec"]
         if self.openscad_exec is None:
             self._try_detect_openscad_exec()
         if self.openscad_exec is None:
             raise Exception("openscad exec not found!")
+        if "render_cache" in kw:
+            self.render_cache = kw["render_cache"]
+        else:
+            cache_dir = os.environ.get("OPENSCAD_CACHE_DIR", None)
+            self.render_cache = RenderCache(cache_dir)
+        self.limits = kw.get("limits", ResourceLimits.from_env())
+        # write binary instead of ascii stl files - about 5 times smaller
+        self.binary_stl = kw.get("binary_stl", True)
+        # special variable overrides for the fast preview mode
+        self.preview_overrides = {"$fn": 12, "$fa": 12, "$fs": 2}
+        # triangle budgets of the decimated level of detail meshes for the viewer
+        self.lod_budgets = kw.get("lod_budgets", [20000, 200000])
+        # width and height of png images e.g. thumbnails
+        self.image_size = kw.get("image_size", (256, 256))
+        # optional pool of warm openscad processes - see start_worker_pool
+        self.worker_pool = None
+        # cached syntax highlighting for the code view
+        self.highlighter = ScadHighlighter()
+        # include/use dependencies of the designs rendered in place - the libraries
+        # of the installation e.g. MCAD are searched after the user's ones
+        library_paths = self.installation_library_paths()
+        self.dependency_graph = kw.get("dependency_graph") or DependencyGraph(
+            DependencyGraph.default_library_paths() + library_paths
+        )
+        # static checks before rendering
+        self.validator = ScadValidator(self.dependency_graph, library_paths)
 
     def highlight_code(self, code: str) -> str:
         """
         Highlights the provided OpenSCAD code and returns the highlighted code in HTML format.
 
+        Unchanged code and unchanged parts of the code are served from the cache of my highlighter.
+
         Args:
             code (str): The OpenSCAD code to highlight.
 
         Returns:
             str: The input OpenSCAD code, highlighted and formatted as an HTML string.
         """
-        html = highlight(code, OpenSCADLexer(), HtmlFormatter())
+        html = self.highlighter.highlight(code)
         return html
 
+    def installation_library_paths(self) -> List[str]:
+        """
+        get the library directories that come with the OpenScad installation e.g. MCAD
+
+        Returns:
+            List[str]: the existing library directories next to the executable
+        """
+        exec_dir = os.path.dirname(os.path.realpath(self.openscad_exec))
+        candidates = [
+            os.path.join(exec_dir, "..", "share", "openscad", "libraries"),
+            os.path.join(exec_dir, "..", "Resources", "libraries"),
+            os.path.join(exec_dir, "libraries"),
+        ]
+        paths = [os.path.abspath(path) for path in candidates if os.path.isdir(path)]
+        return paths
+
+    def validate(
+        self, openscad_str: str, source_path: str = None, base_dir: str = None
+    ) -> List[ValidationIssue]:
+        """
+        check the given code in process before spending a render on it
+
+        Args:
+            openscad_str (str): The OpenSCAD code.
+            source_path(str): optional file containing the code to render in place
+            base_dir(str): optional directory to resolve relative include/use names in -
+                defaults to the directory the code is rendered from
+
+        Returns:
+            List[ValidationIssue]: the problems found - empty if the code looks renderable
+        """
+        if base_dir is None and source_path is not None:
+            base_dir = os.path.dirname(os.path.abspath(source_path))
+        elif base_dir is None:
+            # the code is rendered from a scratch file in the tmp dir
+            base_dir = self.tmp_dir
+        prelude = ""
+        if self.prepare_source(openscad_str) != openscad_str:
+            prelude = self.scad_prepend
+        issues = self.validator.validate(openscad_str, base_dir, prelude)
+        return issues
+
     def _try_executable(self, executable_path: str) -> None:
         """
         Checks if the specified path is a file. If it is, sets it as the OpenScad executable.
@@ -139,9 +217,192 @@ class OpenScad:
                 )
             )
 
+    async def get_version_async(self) -> str:
+        """
+        get the version of the OpenScad executable - the result is remembered
+
+        Returns:
+            str: the version string as reported by openscad --version
+        """
+        if self.openscad_version is None:
+            result = await Subprocess.run_async([self.openscad_exec, "--version"])
+            # openscad reports its version on stderr
+            version = (result.stdout + result.stderr).strip()
+            self.openscad_version = version if result.returncode == 0 else "unknown"
+        return self.openscad_version
+
+    def supports_manifold(self) -> bool:
+        """
+        check whether the (already detected) openscad version
+        supports the fast manifold geometry backend
+
+        Returns:
+            bool: True if --backend=manifold is available
+        """
+        match = re.search(r"(\d{4})\.\d+", self.openscad_version or "")
+        supported = match is not None and int(match.group(1)) >= 2024
+        return supported
+
+    @classmethod
+    def content_hash(cls, openscad_str: str) -> str:
+        """
+        get a hash of the given code that ignores comments and whitespace
+
+        Args:
+            openscad_str (str): the OpenSCAD code
+
+        Returns:
+            str: the sha256 hex digest - equal for effectively unchanged code
+        """
+
+        tokens = []
+        separated = False
+        for match in cls.TOKEN_PATTERN.finditer(openscad_str):
+            if match.lastgroup in ("comment", "space"):
+                separated = True
+                continue
+            token = match.group()
+            # whitespace is only needed between words e.g. in "module m"
+            if separated and tokens and re.match(r"[\w$]", token[0]):
+                if re.match(r"[\w$]", tokens[-1][-1]):
+                    tokens.append(" ")
+            tokens.append(token)
+            separated = False
+        normalized = "".join(tokens)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def prepare_source(self, openscad_str: str, do_prepend: bool = True) -> str:
+        """
+        get the OpenSCAD source that is actually rendered for the given code
+
+        The `scad_prepend` string is prepended to the OpenSCAD code
+        unless the OpenSCAD code contains the string '//!OpenSCAD', or `do_prepend`
+        is set to `False`.
+
+        Args:
+            openscad_str (str): The OpenSCAD code.
+            do_prepend (bool, optional): If `True`, the `scad_prepend` string is
+                                          prepended to the OpenSCAD code. Defaults to `True`.
+
+        Returns:
+            str: the effective OpenSCAD source
+        """
+        source = openscad_str
+        if do_prepend and "//!OpenSCAD" not in openscad_str:
+            source = self.scad_prepend + openscad_str
+        return source
+
+    async def get_cache_key_async(
+        self,
+        openscad_str: str,
+        stl_path: str,
+        mode: str = FINAL,
+        source_path: str = None,
+    ) -> str:
+        """
+        get the render cache key for the given code and output path
+
+        Args:
+            openscad_str (str): The OpenSCAD code.
+            stl_path(str): The path to the output file - its suffix defines the output format
+            mode(str): the render mode - final or preview
+            source_path(str): the file the code is rendered from in place (if any)
+
+        Returns:
+            str: the cache key
+        """
+        version = await self.get_version_async()
+        parts = []
+        source = self.prepare_source(openscad_str)
+        if source_path is not None:
+            # relative includes depend on the location of the file and
+            # the result on the content of all included files
+            fingerprint = await asyncio.to_thread(
+                self.dependency_graph.fingerprint, source_path
+            )
+            parts.extend([os.path.abspath(source_path), fingerprint])
+        output_format = os.path.splitext(stl_path)[1]
+        options = " ".join(self.get_options(stl_path, mode))
+        key = RenderCache.compute_key(source, output_format, version, options, *parts)
+        return key
+
+    def get_options(self, stl_path: str, mode: str = FINAL) -> List[str]:
+        """
+        get the openscad command line options for rendering to the given path
+
+        The output format is derived by openscad from the suffix of the
+        output path e.g. .stl, .3mf, .off or .amf - .stl files are
+        written in binary format if binary_stl is set. .png images of
+        image_size show the whole design.
+
+        In preview mode the special variables are overridden with the
+        reduced `preview_overrides` and the manifold backend is used if available.
+        -D assignments are appended to the design by openscad and
+        therefore override assignments of the design.
+
+        Args:
+            stl_path(str): The path to the output file.
+            mode(str): the render mode - final or preview
+
+        Returns:
+            List[str]: the options (without input and output file)
+        """
+        options = []
+        if self.binary_stl and stl_path.lower().endswith(".stl"):
+            options.extend(["--export-format", "binstl"])
+        if stl_path.lower().endswith(".png"):
+            width, height = self.image_size
+            options.extend([f"--imgsize={width},{height}", "--viewall", "--autocenter"])
+        if mode == OpenScad.PREVIEW:
+            if self.supports_manifold():
+                options.append("--backend=manifold")
+            for name, value in self.preview_overrides.items():
+                options.extend(["-D", f"{name}={value}"])
+        return options
+
+    @classmethod
+    def cleanup_orphaned_tmp_dirs(cls):
+        """
+        remove temporary directories left behind by crashed nicescad processes
+
+        owned temporary directories carry the process id in their name -
+        the directories of processes that are no longer alive are removed
+        """
+        if os.name != "posix":
+            return
+        pattern = os.path.join(tempfile.gettempdir(), f"{cls.SCRATCH_PREFIX}*_*")
+        for tmp_dir in glob.glob(pattern):
+            pid_str = os.path.basename(tmp_dir)[len(cls.SCRATCH_PREFIX) :].split("_")[0]
+            if not os.path.isdir(tmp_dir) or not pid_str.isdigit():
+                continue
+            try:
+                os.kill(int(pid_str), 0)
+            except ProcessLookupError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            except PermissionError:
+                # alive but owned by somebody else
+                pass
+
+    def cleanup_stale_scratch_files(self):
+        """
+        remove scratch files older than SCRATCH_MAX_AGE from my tmp_dir
+        e.g. after a crash
+        """
+        pattern = os.path.join(self.tmp_dir, f"{OpenScad.SCRATCH_PREFIX}*.scad")
+        now = time.time()
+        for scratch_file in glob.glob(pattern):
+            try:
+                if now - os.path.getmtime(scratch_file) > OpenScad.SCRATCH_MAX_AGE:
+                    os.remove(scratch_file)
+            except FileNotFoundError:
+                pass
+
     def write_to_tmp_file(self, openscad_str: str, do_prepend: bool = True):
         """
-        Writes an OpenSCAD string to a temporary file.
+        Writes an OpenSCAD string to a unique temporary scratch file.
+
+        Each call gets its own file so that concurrent renders do not
+        overwrite each other's source.
 
         The `scad_prepend` string is prepended to the OpenSCAD code before writing,
         unless the OpenSCAD code contains the string '//!OpenSCAD', or `do_prepend`
@@ -156,15 +417,39 @@ class OpenScad:
             str: The path to the temporary file where the OpenSCAD code (and
                  possibly the `scad_prepend` string) was written.
         """
-        scad_tmp_file = os.path.join(self.tmp_dir, "tmp.scad")
-        with open(scad_tmp_file, "w") as of:
-            if do_prepend and "//!OpenSCAD" not in openscad_str:
-                of.write(self.scad_prepend)
-            of.write(openscad_str)
+        fd, scad_tmp_file = tempfile.mkstemp(
+            prefix=OpenScad.SCRATCH_PREFIX, suffix=".scad", dir=self.tmp_dir
+        )
+        with os.fdopen(fd, "w") as of:
+            of.write(self.prepare_source(openscad_str, do_prepend))
         return scad_tmp_file
 
+    def write_wrapper_file(self, openscad_str: str, source_path: str) -> Optional[str]:
+        """
+        write a scratch file that applies the `scad_prepend` string to a design
+        that is rendered in place - the design is included by its absolute path
+        since openscad resolves relative includes and imports relative to the
+        file they appear in
+
+        Args:
+            openscad_str (str): The OpenSCAD code of the design.
+            source_path (str): the file containing the code
+
+        Returns:
+            Optional[str]: the path of the scratch file or None if nothing is prepended
+        """
+        if self.prepare_source(openscad_str) == openscad_str:
+            return None
+        include = f"\ninclude <{os.path.abspath(source_path)}>\n"
+        return self.write_to_tmp_file(include)
+
     async def render_to_file_async(
-        self, openscad_str: str, stl_path: str
+        self,
+        openscad_str: str,
+        stl_path: str,
+        on_progress: Callable[[str], None] = None,
+        mode: str = FINAL,
+        source_path: str = None,
     ) -> Awaitable[Subprocess]:
         """
         Asynchronously renders an OpenSCAD string to a file.
@@ -172,22 +457,153 @@ class OpenScad:
         Args:
             openscad_str (str): The OpenSCAD code.
             stl_path(str): The path to the output file.
+            on_progress(Callable): optional callback for each line of openscad's progress output (stderr)
+            mode(str): the render mode - final or the faster, coarser preview
+            source_path(str): optional file containing the code to render in place
+                so that relative includes and imports are resolved
 
         Returns:
             Subprocess: the openscad execution result
         """
+        if mode == OpenScad.PREVIEW:
+            # the backend option depends on the version
+            await self.get_version_async()
+        options = self.get_options(stl_path, mode)
+        if source_path is not None:
+            wrapper_file = self.write_wrapper_file(openscad_str, source_path)
+            input_path = wrapper_file or source_path
+            cmd = [self.openscad_exec, *options, "-o", stl_path, input_path]
+            result = await Subprocess.run_async(
+                cmd, limits=self.limits, on_stderr=on_progress, umask=0o077
+            )
+            if wrapper_file is not None:
+                self.cleanup_tmp_file(result, wrapper_file)
+            result.stl_path = stl_path
+            return result
+        if self.worker_pool is not None:
+            source = self.prepare_source(openscad_str, True)
+            result = await self.worker_pool.render_async(
+                source, options, stl_path, on_progress=on_progress
+            )
+            result.stl_path = stl_path
+            return result
         scad_tmp_file = self.write_to_tmp_file(openscad_str)
 
         # now run openscad to generate stl:
-        cmd = [self.openscad_exec, "-o", stl_path, scad_tmp_file]
-        self.saved_umask = os.umask(0o077)
-        result = await Subprocess.run_async(cmd)
-        os.umask(self.saved_umask)
+        cmd = [self.openscad_exec, *options, "-o", stl_path]
+        cmd.append(scad_tmp_file)
+        # the umask is set in the child process only
+        result = await Subprocess.run_async(
+            cmd, limits=self.limits, on_stderr=on_progress, umask=0o077
+        )
 
         self.cleanup_tmp_file(result, scad_tmp_file)
         result.stl_path = stl_path
         return result
 
+    async def render_to_stream_async(
+        self,
+        openscad_str: str,
+        export_format: str = "binstl",
+        mode: str = FINAL,
+        chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+        """
+        render the given OpenSCAD string and yield the result as it is written
+        to openscad's standard output - no result file is written
+
+        Nothing is yielded before openscad has started writing its result, so
+        a failed render raises before the first chunk.
+
+        Args:
+            openscad_str (str): The OpenSCAD code.
+            export_format (str): the openscad export format e.g. binstl, asciistl, 3mf, off or amf
+            mode (str): the render mode - final or the faster, coarser preview
+            chunk_size (int): the maximum size of the yielded chunks
+
+        Yields:
+            bytes: the chunks of the result
+
+        Raises:
+            OpenScadError: if openscad failed or was killed
+        """
+        if mode == OpenScad.PREVIEW:
+            await self.get_version_async()
+        options = self.get_options("", mode)
+        options.extend(["--export-format", export_format])
+        scad_tmp_file = self.write_to_tmp_file(openscad_str)
+        cmd = [self.openscad_exec, *options, "-o", "-", scad_tmp_file]
+        loop = asyncio.get_running_loop()
+        deadline = None
+        if self.limits.timeout is not None:
+            deadline = loop.time() + self.limits.timeout
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=Subprocess.preexec_fn(self.limits, 0o077),
+        )
+        # drain stderr concurrently to avoid a pipe deadlock
+        stderr_task = asyncio.ensure_future(proc.stderr.read())
+        try:
+            while True:
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                try:
+                    chunk = await asyncio.wait_for(
+                        proc.stdout.read(chunk_size), timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise OpenScadError(
+                        f"wall clock time limit of {self.limits.timeout} s exceeded"
+                    )
+                if not chunk:
+                    break
+                yield chunk
+            await proc.wait()
+            stderr = (await stderr_task).decode(errors="replace")
+            if proc.returncode != 0:
+                kill_reason = self.limits.kill_reason(proc.returncode, stderr)
+                msg = (
+                    kill_reason or f"openscad failed with return code {proc.returncode}"
+                )
+                raise OpenScadError(msg, proc.returncode, stderr)
+        finally:
+            await Subprocess.kill_async(proc)
+            stderr_task.cancel()
+            if os.path.isfile(scad_tmp_file):
+                os.remove(scad_tmp_file)
+
+    def start_worker_pool(self, size: int = 2, max_idle: float = 600) -> bool:
+        """
+        render with warm openscad processes from now on to save the
+        process startup time - needs named pipes i.e. a POSIX system
+
+        Args:
+            size (int): the number of idle workers to keep per render mode
+            max_idle (float): the time in seconds after which idle workers are recycled
+
+        Returns:
+            bool: True if the worker pool has been started
+        """
+        if not OpenScadWorkerPool.is_supported():
+            return False
+        self.worker_pool = OpenScadWorkerPool(
+            self.openscad_exec,
+            work_dir=self.tmp_dir,
+            size=size,
+            max_idle=max_idle,
+            limits=self.limits,
+        )
+        return True
+
+    async def prewarm_async(self):
+        """
+        start the idle workers for the final stl render mode
+        """
+        if self.worker_pool is not None:
+            options = self.get_options("result.stl", OpenScad.FINAL)
+            await self.worker_pool.refill_async(options, ".stl")
+
     def cleanup_tmp_file(self, result, scad_tmp_file):
         """
         Cleanup temporary files after subprocess execution.
@@ -203,17 +619,187 @@ class OpenScad:
             result.scad_tmp_file = scad_tmp_file
 
     async def openscad_str_to_file(
-        self, openscad_str: str, stl_path: str
+        self,
+        openscad_str: str,
+        stl_path: str,
+        on_progress: Callable[[str], None] = None,
+        mode: str = FINAL,
+        source_path: str = None,
+        mesh_stats: bool = True,
     ) -> Subprocess:
         """
         Renders the OpenSCAD code to a file.
 
+        If a render cache is available the result of an earlier render
+        of the same input is used without running openscad again.
+
+        For successfully rendered stl files the mesh statistics are
+        available as mesh_stats of the result.
+
         Args:
             openscad_str (str): The OpenSCAD code.
             stl_path(str): the path to the stl file
+            on_progress(Callable): optional callback for each line of openscad's progress output
+            mode(str): the render mode - final or the faster, coarser preview
+            source_path(str): optional file containing the code to render in place
+            mesh_stats(bool): if False only statistics kept in the render cache are
+                set so that the result is not delayed by analyzing a large mesh
 
         Returns:
             Subprocess: The result of the subprocess run, encapsulated in a Subprocess object.
         """
-        result = await self.render_to_file_async(openscad_str, stl_path)
+        cache = self.render_cache
+        if cache is None:
+            result = await self.render_to_file_async(
+                openscad_str, stl_path, on_progress, mode, source_path
+            )
+            result.cache_hit = False
+            result.mesh_stats = None
+            if mesh_stats:
+                result.mesh_stats = await self.get_mesh_stats_async(result)
+            return result
+        key = await self.get_cache_key_async(openscad_str, stl_path, mode, source_path)
+        suffix = os.path.splitext(stl_path)[1]
+        if cache.fetch(key, suffix, stl_path):
+            result = Subprocess(
+                stdout="",
+                stderr=f"render cache hit {key}\n",
+                cmd=[],
+                returncode=0,
+            )
+            result.stl_path = stl_path
+            result.cache_hit = True
+        else:
+            result = await self.render_to_file_async(
+                openscad_str, stl_path, on_progress, mode, source_path
+            )
+            result.cache_hit = False
+            if result.returncode == 0 and os.path.isfile(stl_path):
+                cache.store(key, suffix, stl_path)
+        result.cache_key = key
+        result.mesh_stats = await self.get_mesh_stats_async(
+            result, cached_only=not mesh_stats
+        )
         return result
+
+    async def load_mesh_async(self, result: Subprocess) -> Mesh:
+        """
+        load the stl file of the given render result in a worker thread - only
+        once so that the statistics and the levels of detail share the mesh
+
+        Args:
+            result (Subprocess): the render result
+
+        Returns:
+            Mesh: the mesh
+
+        Raises:
+            ValueError: if the stl file can not be parsed
+        """
+        mesh = getattr(result, "mesh", None)
+        if mesh is None:
+            mesh = await asyncio.to_thread(Mesh.load, result.stl_path)
+            result.mesh = mesh
+        return mesh
+
+    async def get_mesh_stats_async(
+        self, result: Subprocess, cached_only: bool = False
+    ) -> Optional[MeshStats]:
+        """
+        get the mesh statistics for the given render result
+
+        the statistics are computed once in a worker thread and kept
+        as meta data in the render cache
+
+        Args:
+            result (Subprocess): the render result
+            cached_only (bool): only look up statistics kept in the render cache
+
+        Returns:
+            Optional[MeshStats]: the statistics or None if there is no stl result
+        """
+        stl_path = getattr(result, "stl_path", None)
+        if (
+            result.returncode != 0
+            or not stl_path
+            or not stl_path.lower().endswith(".stl")
+            or not os.path.isfile(stl_path)
+        ):
+            return None
+        key = getattr(result, "cache_key", None)
+        cache = self.render_cache
+        if cache is not None and key is not None:
+            meta = cache.lookup_meta(key)
+            if meta and "mesh_stats" in meta:
+                return MeshStats.from_dict(meta["mesh_stats"])
+        if cached_only:
+            return None
+        try:
+            mesh = await self.load_mesh_async(result)
+            mesh_stats = await asyncio.to_thread(mesh.stats)
+        except (OSError, ValueError):
+            # e.g. an stl file in an unexpected format - the statistics are optional
+            return None
+        if cache is not None and key is not None:
+            cache.store_meta(key, {"mesh_stats": mesh_stats.to_dict()})
+        return mesh_stats
+
+    def lod_path(self, stl_path: str, budget: int) -> str:
+        """
+        get the path of the level of detail mesh for the given stl file and budget
+
+        Args:
+            stl_path (str): the path of the full resolution stl file
+            budget (int): the triangle budget of the level
+
+        Returns:
+            str: the path of the decimated stl file
+        """
+        stem, ext = os.path.splitext(stl_path)
+        path = f"{stem}_lod{budget}{ext}"
+        return path
+
+    async def create_lods_async(
+        self, result: Subprocess, cached_only: bool = False
+    ) -> List[str]:
+        """
+        create decimated level of detail meshes for the given render result
+
+        only levels with a budget below the triangle count of the full
+        resolution mesh are created - decimated meshes are kept in the
+        render cache as well
+
+        Args:
+            result (Subprocess): the render result with mesh_stats
+            cached_only (bool): only fetch levels kept in the render cache - an empty list
+                unless all of them are available
+
+        Returns:
+            List[str]: the paths of the decimated stl files, coarsest first
+        """
+        mesh_stats = getattr(result, "mesh_stats", None)
+        if mesh_stats is None:
+            return []
+        budgets = sorted(
+            budget for budget in self.lod_budgets if budget < mesh_stats.triangle_count
+        )
+        lod_paths = []
+        cache = self.render_cache
+        key = getattr(result, "cache_key", None)
+        for budget in budgets:
+            lod_path = self.lod_path(result.stl_path, budget)
+            lod_key = None
+            if cache is not None and key is not None:
+                lod_key = RenderCache.compute_key(key, "lod", budget)
+                if cache.fetch(lod_key, ".stl", lod_path):
+                    lod_paths.append(lod_path)
+                    continue
+            if cached_only:
+                return []
+            mesh = await self.load_mesh_async(result)
+            lod_mesh = await asyncio.to_thread(mesh.decimate, budget)
+            await asyncio.to_thread(lod_mesh.save_binary_stl, lod_path)
+            if lod_key is not None:
+                cache.store(lod_key, ".stl", lod_path)
+            lod_paths.append(lod_path)
+        return lod_paths
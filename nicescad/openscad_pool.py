@@ -0,0 +1,364 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+a pool of pre-started OpenSCAD processes to hide the process startup latency
+"""
+
+import asyncio
+import atexit
+import ctypes
+import errno
+import os
+import shutil
+import signal
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from nicescad.process import ResourceLimits, Subprocess
+
+
+@dataclass
+class OpenScadWorker:
+    """
+    a started openscad process waiting for its input on a named pipe
+
+    Attributes:
+        proc: the openscad process
+        cmd (List[str]): the command line of the process
+        work_dir (str): the private directory of the worker
+        input_path (str): the named pipe openscad reads the design from
+        output_path (str): the file openscad writes the result to
+        started (float): the start time of the process
+        loop: the event loop the process is attached to
+    """
+
+    proc: asyncio.subprocess.Process
+    cmd: List[str]
+    work_dir: str
+    input_path: str
+    output_path: str
+    started: float = field(default_factory=time.time)
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+
+    @property
+    def alive(self) -> bool:
+        """
+        is my process still running?
+        """
+        return self.proc.returncode is None
+
+
+@dataclass
+class WorkerPoolStats:
+    """
+    counters of an OpenScadWorkerPool
+    """
+
+    warm: int = 0
+    cold: int = 0
+    spawned: int = 0
+    recycled: int = 0
+
+
+class OpenScadWorkerPool:
+    """
+    Keeps started openscad processes ready for the next render.
+
+    OpenSCAD can not be fed a second design once it has rendered, but most
+    of its startup (loading the Qt and CGAL libraries, font and library
+    setup) happens before it opens its input file. A worker is therefore
+    started with a named pipe as input file and blocks until the source is
+    written to the pipe. Each worker serves exactly one render and is
+    replaced by a fresh one in the background.
+
+    Workers are keyed by their command line options and output suffix.
+    Dead workers and workers idling longer than max_idle are recycled.
+    Named pipes need a POSIX system - see is_supported.
+    """
+
+    def __init__(
+        self,
+        openscad_exec: str,
+        work_dir: str,
+        size: int = 2,
+        max_idle: float = 600,
+        limits: ResourceLimits = None,
+    ):
+        """
+        constructor
+
+        Args:
+            openscad_exec (str): the openscad executable
+            work_dir (str): the directory for the worker directories
+            size (int): the number of idle workers to keep per option set
+            max_idle (float): the maximum time in seconds a worker may wait for input
+            limits (ResourceLimits): the limits for each render
+        """
+        self.openscad_exec = openscad_exec
+        self.work_dir = work_dir
+        self.size = size
+        self.max_idle = max_idle
+        self.limits = limits if limits is not None else ResourceLimits()
+        self.idle: Dict[Tuple, Deque[OpenScadWorker]] = {}
+        self.pending: Dict[Tuple, int] = {}
+        self.stats = WorkerPoolStats()
+        # resolved here since the child process may only call it
+        try:
+            self.prctl = ctypes.CDLL(None).prctl
+        except (OSError, AttributeError):
+            self.prctl = None
+        self.refill_tasks: Set[asyncio.Task] = set()
+        atexit.register(self.kill_idle)
+
+    @staticmethod
+    def is_supported() -> bool:
+        """
+        check whether warm workers are supported on this platform
+        """
+        return os.name == "posix" and hasattr(os, "mkfifo")
+
+    @property
+    def idle_count(self) -> int:
+        """
+        the number of idle workers
+        """
+        count = sum(len(queue) for queue in self.idle.values())
+        return count
+
+    def preexec(self):
+        """
+        prepare the worker process - called in the child process before exec
+        """
+        if self.limits.has_rlimits:
+            self.limits.apply_rlimits()
+        # the umask argument of the process creation is not supported by uvloop
+        os.umask(0o077)
+        if self.prctl is not None:
+            # make sure idle workers do not outlive a crashed server (Linux only)
+            PR_SET_PDEATHSIG = 1
+            self.prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+
+    async def spawn_async(self, options: List[str], suffix: str) -> OpenScadWorker:
+        """
+        start a worker for the given options and output suffix
+
+        Args:
+            options (List[str]): the openscad options (without input and output file)
+            suffix (str): the suffix of the output file e.g. ".stl"
+
+        Returns:
+            OpenScadWorker: the worker waiting for its input
+        """
+        work_dir = tempfile.mkdtemp(prefix="worker_", dir=self.work_dir)
+        input_path = os.path.join(work_dir, "design.scad")
+        output_path = os.path.join(work_dir, f"result{suffix}")
+        os.mkfifo(input_path, 0o600)
+        cmd = [self.openscad_exec, *options, "-o", output_path, input_path]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=self.preexec,
+        )
+        self.stats.spawned += 1
+        worker = OpenScadWorker(
+            proc=proc,
+            cmd=cmd,
+            work_dir=work_dir,
+            input_path=input_path,
+            output_path=output_path,
+            loop=asyncio.get_running_loop(),
+        )
+        return worker
+
+    def is_healthy(self, worker: OpenScadWorker) -> bool:
+        """
+        check whether the given idle worker can still be used
+
+        Args:
+            worker (OpenScadWorker): the worker to check
+
+        Returns:
+            bool: True if the worker is alive and has not been idle too long
+        """
+        healthy = (
+            worker.alive
+            and time.time() - worker.started <= self.max_idle
+            and worker.loop is asyncio.get_running_loop()
+        )
+        return healthy
+
+    async def discard_async(self, worker: OpenScadWorker):
+        """
+        kill the given worker and remove its directory
+
+        Args:
+            worker (OpenScadWorker): the worker to discard
+        """
+        if worker.loop is asyncio.get_running_loop():
+            await Subprocess.kill_async(worker.proc)
+        else:
+            # the process can only be awaited in the loop it was started in
+            self.kill(worker)
+        shutil.rmtree(worker.work_dir, ignore_errors=True)
+
+    def kill(self, worker: OpenScadWorker):
+        """
+        kill the given worker without waiting for it
+
+        Args:
+            worker (OpenScadWorker): the worker to kill
+        """
+        if worker.alive:
+            try:
+                os.kill(worker.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    async def acquire_async(self, options: List[str], suffix: str) -> OpenScadWorker:
+        """
+        get a healthy idle worker for the given options or start a new one
+
+        Args:
+            options (List[str]): the openscad options
+            suffix (str): the suffix of the output file
+
+        Returns:
+            OpenScadWorker: the worker
+        """
+        queue = self.idle.get((tuple(options), suffix))
+        while queue:
+            worker = queue.popleft()
+            if self.is_healthy(worker):
+                self.stats.warm += 1
+                return worker
+            self.stats.recycled += 1
+            await self.discard_async(worker)
+        self.stats.cold += 1
+        worker = await self.spawn_async(options, suffix)
+        return worker
+
+    async def refill_async(self, options: List[str], suffix: str):
+        """
+        start workers until there are size idle workers for the given options
+
+        Args:
+            options (List[str]): the openscad options
+            suffix (str): the suffix of the output file
+        """
+        key = (tuple(options), suffix)
+        queue = self.idle.setdefault(key, deque())
+        while len(queue) + self.pending.get(key, 0) < self.size:
+            self.pending[key] = self.pending.get(key, 0) + 1
+            try:
+                worker = await self.spawn_async(options, suffix)
+            finally:
+                self.pending[key] -= 1
+            queue.append(worker)
+
+    def refill(self, options: List[str], suffix: str):
+        """
+        refill the idle workers for the given options in the background
+
+        Args:
+            options (List[str]): the openscad options
+            suffix (str): the suffix of the output file
+        """
+        task = asyncio.ensure_future(self.refill_async(options, suffix))
+        self.refill_tasks.add(task)
+        task.add_done_callback(self.refill_tasks.discard)
+
+    async def feed_async(self, worker: OpenScadWorker, source: str):
+        """
+        write the given source to the input pipe of the given worker
+
+        Args:
+            worker (OpenScadWorker): the worker
+            source (str): the OpenSCAD source
+
+        Raises:
+            OSError: if the worker died before reading its input
+        """
+        fd = None
+        # a non blocking open fails until openscad has opened the pipe for reading
+        while fd is None:
+            try:
+                fd = os.open(worker.input_path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as ex:
+                if ex.errno != errno.ENXIO or not worker.alive:
+                    raise
+                await asyncio.sleep(0.01)
+        os.set_blocking(fd, True)
+
+        def write():
+            with os.fdopen(fd, "wb") as pipe:
+                pipe.write(source.encode("utf-8"))
+
+        await asyncio.to_thread(write)
+
+    async def render_async(
+        self,
+        source: str,
+        options: List[str],
+        output_path: str,
+        on_progress: Optional[Callable[[str], None]] = None,
+    ) -> Subprocess:
+        """
+        render the given source with a warm worker
+
+        Args:
+            source (str): the complete OpenSCAD source
+            options (List[str]): the openscad options (without input and output file)
+            output_path (str): the path to write the result to
+            on_progress (Callable): optional callback for each line of openscad's progress output
+
+        Returns:
+            Subprocess: the openscad execution result
+        """
+        suffix = os.path.splitext(output_path)[1]
+        worker = await self.acquire_async(options, suffix)
+        self.refill(options, suffix)
+        try:
+            try:
+                await asyncio.wait_for(
+                    self.feed_async(worker, source), timeout=self.limits.timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                # the result of the worker tells what went wrong
+                await Subprocess.kill_async(worker.proc)
+            result = await Subprocess.collect_async(
+                worker.proc, worker.cmd, self.limits, on_stderr=on_progress
+            )
+            if result.returncode == 0 and os.path.isfile(worker.output_path):
+                shutil.move(worker.output_path, output_path)
+        except BaseException:
+            await Subprocess.kill_async(worker.proc)
+            raise
+        finally:
+            shutil.rmtree(worker.work_dir, ignore_errors=True)
+        return result
+
+    def kill_idle(self):
+        """
+        kill all idle workers e.g. at exit
+        """
+        for queue in self.idle.values():
+            while queue:
+                worker = queue.popleft()
+                self.kill(worker)
+                shutil.rmtree(worker.work_dir, ignore_errors=True)
+
+    async def close_async(self):
+        """
+        stop refilling and discard all idle workers
+        """
+        for task in list(self.refill_tasks):
+            task.cancel()
+        for queue in self.idle.values():
+            while queue:
+                await self.discard_async(queue.popleft())
@@ -1,7 +1,103 @@
 import asyncio
-import subprocess
+import os
+import signal
 from dataclasses import dataclass
-from typing import Awaitable, List, Optional
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+@dataclass
+class ResourceLimits:
+    """
+    Resource limits for a subprocess.
+
+    Attributes:
+        timeout (float): wall clock time limit in seconds
+        cpu_time (int): cpu time limit in seconds (rlimit, POSIX only)
+        memory (int): address space limit in bytes (rlimit, POSIX only)
+    """
+
+    timeout: Optional[float] = None
+    cpu_time: Optional[int] = None
+    memory: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, prefix: str = "OPENSCAD_") -> "ResourceLimits":
+        """
+        get resource limits from the environment variables
+        <prefix>TIMEOUT, <prefix>CPU_LIMIT and <prefix>MEMORY_LIMIT
+
+        Args:
+            prefix (str): the prefix of the environment variables
+
+        Returns:
+            ResourceLimits: the limits - unset variables mean no limit
+        """
+        timeout = os.environ.get(f"{prefix}TIMEOUT")
+        cpu_time = os.environ.get(f"{prefix}CPU_LIMIT")
+        memory = os.environ.get(f"{prefix}MEMORY_LIMIT")
+        limits = cls(
+            timeout=float(timeout) if timeout else None,
+            cpu_time=int(cpu_time) if cpu_time else None,
+            memory=int(memory) if memory else None,
+        )
+        return limits
+
+    @property
+    def has_rlimits(self) -> bool:
+        """
+        are there any limits that need to be applied in the child process?
+        """
+        return resource is not None and (
+            self.cpu_time is not None or self.memory is not None
+        )
+
+    def apply_rlimits(self):
+        """
+        apply the rlimits - called in the child process before exec
+        """
+        if self.cpu_time is not None:
+            # the hard limit gives the process a second to react on SIGXCPU
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_time, self.cpu_time + 1))
+        if self.memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory, self.memory))
+
+    def kill_reason(self, returncode: int, stderr: str) -> Optional[str]:
+        """
+        check whether the given result indicates that a limit was exceeded
+        or that the process was terminated by a signal e.g. a crash
+
+        Args:
+            returncode (int): the return code of the process
+            stderr (str): the error output of the process
+
+        Returns:
+            Optional[str]: the reason or None if the process was neither killed nor crashed
+        """
+        reason = None
+        if resource is None:
+            # no rlimits have been applied
+            return reason
+        if self.cpu_time is not None and returncode in (
+            -signal.SIGKILL,
+            -signal.SIGXCPU,
+        ):
+            reason = f"cpu time limit of {self.cpu_time} s exceeded"
+        elif self.memory is not None and returncode != 0:
+            # a failed allocation - a crash for other reasons is no memory problem
+            if "bad_alloc" in stderr or "out of memory" in stderr.lower():
+                reason = f"memory limit of {self.memory} bytes exceeded"
+        if reason is None and returncode < 0:
+            try:
+                signal_name = signal.Signals(-returncode).name
+            except ValueError:
+                signal_name = str(-returncode)
+            reason = f"terminated by signal {signal_name}"
+        return reason
 
 
 @dataclass
@@ -13,31 +109,116 @@ class Subprocess:
     cmd: List[str]
     returncode: int
     exception: Optional[BaseException] = None
+    killed: bool = False
+    kill_reason: Optional[str] = None
 
     @staticmethod
-    async def run_async(cmd: List[str]) -> Awaitable["Subprocess"]:
+    async def kill_async(proc: asyncio.subprocess.Process):
+        """
+        kill the given process and wait for it to terminate
+
+        Args:
+            proc: the process to kill
+        """
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    @staticmethod
+    async def read_lines_async(
+        stream: asyncio.StreamReader, callback: Optional[Callable[[str], None]]
+    ) -> bytes:
+        """
+        read the given stream line by line and call the callback for each line
+
+        Args:
+            stream (asyncio.StreamReader): the stream to read
+            callback (Callable): optional callback to call with each decoded line
+
+        Returns:
+            bytes: the complete content of the stream
+        """
+        content = bytearray()
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            content.extend(line)
+            if callback:
+                callback(line.decode(errors="replace"))
+        return bytes(content)
+
+    @staticmethod
+    async def stream_async(
+        proc: asyncio.subprocess.Process,
+        on_stdout: Optional[Callable[[str], None]],
+        on_stderr: Optional[Callable[[str], None]],
+    ) -> Tuple[bytes, bytes]:
+        """
+        stream the output of the given process line by line as it arrives
+
+        Args:
+            proc: the process
+            on_stdout (Callable): optional callback for each line of stdout
+            on_stderr (Callable): optional callback for each line of stderr
+
+        Returns:
+            Tuple[bytes, bytes]: the complete stdout and stderr content
+        """
+        stdout, stderr = await asyncio.gather(
+            Subprocess.read_lines_async(proc.stdout, on_stdout),
+            Subprocess.read_lines_async(proc.stderr, on_stderr),
+        )
+        await proc.wait()
+        return stdout, stderr
+
+    @staticmethod
+    async def run_async(
+        cmd: List[str],
+        limits: ResourceLimits = None,
+        on_stdout: Callable[[str], None] = None,
+        on_stderr: Callable[[str], None] = None,
+        **kwargs,
+    ) -> Awaitable["Subprocess"]:
         """
         Asynchronously runs a command as a subprocess and returns the result as an instance of this class.
 
+        If the awaiting task is cancelled the process is killed. If callbacks are given
+        the output is streamed line by line to them while the process is running.
+
         Args:
             cmd (List[str]): The command to run.
+            limits (ResourceLimits): optional wall clock, cpu time and memory limits
+            on_stdout (Callable): optional callback for each line of stdout as it arrives
+            on_stderr (Callable): optional callback for each line of stderr as it arrives
+            **kwargs: additional keyword arguments for the process creation e.g. umask or cwd
 
         Returns:
             Subprocess: An instance of this class representing the result of the subprocess execution.
         """
+        if limits is None:
+            limits = ResourceLimits()
+        preexec_fn = Subprocess.preexec_fn(limits, kwargs.pop("umask", None))
+        if preexec_fn is not None:
+            kwargs["preexec_fn"] = preexec_fn
+        proc = None
         try:
             proc = await asyncio.create_subprocess_exec(
-                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **kwargs,
             )
-
-            stdout, stderr = await proc.communicate()
-
-            subprocess = Subprocess(
-                stdout=stdout.decode(),
-                stderr=stderr.decode(),
-                cmd=cmd,
-                returncode=proc.returncode,
+            subprocess = await Subprocess.collect_async(
+                proc, cmd, limits, on_stdout=on_stdout, on_stderr=on_stderr
             )
+        except asyncio.CancelledError:
+            if proc is not None:
+                await Subprocess.kill_async(proc)
+            raise
         except BaseException as ex:
             subprocess = Subprocess(
                 stdout="", stderr=str(ex), cmd=cmd, returncode=-1, exception=ex
@@ -45,15 +226,104 @@ class Subprocess:
         return subprocess
 
     @staticmethod
-    def run(cmd: List[str]) -> "Subprocess":
+    def preexec_fn(
+        limits: ResourceLimits = None, umask: int = None
+    ) -> Optional[Callable[[], None]]:
+        """
+        get the function that prepares a child process before exec
+
+        the umask is set here instead of with the umask argument of the
+        process creation since uvloop - the event loop of the webserver -
+        does not support it. Windows does not support preexec functions at all
+        so there the rlimits and the umask are not applied.
+
+        Args:
+            limits (ResourceLimits): the limits to apply
+            umask (int): the umask of the child process
+
+        Returns:
+            Optional[Callable]: the function or None if there is nothing to prepare
+        """
+        if os.name != "posix":
+            return None
+        apply_rlimits = limits is not None and limits.has_rlimits
+        if not apply_rlimits and umask is None:
+            return None
+
+        def prepare():
+            if apply_rlimits:
+                limits.apply_rlimits()
+            if umask is not None:
+                os.umask(umask)
+
+        return prepare
+
+    @staticmethod
+    async def collect_async(
+        proc: asyncio.subprocess.Process,
+        cmd: List[str],
+        limits: ResourceLimits,
+        on_stdout: Callable[[str], None] = None,
+        on_stderr: Callable[[str], None] = None,
+    ) -> "Subprocess":
+        """
+        collect the output of the given already started process within the
+        wall clock time limit and kill it if the limit is exceeded
+
+        Args:
+            proc: the process started with piped stdout and stderr
+            cmd (List[str]): the command the process was started with
+            limits (ResourceLimits): the limits the process was started with
+            on_stdout (Callable): optional callback for each line of stdout as it arrives
+            on_stderr (Callable): optional callback for each line of stderr as it arrives
+
+        Returns:
+            Subprocess: the result of the process
+        """
+        if on_stdout or on_stderr:
+            collect = Subprocess.stream_async(proc, on_stdout, on_stderr)
+        else:
+            collect = proc.communicate()
+        try:
+            stdout, stderr = await asyncio.wait_for(collect, timeout=limits.timeout)
+            kill_reason = None
+        except asyncio.TimeoutError:
+            await Subprocess.kill_async(proc)
+            stdout, stderr = await proc.communicate()
+            kill_reason = f"wall clock time limit of {limits.timeout} s exceeded"
+        stderr = stderr.decode()
+        if kill_reason is None:
+            kill_reason = limits.kill_reason(proc.returncode, stderr)
+        subprocess = Subprocess(
+            stdout=stdout.decode(),
+            stderr=stderr,
+            cmd=cmd,
+            returncode=proc.returncode,
+            killed=kill_reason is not None,
+            kill_reason=kill_reason,
+        )
+        return subprocess
+
+    @staticmethod
+    def run(
+        cmd: List[str],
+        limits: ResourceLimits = None,
+        on_stdout: Callable[[str], None] = None,
+        on_stderr: Callable[[str], None] = None,
+    ) -> "Subprocess":
         """
         Runs a command as a subprocess and returns the result as an instance of this class.
 
         Args:
             cmd (List[str]): The command to run.
+            limits (ResourceLimits): optional wall clock, cpu time and memory limits
+            on_stdout (Callable): optional callback for each line of stdout as it arrives
+            on_stderr (Callable): optional callback for each line of stderr as it arrives
 
         Returns:
             Subprocess: An instance of this class representing the result of the subprocess execution.
         """
-        subprocess = asyncio.run(Subprocess.run_async(cmd))
+        subprocess = asyncio.run(
+            Subprocess.run_async(cmd, limits, on_stdout=on_stdout, on_stderr=on_stderr)
+        )
         return subprocess
@@ -0,0 +1,280 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+content addressed cache for OpenSCAD render results
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class RenderCacheStats:
+    """
+    hit/miss counters of a RenderCache
+    """
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        the ratio of hits to lookups
+        """
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups > 0 else 0.0
+        return rate
+
+
+class RenderCache:
+    """
+    A content addressed on-disk cache for rendered files.
+
+    Entries are keyed by a hash of the full render input and evicted
+    by age and by total size (least recently used first).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        max_size: int = 512 * 1024 * 1024,
+        max_age: float = 7 * 24 * 3600,
+    ):
+        """
+        constructor
+
+        Args:
+            cache_dir (str): the directory to keep the cached files in - defaults to ~/.nicescad/cache/render
+            max_size (int): the maximum total size of the cache in bytes
+            max_age (float): the maximum age of an entry in seconds
+        """
+        if cache_dir is None:
+            cache_dir = Path.home() / ".nicescad" / "cache" / "render"
+        self.cache_dir = str(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.stats = RenderCacheStats()
+
+    @staticmethod
+    def compute_key(*parts: str) -> str:
+        """
+        compute the cache key for the given input parts
+
+        Args:
+            parts: the strings that fully describe the render input
+
+        Returns:
+            str: the hex digest of the sha256 hash of the parts
+        """
+        sha = hashlib.sha256()
+        for part in parts:
+            sha.update(str(part).encode("utf-8"))
+            sha.update(b"\0")
+        key = sha.hexdigest()
+        return key
+
+    def path_for(self, key: str, suffix: str) -> str:
+        """
+        get the path of the cache entry for the given key
+
+        Args:
+            key (str): the cache key
+            suffix (str): the file suffix e.g. ".stl"
+
+        Returns:
+            str: the path of the (potential) cache entry
+        """
+        path = os.path.join(self.cache_dir, f"{key}{suffix}")
+        return path
+
+    def lookup(self, key: str, suffix: str) -> Optional[str]:
+        """
+        lookup the given key and count the hit or miss
+
+        Args:
+            key (str): the cache key
+            suffix (str): the file suffix
+
+        Returns:
+            Optional[str]: the path of the cache entry or None if there is no valid entry
+        """
+        path = self.path_for(key, suffix)
+        found = None
+        if os.path.isfile(path):
+            age = time.time() - os.path.getmtime(path)
+            if age <= self.max_age:
+                # touch to mark as recently used
+                os.utime(path)
+                found = path
+            else:
+                self._remove(path)
+        if found:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+        return found
+
+    def fetch(self, key: str, suffix: str, target_path: str) -> bool:
+        """
+        copy the cache entry for the given key to the given target path
+
+        Args:
+            key (str): the cache key
+            suffix (str): the file suffix
+            target_path (str): where to copy the cached file to
+
+        Returns:
+            bool: True if there was a cache hit
+        """
+        path = self.lookup(key, suffix)
+        if path:
+            shutil.copyfile(path, target_path)
+        return path is not None
+
+    def store(self, key: str, suffix: str, source_path: str) -> str:
+        """
+        store a copy of the given file under the given key
+
+        Args:
+            key (str): the cache key
+            suffix (str): the file suffix
+            source_path (str): the file to store
+
+        Returns:
+            str: the path of the cache entry
+        """
+        path = self.path_for(key, suffix)
+        # copy to a temporary file first to make the entry appear atomically
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        os.close(fd)
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.stats.stores += 1
+        self.evict()
+        return path
+
+    def store_text(self, key: str, suffix: str, text: str) -> str:
+        """
+        store the given text under the given key
+
+        Args:
+            key (str): the cache key
+            suffix (str): the file suffix
+            text (str): the text to store
+
+        Returns:
+            str: the path of the cache entry
+        """
+        path = self.path_for(key, suffix)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as text_file:
+            text_file.write(text)
+        os.replace(tmp_path, path)
+        self.stats.stores += 1
+        self.evict()
+        return path
+
+    def store_meta(self, key: str, meta: Dict[str, Any]) -> str:
+        """
+        store meta data e.g. mesh statistics for the given key
+
+        Args:
+            key (str): the cache key
+            meta (Dict[str, Any]): json serializable meta data
+
+        Returns:
+            str: the path of the meta data entry
+        """
+        path = self.path_for(key, ".json")
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        with os.fdopen(fd, "w") as json_file:
+            json.dump(meta, json_file)
+        os.replace(tmp_path, path)
+        return path
+
+    def lookup_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        lookup the meta data for the given key - does not count as hit or miss
+
+        Args:
+            key (str): the cache key
+
+        Returns:
+            Optional[Dict[str, Any]]: the meta data or None if there is none
+        """
+        meta = None
+        path = self.path_for(key, ".json")
+        try:
+            with open(path, "r") as json_file:
+                meta = json.load(json_file)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            pass
+        return meta
+
+    def entries(self) -> List[os.DirEntry]:
+        """
+        get the cache entries
+
+        Returns:
+            List[os.DirEntry]: the entries sorted by last use, oldest first
+        """
+        with os.scandir(self.cache_dir) as it:
+            entries = [
+                entry
+                for entry in it
+                if entry.is_file() and not entry.name.endswith(".part")
+            ]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        return entries
+
+    def _remove(self, path: str):
+        """
+        remove the given cache entry
+        """
+        try:
+            os.remove(path)
+            self.stats.evictions += 1
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        evict entries that are too old and then the least recently used
+        entries until the cache fits into max_size
+        """
+        now = time.time()
+        total_size = 0
+        alive = []
+        for entry in self.entries():
+            stat = entry.stat()
+            if now - stat.st_mtime > self.max_age:
+                self._remove(entry.path)
+            else:
+                alive.append((entry.path, stat.st_size))
+                total_size += stat.st_size
+        for path, size in alive:
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    def clear(self):
+        """
+        remove all cache entries
+        """
+        for entry in self.entries():
+            self._remove(entry.path)
@@ -0,0 +1,414 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+index of prerendered meshes for the bundled examples and stored designs
+"""
+
+import asyncio
+import functools
+import json
+import os
+import shutil
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from nicescad.dependencies import DependencyGraph
+from nicescad.openscad import OpenScad
+from nicescad.render_cache import RenderCache
+from nicescad.render_scheduler import RenderQueueFullError, RenderScheduler
+
+
+@dataclass
+class RenderIndexEntry:
+    """
+    the prerendered result of a design
+
+    Attributes:
+        key (str): the index key of the design's code
+        source_path (str): the file the design was read from
+        content_key (str): the content hash of the code - differs from the key
+            for designs with include/use/import dependencies
+        stl_name (str): the name of the full resolution stl file in the index directory
+        lod_names (List[str]): the names of the level of detail stl files, coarsest first
+        thumbnail_name (str): the name of the png thumbnail - None if openscad could not create it
+        mesh_stats (dict): the mesh statistics
+        seconds (float): the time the prerender took
+        rendered (float): the time of the prerender
+        error (str): the error message of a failed prerender
+        killed (bool): True if the failed prerender was killed e.g. by a time or memory limit
+        attempts (int): the number of failed prerenders in a row
+    """
+
+    key: str
+    source_path: str
+    stl_name: Optional[str] = None
+    lod_names: List[str] = field(default_factory=list)
+    thumbnail_name: Optional[str] = None
+    mesh_stats: Optional[Dict[str, Any]] = None
+    seconds: float = 0.0
+    rendered: float = field(default_factory=time.time)
+    error: Optional[str] = None
+    content_key: Optional[str] = None
+    killed: bool = False
+    attempts: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RenderIndexEntry":
+        """
+        create an entry from the given dict
+        """
+        return cls(**data)
+
+
+class RenderIndex:
+    """
+    Prerenders the designs of a set of directories in the background and
+    keeps an index from their code to the rendered mesh, its levels of
+    detail, a thumbnail and the mesh statistics.
+
+    Entries are keyed by the content hash of the code as it is rendered so
+    that the first view of a catalog item can be served from the index.
+    Designs with include/use/import dependencies are rendered in place and
+    their key contains the fingerprint of all files they depend on so that
+    a changed dependency is not served from a stale entry.
+    """
+
+    INDEX_FILE = "index.json"
+    # the render scheduler client of the prerender jobs
+    CLIENT_ID = "prerender"
+    # killed prerenders e.g. under load are retried after 1, 2, 4 ... minutes
+    RETRY_DELAY = 60.0
+    MAX_ATTEMPTS = 5
+
+    def __init__(
+        self,
+        oscad: OpenScad,
+        roots: List[str],
+        index_dir: str = None,
+        scheduler: RenderScheduler = None,
+        thumbnails: bool = True,
+    ):
+        """
+        constructor
+
+        Args:
+            oscad (OpenScad): the OpenSCAD wrapper to render with
+            roots (List[str]): the directories to search for .scad files
+            index_dir (str): the directory of the index and the rendered files - defaults to ~/.nicescad/index
+            scheduler (RenderScheduler): the scheduler to queue the renders in - renders directly if None
+            thumbnails (bool): render png thumbnails as well
+        """
+        if index_dir is None:
+            index_dir = Path.home() / ".nicescad" / "index"
+        self.index_dir = str(index_dir)
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.oscad = oscad
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.scheduler = scheduler
+        self.thumbnails = thumbnails
+        self.entries: Dict[str, RenderIndexEntry] = {}
+        # the files of the designs with dependencies by content key
+        self.sources: Dict[str, str] = {}
+        self.version = None
+        self.refreshing = False
+        self.load()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.index_dir, RenderIndex.INDEX_FILE)
+
+    def load(self):
+        """
+        load the index of an earlier run (if any)
+        """
+        if not os.path.isfile(self.index_path):
+            return
+        try:
+            with open(self.index_path) as json_file:
+                index = json.load(json_file)
+            self.version = index.get("version")
+            self.entries = {
+                key: RenderIndexEntry.from_dict(entry)
+                for key, entry in index.get("entries", {}).items()
+            }
+        except (OSError, ValueError, TypeError):
+            # a damaged index is rebuilt by the next refresh
+            self.entries = {}
+        self.sources = {
+            entry.content_key: entry.source_path
+            for entry in self.entries.values()
+            if entry.content_key is not None and entry.content_key != entry.key
+        }
+
+    def save(self):
+        """
+        save the index - atomically so that readers never see a partial file
+        """
+        index = {
+            "version": self.version,
+            "entries": {key: asdict(entry) for key, entry in self.entries.items()},
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(index, json_file, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def find_designs(self) -> List[str]:
+        """
+        find the designs below my roots
+
+        Returns:
+            List[str]: the sorted paths of the .scad files
+        """
+        designs = set()
+        for root in self.roots:
+            if os.path.isdir(root):
+                designs.update(str(path) for path in Path(root).rglob("*.scad"))
+        return sorted(designs)
+
+    def content_key(self, openscad_str: str) -> str:
+        """
+        get the content hash of the given code - including the prepended code
+        """
+        content_key = OpenScad.content_hash(self.oscad.prepare_source(openscad_str))
+        return content_key
+
+    def key_for(self, openscad_str: str, source_path: str = None) -> Optional[str]:
+        """
+        get the index key for the given code - the content hash and for code
+        with dependencies the fingerprint of its file and all files it depends on
+
+        Args:
+            openscad_str (str): the OpenSCAD code
+            source_path (str): the file containing the code - defaults to the
+                indexed design with the same content
+
+        Returns:
+            Optional[str]: the key or None if the code has dependencies and its file is unknown
+        """
+        key = self.content_key(openscad_str)
+        if DependencyGraph.parse_dependencies(openscad_str):
+            if source_path is None:
+                source_path = self.sources.get(key)
+            if source_path is None:
+                return None
+            source_path = os.path.abspath(source_path)
+            fingerprint = self.oscad.dependency_graph.fingerprint(source_path)
+            key = RenderCache.compute_key(key, source_path, fingerprint)
+        return key
+
+    def lookup(
+        self, openscad_str: str, source_path: str = None
+    ) -> Optional[RenderIndexEntry]:
+        """
+        get the prerendered result for the given code
+
+        Args:
+            openscad_str (str): the OpenSCAD code
+            source_path (str): the file containing the code (if any)
+
+        Returns:
+            Optional[RenderIndexEntry]: the entry or None if the code has not been rendered successfully
+        """
+        if not openscad_str:
+            return None
+        key = self.key_for(openscad_str, source_path)
+        if key is None:
+            return None
+        entry = self.entries.get(key)
+        if entry is None or entry.stl_name is None:
+            return None
+        if not os.path.isfile(self.path(entry.stl_name)):
+            return None
+        return entry
+
+    def path(self, name: str) -> str:
+        """
+        get the path of the given file of the index
+        """
+        return os.path.join(self.index_dir, name)
+
+    def needs_render(self, entry: Optional[RenderIndexEntry]) -> bool:
+        """
+        check whether the design of the given entry needs to be (re)rendered
+
+        a failure of the code itself is kept until the code changes while a
+        killed render is retried with exponential backoff
+
+        Args:
+            entry (RenderIndexEntry): the entry - None if the design has not been rendered yet
+
+        Returns:
+            bool: True if the design should be rendered
+        """
+        if entry is None:
+            return True
+        if entry.error is None:
+            return not os.path.isfile(self.path(entry.stl_name))
+        if not entry.killed or entry.attempts >= RenderIndex.MAX_ATTEMPTS:
+            return False
+        delay = RenderIndex.RETRY_DELAY * 2 ** (entry.attempts - 1)
+        return time.time() - entry.rendered >= delay
+
+    async def render_entry(self, key: str, source_path: str, openscad_str: str):
+        """
+        render the given design into the index
+
+        Args:
+            key (str): the index key
+            source_path (str): the file the code was read from
+            openscad_str (str): the OpenSCAD code
+        """
+        start = time.time()
+        content_key = self.content_key(openscad_str)
+        entry = RenderIndexEntry(
+            key=key, source_path=source_path, content_key=content_key
+        )
+        # render designs with dependencies in place so that relative names resolve
+        in_place = source_path if key != content_key else None
+        stl_path = self.path(f"{key}.stl")
+        result = await self.oscad.openscad_str_to_file(
+            openscad_str, stl_path, source_path=in_place
+        )
+        if result.returncode != 0:
+            entry.error = result.kill_reason or result.stderr.strip()
+            entry.killed = result.killed
+            previous = self.entries.get(key)
+            previous_attempts = previous.attempts if previous is not None else 0
+            entry.attempts = previous_attempts + 1
+        else:
+            entry.stl_name = os.path.basename(stl_path)
+            lod_paths = await self.oscad.create_lods_async(result)
+            entry.lod_names = [os.path.basename(path) for path in lod_paths]
+            if result.mesh_stats is not None:
+                entry.mesh_stats = result.mesh_stats.to_dict()
+            if self.thumbnails:
+                png_path = self.path(f"{key}.png")
+                png_result = await self.oscad.openscad_str_to_file(
+                    openscad_str, png_path, source_path=in_place
+                )
+                # e.g. no OpenGL context available on a headless server
+                if png_result.returncode == 0 and os.path.isfile(png_path):
+                    entry.thumbnail_name = os.path.basename(png_path)
+        entry.seconds = time.time() - start
+        self.entries[key] = entry
+        self.save()
+
+    def remove_files(self, entry: RenderIndexEntry):
+        """
+        remove the rendered files of the given entry
+        """
+        for name in [entry.stl_name, entry.thumbnail_name, *entry.lod_names]:
+            if name and os.path.isfile(self.path(name)):
+                os.remove(self.path(name))
+
+    def read_design(self, source_path: str) -> Optional[Tuple[str, str, str]]:
+        """
+        read the given design and get its keys - blocking file I/O for a worker thread
+
+        Args:
+            source_path (str): the path of the .scad file
+
+        Returns:
+            Optional[Tuple[str, str, str]]: the code, its index key and its content key
+                or None if the file can not be read
+        """
+        try:
+            with open(source_path, "r") as scad_file:
+                openscad_str = scad_file.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        content_key = self.content_key(openscad_str)
+        key = self.key_for(openscad_str, source_path)
+        return openscad_str, key, content_key
+
+    async def refresh_async(self) -> int:
+        """
+        render all designs that are not in the index yet one at a time, retry
+        killed renders and drop the entries of designs that are gone
+
+        Returns:
+            int: the number of rendered designs
+        """
+        if self.refreshing:
+            return 0
+        self.refreshing = True
+        rendered = 0
+        try:
+            version = await self.oscad.get_version_async()
+            if version != self.version:
+                # results of another openscad version might differ
+                for entry in self.entries.values():
+                    self.remove_files(entry)
+                self.entries = {}
+                self.version = version
+            keys = set()
+            designs = await asyncio.to_thread(self.find_designs)
+            for source_path in designs:
+                design = await asyncio.to_thread(self.read_design, source_path)
+                if design is None:
+                    continue
+                openscad_str, key, content_key = design
+                if key != content_key:
+                    self.sources[content_key] = source_path
+                keys.add(key)
+                if not self.needs_render(self.entries.get(key)):
+                    continue
+                render = functools.partial(
+                    self.render_entry, key, source_path, openscad_str
+                )
+                if self.scheduler is not None:
+                    try:
+                        await self.scheduler.run(RenderIndex.CLIENT_ID, render)
+                    except RenderQueueFullError:
+                        # the server is busy - try again with the next refresh
+                        break
+                else:
+                    await render()
+                rendered += 1
+            for key in set(self.entries) - keys:
+                self.remove_files(self.entries.pop(key))
+            self.save()
+        finally:
+            self.refreshing = False
+        return rendered
+
+    async def run_periodically(self, interval: float = None):
+        """
+        refresh the index now and then every interval seconds
+
+        Args:
+            interval (float): the time between refreshes in seconds - refresh only once if None or 0
+        """
+        while True:
+            await self.refresh_async()
+            if not interval:
+                break
+            await asyncio.sleep(interval)
+
+    def copy_to(self, entry: RenderIndexEntry, stl_path: str) -> List[str]:
+        """
+        copy the rendered files of the given entry for viewing
+
+        Args:
+            entry (RenderIndexEntry): the entry
+            stl_path (str): the target path of the full resolution stl file -
+                the levels of detail are copied next to it
+
+        Returns:
+            List[str]: the paths of the copied stl files, coarsest first and full resolution last
+        """
+        paths = []
+        stem = os.path.splitext(stl_path)[0]
+        for lod_name in entry.lod_names:
+            # e.g. <key>_lod20000.stl -> <stem>_lod20000.stl
+            lod_path = stem + lod_name[len(entry.key) :]
+            shutil.copyfile(self.path(lod_name), lod_path)
+            paths.append(lod_path)
+        shutil.copyfile(self.path(entry.stl_name), stl_path)
+        paths.append(stl_path)
+        return paths
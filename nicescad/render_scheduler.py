@@ -0,0 +1,354 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+bounded scheduling of render jobs with per client fair share queueing
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+class RenderQueueFullError(Exception):
+    """
+    raised when a render job is rejected since the queue is full
+    """
+
+
+@dataclass
+class RenderJob:
+    """
+    a render job waiting for or running in a RenderScheduler
+
+    Attributes:
+        client_id (str): the id of the client that submitted the job
+        job_factory (Callable): creates the awaitable doing the actual work
+        on_update (Callable): optional callback called with the job on each status or position change
+        job_id (str): the unique id of the job
+        status (str): one of queued, running, done, failed, rejected or cancelled
+        position (int): the position in the queue - 1 is next, 0 when not queued
+        message (str): a human readable status message
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    REJECTED = "rejected"
+    CANCELLED = "cancelled"
+
+    client_id: str
+    job_factory: Callable[[], Awaitable[Any]]
+    on_update: Optional[Callable[["RenderJob"], None]] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    position: int = 0
+    message: str = ""
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def notify(self):
+        """
+        notify my listener about a change
+
+        a failing listener must not stall the scheduler so its exception is only logged
+        """
+        if self.on_update:
+            try:
+                self.on_update(self)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    f"update of render job {self.job_id} failed"
+                )
+
+    async def wait(self) -> Any:
+        """
+        wait for the result of this job
+
+        Returns:
+            Any: the result of the awaitable created by the job factory
+
+        Raises:
+            RenderQueueFullError: if the job has been rejected
+            asyncio.CancelledError: if the job has been cancelled
+        """
+        result = await self.future
+        return result
+
+
+class RenderScheduler:
+    """
+    Runs render jobs with a bounded number of concurrent workers.
+
+    Waiting jobs are queued per client - the next job is taken from the client
+    with the fewest running jobs (round robin on ties) so that a single
+    client can not starve the others.
+    """
+
+    def __init__(self, max_workers: int = None, max_queue_depth: int = 100):
+        """
+        constructor
+
+        Args:
+            max_workers (int): the maximum number of concurrently running jobs - defaults to the number of cpus
+            max_queue_depth (int): the maximum number of waiting jobs - more jobs are rejected
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.queues: Dict[str, Deque[RenderJob]] = OrderedDict()
+        self.running: Dict[str, RenderJob] = {}
+
+    @property
+    def queued_count(self) -> int:
+        """
+        the number of waiting jobs
+        """
+        count = sum(len(queue) for queue in self.queues.values())
+        return count
+
+    @property
+    def running_count(self) -> int:
+        """
+        the number of running jobs
+        """
+        return len(self.running)
+
+    def submit(
+        self,
+        client_id: str,
+        job_factory: Callable[[], Awaitable[Any]],
+        on_update: Callable[[RenderJob], None] = None,
+    ) -> RenderJob:
+        """
+        submit a job - needs to be called from within a running event loop
+
+        Args:
+            client_id (str): the id of the submitting client
+            job_factory (Callable): creates the awaitable doing the actual work
+            on_update (Callable): optional callback for status and position changes
+
+        Returns:
+            RenderJob: the job - its status is rejected if the queue is full
+        """
+        loop = asyncio.get_running_loop()
+        job = RenderJob(
+            client_id=client_id, job_factory=job_factory, on_update=on_update
+        )
+        job.future = loop.create_future()
+        if self.queued_count >= self.max_queue_depth:
+            job.status = RenderJob.REJECTED
+            job.message = f"render queue is full ({self.max_queue_depth} jobs waiting) - please try again later"
+            job.future.set_exception(RenderQueueFullError(job.message))
+            # avoid "exception never retrieved" warnings if nobody waits
+            job.future.exception()
+            job.notify()
+            return job
+        self.queues.setdefault(client_id, deque()).append(job)
+        self._dispatch()
+        self._update_positions()
+        return job
+
+    async def run(
+        self,
+        client_id: str,
+        job_factory: Callable[[], Awaitable[Any]],
+        on_update: Callable[[RenderJob], None] = None,
+    ) -> Any:
+        """
+        submit a job and wait for its result
+
+        Args:
+            client_id (str): the id of the submitting client
+            job_factory (Callable): creates the awaitable doing the actual work
+            on_update (Callable): optional callback for status and position changes
+
+        Returns:
+            Any: the result of the job
+        """
+        job = self.submit(client_id, job_factory, on_update)
+        result = await job.wait()
+        return result
+
+    def cancel(self, job: RenderJob) -> bool:
+        """
+        cancel the given job - a waiting job is removed from its queue
+        and a running job's task is cancelled which kills its process
+
+        Args:
+            job (RenderJob): the job to cancel
+
+        Returns:
+            bool: True if the job was waiting or running
+        """
+        cancelled = False
+        if job.status == RenderJob.QUEUED:
+            queue = self.queues.get(job.client_id)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self.queues[job.client_id]
+                job.status = RenderJob.CANCELLED
+                job.position = 0
+                job.message = "cancelled"
+                job.future.cancel()
+                job.notify()
+                self._update_positions()
+                cancelled = True
+        elif job.status == RenderJob.RUNNING and job.task is not None:
+            # status and notification are handled in _job_done
+            cancelled = job.task.cancel()
+        return cancelled
+
+    def cancel_client(self, client_id: str) -> int:
+        """
+        cancel all waiting and running jobs of the given client
+        e.g. when the client disconnects
+
+        Args:
+            client_id (str): the id of the client
+
+        Returns:
+            int: the number of cancelled jobs
+        """
+        jobs = list(self.queues.get(client_id, []))
+        jobs.extend(job for job in self.running.values() if job.client_id == client_id)
+        count = sum(1 for job in jobs if self.cancel(job))
+        return count
+
+    def _select_client(
+        self, queues: Dict[str, Deque[RenderJob]], running_counts: Dict[str, int]
+    ) -> Optional[str]:
+        """
+        select the client to dispatch the next job for
+
+        the client with the fewest running jobs wins - ties are resolved
+        in round robin order
+
+        Args:
+            queues (Dict): the waiting jobs by client in round robin order
+            running_counts (Dict): the number of running jobs by client
+
+        Returns:
+            Optional[str]: the selected client id or None if no jobs are waiting
+        """
+        selected = None
+        selected_count = None
+        for client_id, queue in queues.items():
+            count = running_counts.get(client_id, 0)
+            if queue and (selected is None or count < selected_count):
+                selected = client_id
+                selected_count = count
+        return selected
+
+    def _running_counts(self) -> Dict[str, int]:
+        """
+        get the number of running jobs by client
+        """
+        running_counts = {}
+        for job in self.running.values():
+            running_counts[job.client_id] = running_counts.get(job.client_id, 0) + 1
+        return running_counts
+
+    def dispatch_order(self) -> List[RenderJob]:
+        """
+        get the waiting jobs in the order they are going to be dispatched
+        assuming running jobs do not finish in the meantime
+
+        Returns:
+            List[RenderJob]: the waiting jobs in fair share order
+        """
+        order = []
+        queues = OrderedDict(
+            (client_id, deque(queue)) for client_id, queue in self.queues.items()
+        )
+        running_counts = self._running_counts()
+        while True:
+            client_id = self._select_client(queues, running_counts)
+            if client_id is None:
+                break
+            order.append(queues[client_id].popleft())
+            queues.move_to_end(client_id)
+            running_counts[client_id] = running_counts.get(client_id, 0) + 1
+        return order
+
+    def _next_job(self) -> Optional[RenderJob]:
+        """
+        pop the next job in fair share order
+        """
+        client_id = self._select_client(self.queues, self._running_counts())
+        if client_id is None:
+            return None
+        queue = self.queues[client_id]
+        job = queue.popleft()
+        # rotate the client to the end to be fair to the others
+        self.queues.move_to_end(client_id)
+        if not queue:
+            del self.queues[client_id]
+        return job
+
+    def _dispatch(self):
+        """
+        start waiting jobs while there are free workers
+        """
+        while self.running_count < self.max_workers:
+            job = self._next_job()
+            if job is None:
+                break
+            job.status = RenderJob.RUNNING
+            job.position = 0
+            job.message = "rendering"
+            self.running[job.job_id] = job
+            job.task = asyncio.ensure_future(job.job_factory())
+            job.task.add_done_callback(lambda task, job=job: self._job_done(job, task))
+            job.notify()
+
+    def _update_positions(self):
+        """
+        update the queue positions of the waiting jobs and notify the changed ones
+        """
+        for index, job in enumerate(self.dispatch_order()):
+            position = index + 1
+            if job.position != position:
+                job.position = position
+                job.message = f"queued at position {position}"
+                job.notify()
+
+    def _job_done(self, job: RenderJob, task: asyncio.Task):
+        """
+        handle the completion of the given job's task and dispatch the next jobs
+
+        Args:
+            job (RenderJob): the job
+            task (asyncio.Task): the task that ran the job
+        """
+        # the waiter may have been cancelled already e.g. by a client disconnect
+        try:
+            if task.cancelled():
+                job.status = RenderJob.CANCELLED
+                job.message = "cancelled"
+                if not job.future.done():
+                    job.future.cancel()
+            elif task.exception() is not None:
+                ex = task.exception()
+                job.status = RenderJob.FAILED
+                job.message = str(ex)
+                if not job.future.done():
+                    job.future.set_exception(ex)
+            else:
+                job.status = RenderJob.DONE
+                job.message = "done"
+                if not job.future.done():
+                    job.future.set_result(task.result())
+        finally:
+            del self.running[job.job_id]
+            job.notify()
+            self._dispatch()
+            self._update_positions()
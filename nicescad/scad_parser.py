@@ -0,0 +1,1037 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+incremental recursive descent parser for OpenSCAD code
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# token kinds
+NUMBER = "number"
+STRING = "string"
+IDENT = "ident"
+INCLUDE = "include"
+OP = "op"
+ERROR = "error"
+EOF = "eof"
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<space>\s+)"
+    r"|(?P<comment>//[^\n]*|/\*.*?\*/)"
+    r"|(?P<include>\b(?:include|use)\s*<[^>\n]*>)"
+    r'|(?P<string>"(?:\\.|[^"\\])*")'
+    r"|(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?(?!\w))"
+    # identifiers may start with a digit e.g. 8bit_polyfont
+    r"|(?P<ident>\$?\w+)"
+    r"|(?P<op><=|>=|==|!=|&&|\|\||[-+*/%^!<>=?:#.,;()\[\]{}])"
+    r"|(?P<error>.)",
+    re.DOTALL,
+)
+
+# the characters that decide where a top level statement ends
+BOUNDARY_PATTERN = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"'
+    r"|(?P<include>\b(?:include|use)\s*<[^>\n]*>)"
+    r"|(?P<else>\belse\b)"
+    r"|(?P<open>[(\[{])|(?P<close>[)\]}])|(?P<end>;)",
+    re.DOTALL,
+)
+
+# instantiations that are control flow rather than module calls
+CONTROL_NAMES = {"for", "intersection_for", "let", "echo", "assert", "each"}
+
+Token = Tuple[str, str, int]
+
+
+class ScadSyntaxError(Exception):
+    """
+    a syntax error in OpenSCAD code
+
+    Attributes:
+        rel_line (int): the line of the error relative to its chunk
+        at_end (bool): True if the chunk ended unexpectedly e.g. due to an unclosed bracket
+        chunk (Chunk): the chunk the error was found in
+    """
+
+    def __init__(self, msg: str, rel_line: int = 0, at_end: bool = False):
+        super().__init__(msg)
+        self.msg = msg
+        self.rel_line = rel_line
+        self.at_end = at_end
+        self.chunk: Optional["Chunk"] = None
+
+    @property
+    def line(self) -> int:
+        """
+        the line of the error (1 based)
+        """
+        start_line = self.chunk.start_line if self.chunk else 1
+        return start_line + self.rel_line
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.msg}"
+
+
+@dataclass(eq=False, kw_only=True)
+class Node:
+    """
+    a node of the syntax tree
+
+    Line numbers are kept relative to the chunk of the node so that
+    unchanged chunks can be reused when lines are inserted above them.
+
+    Attributes:
+        rel_line (int): the line relative to the start of the chunk
+        chunk (Chunk): the chunk the node was parsed from
+    """
+
+    rel_line: int = 0
+    chunk: Optional["Chunk"] = field(default=None, repr=False)
+
+    @property
+    def line(self) -> int:
+        """
+        the line of the node (1 based)
+        """
+        start_line = self.chunk.start_line if self.chunk else 1
+        return start_line + self.rel_line
+
+
+@dataclass(eq=False, kw_only=True)
+class Expr(Node):
+    """
+    an expression
+
+    Attributes:
+        kind (str): number, string, bool, undef, ident, vector, range, call,
+            index, member, unary, binary, ternary, let, assert, echo,
+            function, for, if, each
+        value (Any): the literal value, the name or the operator
+        args (List[Any]): the operands, arguments or elements
+    """
+
+    kind: str
+    value: Any = None
+    args: List[Any] = field(default_factory=list)
+
+
+@dataclass(eq=False, kw_only=True)
+class Argument(Node):
+    """
+    an argument of a call - named or positional
+    """
+
+    name: Optional[str] = None
+    value: Expr
+
+
+@dataclass(eq=False, kw_only=True)
+class Parameter(Node):
+    """
+    a parameter of a module or function definition
+    """
+
+    name: str
+    default: Optional[Expr] = None
+
+
+@dataclass(eq=False, kw_only=True)
+class Include(Node):
+    """
+    an include<> or use<> statement
+    """
+
+    kind: str
+    path: str
+
+
+@dataclass(eq=False, kw_only=True)
+class Assignment(Node):
+    """
+    a variable assignment
+    """
+
+    name: str
+    expr: Expr
+
+
+@dataclass(eq=False, kw_only=True)
+class ModuleDef(Node):
+    """
+    a module definition
+    """
+
+    name: str
+    params: List[Parameter] = field(default_factory=list)
+    body: List[Node] = field(default_factory=list)
+
+
+@dataclass(eq=False, kw_only=True)
+class FunctionDef(Node):
+    """
+    a function definition
+    """
+
+    name: str
+    params: List[Parameter] = field(default_factory=list)
+    expr: Expr
+
+
+@dataclass(eq=False, kw_only=True)
+class Instantiation(Node):
+    """
+    a module instantiation e.g. translate([1,0,0]) cube(1); - control flow
+    like for, let and echo is represented as an instantiation as well
+
+    Attributes:
+        modifiers (str): the ! # % * modifiers
+    """
+
+    name: str
+    args: List[Argument] = field(default_factory=list)
+    children: List[Node] = field(default_factory=list)
+    modifiers: str = ""
+
+
+@dataclass(eq=False, kw_only=True)
+class IfStatement(Node):
+    """
+    an if statement with optional else branch
+    """
+
+    condition: Expr
+    then_body: List[Node] = field(default_factory=list)
+    else_body: List[Node] = field(default_factory=list)
+    modifiers: str = ""
+
+
+@dataclass(eq=False, kw_only=True)
+class Block(Node):
+    """
+    a { } block of statements
+    """
+
+    body: List[Node] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class Symbol:
+    """
+    a definition of a module, function or variable
+
+    Attributes:
+        name (str): the name
+        kind (str): module, function or variable
+        node (Node): the defining node
+        scope (str): the name of the enclosing module or function - None at top level
+    """
+
+    name: str
+    kind: str
+    node: Node
+    scope: Optional[str] = None
+
+    @property
+    def line(self) -> int:
+        return self.node.line
+
+
+@dataclass
+class Outline:
+    """
+    the outline index of OpenSCAD code
+
+    Attributes:
+        symbols (List[Symbol]): the definitions in source order
+        calls (Dict[str, Set[str]]): the modules instantiated by each module - "" for the top level
+        includes (List[Include]): the include<> and use<> statements
+        imports (List[Instantiation]): the import() and surface() calls of literal file names
+    """
+
+    symbols: List[Symbol] = field(default_factory=list)
+    calls: Dict[str, Set[str]] = field(default_factory=dict)
+    includes: List[Include] = field(default_factory=list)
+    imports: List[Instantiation] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, statements: List[Node]) -> "Outline":
+        """
+        create the outline of the given statements
+        """
+        outline = cls()
+        outline.add(statements, None)
+        return outline
+
+    def add(self, statements: List[Node], scope: Optional[str]):
+        """
+        add the definitions and calls of the given statements in the given scope
+        """
+        calls = self.calls.setdefault(scope or "", set())
+        for statement in statements:
+            if isinstance(statement, ModuleDef):
+                self.symbols.append(Symbol(statement.name, "module", statement, scope))
+                self.add(statement.body, statement.name)
+            elif isinstance(statement, FunctionDef):
+                self.symbols.append(
+                    Symbol(statement.name, "function", statement, scope)
+                )
+            elif isinstance(statement, Assignment):
+                self.symbols.append(
+                    Symbol(statement.name, "variable", statement, scope)
+                )
+            elif isinstance(statement, Include):
+                self.includes.append(statement)
+            elif isinstance(statement, Instantiation):
+                if statement.name not in CONTROL_NAMES:
+                    calls.add(statement.name)
+                if statement.name in ("import", "surface") and self.file_arg(statement):
+                    self.imports.append(statement)
+                self.add(statement.children, scope)
+            elif isinstance(statement, IfStatement):
+                self.add(statement.then_body, scope)
+                self.add(statement.else_body, scope)
+            elif isinstance(statement, Block):
+                self.add(statement.body, scope)
+
+    @staticmethod
+    def file_arg(instantiation: Instantiation) -> Optional[str]:
+        """
+        get the literal file name of an import() or surface() call
+        """
+        for i, arg in enumerate(instantiation.args):
+            if arg.name == "file" or (i == 0 and arg.name is None):
+                if arg.value.kind == "string":
+                    return arg.value.value
+        return None
+
+    def dependencies(self) -> List[Tuple[str, str]]:
+        """
+        get the files the code depends on
+
+        Returns:
+            List[Tuple[str, str]]: the kind (include, use or import) and file name of each
+                dependency - like DependencyGraph.parse_dependencies
+        """
+        dependencies = [(include.kind, include.path) for include in self.includes]
+        dependencies.extend(
+            ("import", Outline.file_arg(instantiation))
+            for instantiation in self.imports
+        )
+        return dependencies
+
+    def merge(self, other: "Outline"):
+        """
+        add the entries of the given outline
+        """
+        self.symbols.extend(other.symbols)
+        for name, called in other.calls.items():
+            self.calls.setdefault(name, set()).update(called)
+        self.includes.extend(other.includes)
+        self.imports.extend(other.imports)
+
+    def find(self, name: str) -> List[Symbol]:
+        """
+        get the definitions of the given name
+
+        Args:
+            name (str): the name of a module, function or variable
+
+        Returns:
+            List[Symbol]: the definitions in source order
+        """
+        return [symbol for symbol in self.symbols if symbol.name == name]
+
+    def symbol_lines(self) -> Dict[str, int]:
+        """
+        get the line of each top level definition - the last one wins like in OpenSCAD
+
+        Returns:
+            Dict[str, int]: the line by name
+        """
+        return {
+            symbol.name: symbol.line for symbol in self.symbols if symbol.scope is None
+        }
+
+
+@dataclass(eq=False)
+class Chunk:
+    """
+    a top level statement (with its leading comments) parsed on its own
+
+    Attributes:
+        text (str): the source of the chunk
+        start_line (int): the line the chunk starts at in the current document
+        statements (List[Node]): the parsed statements
+        errors (List[ScadSyntaxError]): the syntax errors
+        outline (Outline): the outline of the chunk
+    """
+
+    text: str
+    start_line: int = 1
+    statements: List[Node] = field(default_factory=list)
+    errors: List[ScadSyntaxError] = field(default_factory=list)
+    outline: Outline = field(default_factory=Outline)
+
+
+@dataclass
+class ParseResult:
+    """
+    the result of parsing OpenSCAD code
+
+    The line numbers of the nodes are valid until the next call of the parser
+    that produced the result since unchanged chunks are shared.
+
+    Attributes:
+        chunks (List[Chunk]): the top level chunks in source order
+        outline (Outline): the outline index
+        errors (List[ScadSyntaxError]): the syntax errors
+    """
+
+    chunks: List[Chunk] = field(default_factory=list)
+    outline: Outline = field(default_factory=Outline)
+    errors: List[ScadSyntaxError] = field(default_factory=list)
+
+    @property
+    def statements(self) -> List[Node]:
+        """
+        the top level statements
+        """
+        return [statement for chunk in self.chunks for statement in chunk.statements]
+
+    @property
+    def ok(self) -> bool:
+        """
+        is the code free of syntax errors?
+        """
+        return not self.errors
+
+
+def tokenize(text: str) -> List[Token]:
+    """
+    split the given OpenSCAD code into tokens - without whitespace and comments
+
+    Args:
+        text (str): the code
+
+    Returns:
+        List[Token]: the kind, text and line (0 based) of each token followed by an eof token
+    """
+    tokens = []
+    line = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "space" or kind == "comment":
+            line += value.count("\n")
+            continue
+        tokens.append((kind, value, line))
+        if kind == STRING:
+            line += value.count("\n")
+    tokens.append((EOF, "", line))
+    return tokens
+
+
+def split_chunks(source: str) -> Iterator[str]:
+    """
+    split the given code at the ends of top level statements
+
+    Args:
+        source (str): the OpenSCAD code
+
+    Yields:
+        str: the chunks - joined they give the source
+    """
+    depth = 0
+    start = 0
+    # a statement that ended at depth 0 - unless an else follows
+    pending = None
+    for match in BOUNDARY_PATTERN.finditer(source):
+        kind = match.lastgroup
+        if kind is None:
+            # comment or string
+            continue
+        if pending is not None:
+            if kind != "else":
+                yield source[start:pending]
+                start = pending
+            pending = None
+        if kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+            if depth <= 0:
+                if depth < 0 or match.group() == "}":
+                    pending = match.end()
+                depth = 0
+        elif kind == "end" and depth == 0:
+            pending = match.end()
+        elif kind == "include" and depth == 0:
+            pending = match.end()
+    if pending is not None:
+        yield source[start:pending]
+        start = pending
+    if start < len(source):
+        yield source[start:]
+
+
+class _Parser:
+    """
+    recursive descent parser for the tokens of a chunk
+    """
+
+    def __init__(self, tokens: List[Token], chunk: Chunk):
+        self.tokens = tokens
+        self.pos = 0
+        self.chunk = chunk
+
+    def peek(self, offset: int = 0) -> Token:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def at(self, kind: str, value: str = None, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token[0] == kind and (value is None or token[1] == value)
+
+    def at_op(self, value: str) -> bool:
+        token = self.tokens[self.pos]
+        return token[0] == OP and token[1] == value
+
+    def advance(self) -> Token:
+        token = self.tokens[self.pos]
+        if token[0] != EOF:
+            self.pos += 1
+        return token
+
+    def error(self, msg: str, token: Token = None) -> ScadSyntaxError:
+        if token is None:
+            token = self.peek()
+        found = "end of input" if token[0] == EOF else f"'{token[1]}'"
+        return ScadSyntaxError(f"{msg} but found {found}", token[2], token[0] == EOF)
+
+    def expect(self, value: str) -> Token:
+        if not self.at_op(value):
+            raise self.error(f"expected '{value}'")
+        return self.advance()
+
+    def expect_ident(self) -> Token:
+        if not self.at(IDENT):
+            raise self.error("expected a name")
+        return self.advance()
+
+    def synchronize(self):
+        """
+        skip the rest of a broken statement
+
+        only braces are counted - an unclosed parenthesis or bracket must not
+        swallow the following statements and module or function definitions
+        """
+        depth = 0
+        while True:
+            kind, value, _line = self.peek()
+            if kind == EOF:
+                return
+            if kind == IDENT and (
+                value == "module" or (value == "function" and self.at(IDENT, offset=1))
+            ):
+                return
+            if kind == OP:
+                if value == "{":
+                    depth += 1
+                elif value == "}":
+                    if depth == 0:
+                        return
+                    depth -= 1
+                elif value == ";" and depth == 0:
+                    self.advance()
+                    return
+            self.advance()
+
+    def statements(self, errors: List[ScadSyntaxError], end: str = None) -> List[Node]:
+        """
+        parse statements until the given closing brace or the end of input
+        """
+        statements = []
+        while not self.at(EOF) and not (end and self.at_op(end)):
+            start = self.pos
+            try:
+                statement = self.statement()
+                if statement is not None:
+                    statements.append(statement)
+            except ScadSyntaxError as ex:
+                errors.append(ex)
+                self.synchronize()
+                if self.pos == start:
+                    # e.g. a } without a matching {
+                    self.advance()
+        return statements
+
+    def statement(self) -> Optional[Node]:
+        kind, value, line = self.peek()
+        if kind == OP and value == ";":
+            self.advance()
+            return None
+        if kind == OP and value == "{":
+            self.advance()
+            body = self.block_body()
+            return Block(body=body, rel_line=line, chunk=self.chunk)
+        if kind == INCLUDE:
+            self.advance()
+            include_kind, path = value.split("<", 1)
+            return Include(
+                kind=include_kind.strip(),
+                path=path[:-1].strip(),
+                rel_line=line,
+                chunk=self.chunk,
+            )
+        if kind == IDENT:
+            if value == "module":
+                return self.module_def()
+            if value == "function" and self.at(IDENT, offset=1):
+                return self.function_def()
+            if self.at(OP, "=", offset=1):
+                self.advance()
+                self.advance()
+                expr = self.expr()
+                self.expect(";")
+                return Assignment(
+                    name=value, expr=expr, rel_line=line, chunk=self.chunk
+                )
+        return self.instantiation()
+
+    def block_body(self) -> List[Node]:
+        errors = self.chunk.errors
+        body = self.statements(errors, end="}")
+        self.expect("}")
+        return body
+
+    def module_def(self) -> ModuleDef:
+        line = self.advance()[2]
+        name = self.expect_ident()[1]
+        self.expect("(")
+        params = self.parameters()
+        body = self.child()
+        return ModuleDef(
+            name=name, params=params, body=body, rel_line=line, chunk=self.chunk
+        )
+
+    def function_def(self) -> FunctionDef:
+        line = self.advance()[2]
+        name = self.expect_ident()[1]
+        self.expect("(")
+        params = self.parameters()
+        self.expect("=")
+        expr = self.expr()
+        self.expect(";")
+        return FunctionDef(
+            name=name, params=params, expr=expr, rel_line=line, chunk=self.chunk
+        )
+
+    def parameters(self) -> List[Parameter]:
+        """
+        parse parameters up to and including the closing parenthesis
+        """
+        params = []
+        while not self.at_op(")"):
+            _kind, name, line = self.expect_ident()
+            default = None
+            if self.at_op("="):
+                self.advance()
+                default = self.expr()
+            params.append(
+                Parameter(name=name, default=default, rel_line=line, chunk=self.chunk)
+            )
+            if not self.at_op(","):
+                break
+            self.advance()
+        self.expect(")")
+        return params
+
+    def arguments(self) -> List[Argument]:
+        """
+        parse arguments up to and including the closing parenthesis
+        """
+        args = []
+        while not self.at_op(")"):
+            line = self.peek()[2]
+            name = None
+            if self.at(IDENT) and self.at(OP, "=", offset=1):
+                name = self.advance()[1]
+                self.advance()
+            value = self.expr()
+            args.append(
+                Argument(name=name, value=value, rel_line=line, chunk=self.chunk)
+            )
+            if not self.at_op(","):
+                break
+            self.advance()
+        self.expect(")")
+        return args
+
+    def child(self) -> List[Node]:
+        """
+        parse the children of an instantiation or the body of a module
+        """
+        if self.at_op(";"):
+            self.advance()
+            return []
+        if self.at_op("{"):
+            self.advance()
+            return self.block_body()
+        return [self.instantiation()]
+
+    def instantiation(self) -> Node:
+        modifiers = ""
+        while self.peek()[0] == OP and self.peek()[1] in "!#%*":
+            modifiers += self.advance()[1]
+        kind, name, line = self.peek()
+        if kind != IDENT:
+            raise self.error("expected a statement")
+        self.advance()
+        if name == "if":
+            self.expect("(")
+            condition = self.expr()
+            self.expect(")")
+            then_body = self.child()
+            else_body = []
+            if self.at(IDENT, "else"):
+                self.advance()
+                else_body = self.child()
+            return IfStatement(
+                condition=condition,
+                then_body=then_body,
+                else_body=else_body,
+                modifiers=modifiers,
+                rel_line=line,
+                chunk=self.chunk,
+            )
+        self.expect("(")
+        if name == "for" or name == "intersection_for":
+            args = self.for_arguments()
+        else:
+            args = self.arguments()
+        children = self.child()
+        return Instantiation(
+            name=name,
+            args=args,
+            children=children,
+            modifiers=modifiers,
+            rel_line=line,
+            chunk=self.chunk,
+        )
+
+    def for_arguments(self) -> List[Argument]:
+        """
+        parse the arguments of a for loop - including the c-style
+        for (init; condition; update) form of list comprehensions
+        """
+        args = []
+        while not self.at_op(")") and not self.at_op(";"):
+            line = self.peek()[2]
+            name = self.expect_ident()[1]
+            self.expect("=")
+            value = self.expr()
+            args.append(
+                Argument(name=name, value=value, rel_line=line, chunk=self.chunk)
+            )
+            if not self.at_op(","):
+                break
+            self.advance()
+        if self.at_op(";"):
+            self.advance()
+            line = self.peek()[2]
+            condition = self.expr()
+            args.append(Argument(value=condition, rel_line=line, chunk=self.chunk))
+            self.expect(";")
+            args.extend(self.for_arguments())
+            return args
+        self.expect(")")
+        return args
+
+    def node(self, kind: str, line: int, value: Any = None, args=None) -> Expr:
+        return Expr(
+            kind=kind,
+            value=value,
+            args=args if args is not None else [],
+            rel_line=line,
+            chunk=self.chunk,
+        )
+
+    def expr(self) -> Expr:
+        kind, value, line = self.peek()
+        if kind == IDENT and self.at(OP, "(", offset=1):
+            if value == "function":
+                self.advance()
+                self.advance()
+                params = self.parameters()
+                body = self.expr()
+                return self.node("function", line, params, [body])
+            if value in ("let", "assert", "echo"):
+                self.advance()
+                self.advance()
+                args = self.arguments()
+                if value != "let" and self.at_end_of_expr():
+                    return self.node(value, line, args, [])
+                body = self.expr()
+                return self.node(value, line, args, [body])
+        return self.ternary()
+
+    def at_end_of_expr(self) -> bool:
+        kind, value, _line = self.peek()
+        return kind == EOF or (kind == OP and value in ");,]:")
+
+    def ternary(self) -> Expr:
+        condition = self.binary(0)
+        if self.at_op("?"):
+            line = self.advance()[2]
+            then_expr = self.expr()
+            self.expect(":")
+            else_expr = self.expr()
+            return self.node("ternary", line, "?", [condition, then_expr, else_expr])
+        return condition
+
+    # binary operators by increasing precedence
+    BINARY_LEVELS = [
+        ("||",),
+        ("&&",),
+        ("==", "!="),
+        ("<", "<=", ">", ">="),
+        ("+", "-"),
+        ("*", "/", "%"),
+    ]
+
+    def binary(self, level: int) -> Expr:
+        if level == len(_Parser.BINARY_LEVELS):
+            return self.unary()
+        operators = _Parser.BINARY_LEVELS[level]
+        left = self.binary(level + 1)
+        while True:
+            kind, value, line = self.peek()
+            if kind != OP or value not in operators:
+                return left
+            self.advance()
+            right = self.binary(level + 1)
+            left = self.node("binary", line, value, [left, right])
+
+    def unary(self) -> Expr:
+        kind, value, line = self.peek()
+        if kind == OP and value in ("!", "-", "+"):
+            self.advance()
+            return self.node("unary", line, value, [self.unary()])
+        return self.power()
+
+    def power(self) -> Expr:
+        base = self.postfix()
+        if self.at_op("^"):
+            line = self.advance()[2]
+            # right associative and binding tighter than unary minus on the left
+            exponent = self.unary()
+            return self.node("binary", line, "^", [base, exponent])
+        return base
+
+    def postfix(self) -> Expr:
+        expr = self.primary()
+        while True:
+            kind, value, line = self.peek()
+            if kind != OP:
+                return expr
+            if value == "(":
+                self.advance()
+                expr = self.node("call", line, None, [expr, *self.arguments()])
+            elif value == "[":
+                self.advance()
+                index = self.expr()
+                self.expect("]")
+                expr = self.node("index", line, None, [expr, index])
+            elif value == ".":
+                self.advance()
+                member = self.expect_ident()[1]
+                expr = self.node("member", line, member, [expr])
+            else:
+                return expr
+
+    def primary(self) -> Expr:
+        kind, value, line = self.peek()
+        if kind == NUMBER:
+            self.advance()
+            return self.node("number", line, float(value))
+        if kind == STRING:
+            self.advance()
+            return self.node("string", line, value[1:-1])
+        if kind == IDENT:
+            self.advance()
+            if value in ("true", "false"):
+                return self.node("bool", line, value == "true")
+            if value == "undef":
+                return self.node("undef", line)
+            return self.node("ident", line, value)
+        if kind == OP and value == "(":
+            self.advance()
+            expr = self.expr()
+            self.expect(")")
+            return expr
+        if kind == OP and value == "[":
+            self.advance()
+            return self.vector(line)
+        raise self.error("expected an expression")
+
+    def vector(self, line: int) -> Expr:
+        """
+        parse a vector, range or list comprehension after the opening bracket
+        """
+        elements = []
+        if self.at_op("]"):
+            self.advance()
+            return self.node("vector", line, None, elements)
+        first = self.element()
+        if self.at_op(":"):
+            self.advance()
+            second = self.expr()
+            args = [first, second]
+            if self.at_op(":"):
+                self.advance()
+                args.append(self.expr())
+            self.expect("]")
+            # [start:end] or [start:step:end]
+            return self.node("range", line, None, args)
+        elements.append(first)
+        while self.at_op(","):
+            self.advance()
+            if self.at_op("]"):
+                break
+            elements.append(self.element())
+        self.expect("]")
+        return self.node("vector", line, None, elements)
+
+    def element(self) -> Expr:
+        """
+        parse an element of a vector - an expression or a list comprehension
+        """
+        kind, value, line = self.peek()
+        if kind == IDENT:
+            if value == "for" and self.at(OP, "(", offset=1):
+                self.advance()
+                self.advance()
+                args = self.for_arguments()
+                return self.node("for", line, args, [self.element()])
+            if value == "if" and self.at(OP, "(", offset=1):
+                self.advance()
+                self.advance()
+                condition = self.expr()
+                self.expect(")")
+                args = [condition, self.element()]
+                if self.at(IDENT, "else"):
+                    self.advance()
+                    args.append(self.element())
+                return self.node("if", line, None, args)
+            if value == "let" and self.at(OP, "(", offset=1):
+                self.advance()
+                self.advance()
+                args = self.arguments()
+                return self.node("let", line, args, [self.element()])
+            if value == "each":
+                self.advance()
+                return self.node("each", line, None, [self.element()])
+        if kind == OP and value == "(" and self.at(IDENT, offset=1):
+            # e.g. [(for (i=[0:2]) i)] - parenthesized comprehension
+            if self.peek(1)[1] in ("for", "if", "let", "each"):
+                self.advance()
+                element = self.element()
+                self.expect(")")
+                return element
+        return self.expr()
+
+
+def parse_chunk(text: str) -> Chunk:
+    """
+    parse the given chunk of OpenSCAD code
+
+    Args:
+        text (str): the code
+
+    Returns:
+        Chunk: the chunk with its statements, errors and outline
+    """
+    chunk = Chunk(text=text)
+    parser = _Parser(tokenize(text), chunk)
+    chunk.statements = parser.statements(chunk.errors)
+    for error in chunk.errors:
+        error.chunk = chunk
+    chunk.outline = Outline.of(chunk.statements)
+    return chunk
+
+
+class ScadParser:
+    """
+    Parses OpenSCAD code into a syntax tree and an outline index.
+
+    The code is split at the ends of top level statements and chunks that
+    did not change since an earlier call are reused so that parsing on
+    every edit only costs as much as the changed statements.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        """
+        constructor
+
+        Args:
+            capacity (int): the number of parsed chunks to keep
+        """
+        self.capacity = capacity
+        self.chunks: "OrderedDict[str, List[Chunk]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_chunk(self, text: str, used: Set[int]) -> Chunk:
+        """
+        get the parsed chunk for the given text
+
+        Args:
+            text (str): the source of the chunk
+            used (Set[int]): the ids of the chunks already used by the current parse
+
+        Returns:
+            Chunk: a cached chunk or a freshly parsed one
+        """
+        # identical chunks may occur more than once in a document
+        chunks = self.chunks.get(text)
+        if chunks is not None:
+            self.chunks.move_to_end(text)
+            for chunk in chunks:
+                if id(chunk) not in used:
+                    self.hits += 1
+                    return chunk
+        self.misses += 1
+        chunk = parse_chunk(text)
+        if chunks is None:
+            chunks = self.chunks[text] = []
+            while len(self.chunks) > self.capacity:
+                self.chunks.popitem(last=False)
+        chunks.append(chunk)
+        return chunk
+
+    def parse(self, source: str) -> ParseResult:
+        """
+        parse the given OpenSCAD code
+
+        Args:
+            source (str): the code
+
+        Returns:
+            ParseResult: the chunks, the outline index and the syntax errors
+        """
+        result = ParseResult()
+        used = set()
+        line = 1
+        for text in split_chunks(source):
+            chunk = self.get_chunk(text, used)
+            used.add(id(chunk))
+            chunk.start_line = line
+            line += text.count("\n")
+            result.chunks.append(chunk)
+            result.outline.merge(chunk.outline)
+            result.errors.extend(chunk.errors)
+        return result
@@ -0,0 +1,310 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+static checks of OpenSCAD code before it is rendered
+"""
+
+import os
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from nicescad.dependencies import DependencyGraph
+from nicescad.scad_parser import (
+    Block,
+    IfStatement,
+    Instantiation,
+    ModuleDef,
+    Node,
+    ScadParser,
+)
+
+
+@dataclass
+class ValidationIssue:
+    """
+    a problem found by the ScadValidator
+
+    Attributes:
+        line (int): the line of the problem (1 based)
+        kind (str): syntax, brackets, unknown_module or missing_include
+        message (str): the description of the problem
+    """
+
+    line: int
+    kind: str
+    message: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        convert me to a dict e.g. for json serialization
+        """
+        return asdict(self)
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.message}"
+
+
+class ScadValidator:
+    """
+    Checks OpenSCAD code in process before a render is queued: syntax,
+    unbalanced brackets, instantiations of unknown modules and include/use
+    files that can not be found.
+
+    Unknown modules are only reported if all include/use files could be
+    resolved since a missing library would explain them anyway.
+    """
+
+    SYNTAX = "syntax"
+    BRACKETS = "brackets"
+    UNKNOWN_MODULE = "unknown_module"
+    MISSING_INCLUDE = "missing_include"
+
+    # the modules built into OpenSCAD - including deprecated and experimental ones
+    BUILTIN_MODULES = {
+        "cube",
+        "sphere",
+        "cylinder",
+        "polyhedron",
+        "square",
+        "circle",
+        "polygon",
+        "text",
+        "import",
+        "surface",
+        "translate",
+        "rotate",
+        "scale",
+        "resize",
+        "mirror",
+        "multmatrix",
+        "color",
+        "offset",
+        "hull",
+        "minkowski",
+        "union",
+        "difference",
+        "intersection",
+        "render",
+        "projection",
+        "linear_extrude",
+        "rotate_extrude",
+        "roof",
+        "fill",
+        "children",
+        "child",
+        "group",
+        "echo",
+        "assert",
+        "for",
+        "intersection_for",
+        "let",
+        "assign",
+        "import_stl",
+        "import_dxf",
+        "import_off",
+        "dxf_linear_extrude",
+        "dxf_rotate_extrude",
+    }
+
+    # brackets - comments and strings are matched as well so that brackets inside them are skipped
+    BRACKET_PATTERN = re.compile(
+        r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"|(?P<open>[(\[{])|(?P<close>[)\]}])',
+        re.DOTALL,
+    )
+    CLOSING = {"(": ")", "[": "]", "{": "}"}
+
+    def __init__(
+        self,
+        dependency_graph: DependencyGraph = None,
+        library_paths: List[str] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            dependency_graph (DependencyGraph): the graph to resolve include/use files with
+            library_paths (List[str]): additional library directories e.g. the one of the
+                OpenSCAD installation
+        """
+        self.graph = dependency_graph or DependencyGraph()
+        self.library_paths = library_paths or []
+        self.parser = ScadParser()
+        # the module names defined in library files by path and digest
+        self.library_modules: Dict[str, Tuple[str, Set[str]]] = {}
+
+    def resolve(self, kind: str, name: str, base_dir: str) -> Optional[str]:
+        """
+        resolve the given include/use file name
+
+        Args:
+            kind (str): include or use
+            name (str): the file name as given in the source
+            base_dir (str): the directory the code is rendered in
+
+        Returns:
+            Optional[str]: the absolute path or None if the file can not be found
+        """
+        path = self.graph.resolve(kind, name, base_dir)
+        if path is None:
+            for library_path in self.library_paths:
+                candidate = os.path.join(library_path, name)
+                if os.path.isfile(candidate):
+                    path = os.path.abspath(candidate)
+                    break
+        return path
+
+    def check_brackets(self, code: str) -> List[ValidationIssue]:
+        """
+        check that all brackets are balanced
+
+        Args:
+            code (str): the OpenSCAD code
+
+        Returns:
+            List[ValidationIssue]: the unbalanced brackets
+        """
+        issues = []
+        stack = []
+        line = 1
+        pos = 0
+        for match in ScadValidator.BRACKET_PATTERN.finditer(code):
+            kind = match.lastgroup
+            if kind is None:
+                continue
+            line += code.count("\n", pos, match.start())
+            pos = match.start()
+            bracket = match.group()
+            if kind == "open":
+                stack.append((bracket, line))
+            elif not stack:
+                issues.append(
+                    ValidationIssue(
+                        line, ScadValidator.BRACKETS, f"unmatched '{bracket}'"
+                    )
+                )
+            else:
+                opening, open_line = stack.pop()
+                if ScadValidator.CLOSING[opening] != bracket:
+                    msg = f"'{opening}' opened at line {open_line} is closed by '{bracket}'"
+                    issues.append(ValidationIssue(line, ScadValidator.BRACKETS, msg))
+        for opening, open_line in stack:
+            issues.append(
+                ValidationIssue(
+                    open_line, ScadValidator.BRACKETS, f"unclosed '{opening}'"
+                )
+            )
+        return issues
+
+    def instantiations(self, statements: List[Node]) -> Iterator[Instantiation]:
+        """
+        get all module instantiations of the given statements - including nested ones
+        """
+        for statement in statements:
+            if isinstance(statement, Instantiation):
+                yield statement
+                yield from self.instantiations(statement.children)
+            elif isinstance(statement, ModuleDef):
+                yield from self.instantiations(statement.body)
+            elif isinstance(statement, IfStatement):
+                yield from self.instantiations(statement.then_body)
+                yield from self.instantiations(statement.else_body)
+            elif isinstance(statement, Block):
+                yield from self.instantiations(statement.body)
+
+    def modules_of(self, path: str) -> Set[str]:
+        """
+        get the names of the modules defined in the given library file
+
+        Args:
+            path (str): the absolute path of the file
+
+        Returns:
+            Set[str]: the module names
+        """
+        entry = self.graph.entry(path)
+        if entry is None:
+            return set()
+        cached = self.library_modules.get(path)
+        if cached is not None and cached[0] == entry.digest:
+            return cached[1]
+        with open(path, "r", errors="replace") as scad_file:
+            code = scad_file.read()
+        # a separate parser so that libraries do not evict the chunks of the design
+        outline = ScadParser(capacity=0).parse(code).outline
+        modules = {symbol.name for symbol in outline.symbols if symbol.kind == "module"}
+        self.library_modules[path] = (entry.digest, modules)
+        return modules
+
+    def validate(
+        self, code: str, base_dir: str = None, prelude: str = ""
+    ) -> List[ValidationIssue]:
+        """
+        check the given code
+
+        Args:
+            code (str): the OpenSCAD code
+            base_dir (str): the directory relative include/use names are resolved in -
+                the current directory if None
+            prelude (str): code that is prepended when rendering - its modules are known
+
+        Returns:
+            List[ValidationIssue]: the problems sorted by line - empty if the code looks renderable
+        """
+        if base_dir is None:
+            base_dir = os.getcwd()
+        issues = self.check_brackets(code)
+        result = self.parser.parse(code)
+        bracket_lines = {issue.line for issue in issues}
+        for error in result.errors:
+            # unbalanced brackets also end statements unexpectedly
+            if issues and error.at_end:
+                continue
+            if error.line not in bracket_lines:
+                issues.append(
+                    ValidationIssue(error.line, ScadValidator.SYNTAX, error.msg)
+                )
+        known = set(ScadValidator.BUILTIN_MODULES)
+        known.update(
+            symbol.name for symbol in result.outline.symbols if symbol.kind == "module"
+        )
+        if prelude:
+            prelude_outline = ScadParser(capacity=0).parse(prelude).outline
+            known.update(
+                symbol.name
+                for symbol in prelude_outline.symbols
+                if symbol.kind == "module"
+            )
+        complete = True
+        for include in result.outline.includes:
+            path = self.resolve(include.kind, include.path, base_dir)
+            if path is None:
+                complete = False
+                msg = f"{include.kind} file <{include.path}> not found"
+                issues.append(
+                    ValidationIssue(include.line, ScadValidator.MISSING_INCLUDE, msg)
+                )
+                continue
+            for lib_path in [path, *self.graph.transitive(path)]:
+                entry = self.graph.entry(lib_path)
+                if entry is None or entry.missing:
+                    complete = False
+                if lib_path.endswith(".scad"):
+                    known.update(self.modules_of(lib_path))
+        if complete:
+            reported = set()
+            for instantiation in self.instantiations(result.statements):
+                name = instantiation.name
+                if name not in known and name not in reported:
+                    reported.add(name)
+                    issues.append(
+                        ValidationIssue(
+                            instantiation.line,
+                            ScadValidator.UNKNOWN_MODULE,
+                            f"unknown module {name}",
+                        )
+                    )
+        issues.sort(key=lambda issue: issue.line)
+        return issues
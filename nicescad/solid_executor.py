@@ -0,0 +1,293 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+
+pooled and resource limited execution of SolidPython conversions
+"""
+
+import asyncio
+import builtins
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from nicescad.process import ResourceLimits
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# the builtins available to the converted python code
+SAFE_BUILTINS = [
+    "abs",
+    "all",
+    "any",
+    "bool",
+    "dict",
+    "enumerate",
+    "filter",
+    "float",
+    "int",
+    "len",
+    "list",
+    "map",
+    "max",
+    "min",
+    "pow",
+    "range",
+    "reversed",
+    "round",
+    "set",
+    "sorted",
+    "str",
+    "sum",
+    "tuple",
+    "zip",
+]
+
+
+class ConversionError(Exception):
+    """
+    raised when the python code can not be converted
+    """
+
+
+class ConversionTimeoutError(ConversionError):
+    """
+    raised when a conversion exceeds its time limit
+    """
+
+
+def sandbox_globals() -> Dict[str, Any]:
+    """
+    get the globals to evaluate SolidPython code with - the solid2
+    names and a restricted set of builtins
+
+    the restricted builtins are no security boundary on their own - the
+    isolation comes from running the code in a resource limited worker process
+
+    Returns:
+        Dict[str, Any]: the globals
+    """
+    import solid2
+
+    sandbox = {
+        name: getattr(solid2, name) for name in dir(solid2) if not name.startswith("_")
+    }
+    sandbox["__builtins__"] = {name: getattr(builtins, name) for name in SAFE_BUILTINS}
+    return sandbox
+
+
+# the globals of a worker process - prepared once by init_worker
+_worker_globals: Optional[Dict[str, Any]] = None
+
+
+def init_worker(limits: ResourceLimits):
+    """
+    initialize a worker process: apply the rlimits and import solid2 ahead of the first job
+
+    Args:
+        limits (ResourceLimits): the limits of the worker process
+    """
+    global _worker_globals
+    if limits.has_rlimits:
+        limits.apply_rlimits()
+    _worker_globals = sandbox_globals()
+
+
+def _on_alarm(_signum, _frame):
+    raise TimeoutError()
+
+
+def limit_cpu_time(cpu_time: Optional[int]):
+    """
+    limit the cpu time of the next job of this worker process
+
+    RLIMIT_CPU counts the cpu time of the whole process - the limit is
+    therefore set relative to the time the worker has used so far
+
+    Args:
+        cpu_time (int): the cpu time limit of the job in seconds
+    """
+    if cpu_time is None or resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + 1 + cpu_time
+    _soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def convert_in_worker(
+    python_code: str, timeout: Optional[float], cpu_time: Optional[int] = None
+) -> str:
+    """
+    convert the given python code to OpenSCAD code - runs in a worker process
+
+    Args:
+        python_code (str): the SolidPython code
+        timeout (float): the time limit in seconds
+        cpu_time (int): the cpu time limit in seconds
+
+    Returns:
+        str: the OpenSCAD code
+    """
+    from solid2 import scad_render
+
+    limit_cpu_time(cpu_time)
+
+    use_alarm = timeout is not None and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        # copy to avoid leaking state between jobs
+        d = eval(python_code, dict(_worker_globals))
+        openscad_code = scad_render(d)
+    except TimeoutError:
+        raise ConversionTimeoutError(f"conversion time limit of {timeout} s exceeded")
+    except Exception as ex:
+        # the original exception might not be picklable
+        raise ConversionError(f"{type(ex).__name__}: {ex}")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return openscad_code
+
+
+def ping() -> int:
+    """
+    no-op job to start a worker process
+    """
+    return os.getpid()
+
+
+class SolidExecutor:
+    """
+    Runs SolidPython conversions in a pool of pre-started worker processes
+    so that conversions neither block the event loop nor each other.
+
+    Each worker has imported solid2 already and runs with a memory rlimit
+    and a cpu time rlimit per job. Workers are replaced after
+    max_tasks_per_child jobs and the whole pool is replaced if a worker
+    dies or hangs.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        timeout: float = 10.0,
+        memory: Optional[int] = 1024 * 1024 * 1024,
+        max_tasks_per_child: int = 100,
+    ):
+        """
+        constructor
+
+        Args:
+            max_workers (int): the number of worker processes - defaults to the number of cpus
+            timeout (float): the time limit of a conversion in seconds
+            memory (int): the address space limit of a worker process in bytes
+            max_tasks_per_child (int): the number of jobs after which a worker is replaced (Python >= 3.11)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        # the cpu time limit of each job is a backstop for code that does not react on the alarm
+        self.cpu_time = max(int(timeout), 1) if timeout else None
+        self.limits = ResourceLimits(timeout=timeout, memory=memory)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.restart_lock = threading.Lock()
+
+    def start(self) -> ProcessPoolExecutor:
+        """
+        start the worker processes
+
+        Returns:
+            ProcessPoolExecutor: the executor
+        """
+        if self.executor is None:
+            kwargs = {}
+            if sys.version_info >= (3, 11):
+                # workers are recycled - needs a non fork start method
+                kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=init_worker,
+                initargs=(self.limits,),
+                **kwargs,
+            )
+            # start all workers now instead of on demand
+            for _ in range(self.max_workers):
+                self.executor.submit(ping)
+        return self.executor
+
+    def restart(self, failed_executor: ProcessPoolExecutor = None):
+        """
+        replace the worker processes e.g. after a worker died or hangs
+
+        Args:
+            failed_executor (ProcessPoolExecutor): the executor a conversion failed in -
+                if it has been replaced already the other conversions that were running
+                in it fail as well and must not restart the new pool again
+        """
+        with self.restart_lock:
+            executor = self.executor
+            if failed_executor is not None and failed_executor is not executor:
+                return
+            self.executor = None
+            if executor is not None:
+                processes = list((getattr(executor, "_processes", None) or {}).values())
+                executor.shutdown(wait=False, cancel_futures=True)
+                for process in processes:
+                    process.kill()
+            self.start()
+
+    def shutdown(self):
+        """
+        stop the worker processes
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def convert_async(self, python_code: str) -> str:
+        """
+        convert the given python code to OpenSCAD code in a worker process
+
+        Args:
+            python_code (str): the SolidPython code
+
+        Returns:
+            str: the OpenSCAD code
+
+        Raises:
+            ConversionError: if the code could not be converted
+            ConversionTimeoutError: if the conversion took too long
+        """
+        executor = self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            executor, convert_in_worker, python_code, self.timeout, self.cpu_time
+        )
+        # grace period for the alarm in the worker to fire first
+        wall_timeout = self.timeout + 5 if self.timeout else None
+        try:
+            openscad_code = await asyncio.wait_for(future, timeout=wall_timeout)
+        except asyncio.TimeoutError:
+            self.restart(executor)
+            raise ConversionTimeoutError(
+                f"conversion time limit of {self.timeout} s exceeded"
+            )
+        except BrokenProcessPool:
+            self.restart(executor)
+            raise ConversionError(
+                "the conversion worker died - probably a resource limit was exceeded"
+            )
+        return openscad_code
@@ -5,14 +5,35 @@ Created on 2023-07-30
 """
 
 import argparse
+import asyncio
+import atexit
+import importlib.metadata
+import json
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from solid2 import *
-from starlette.responses import HTMLResponse
+from solid2 import scad_render
+from starlette.responses import FileResponse, HTMLResponse, StreamingResponse
 
 import nicescad as nicescad
+from nicescad.job_service import JobService
+from nicescad.job_store import JobRecord, JobStore
+from nicescad.lru_cache import LruCache
+from nicescad.openscad import OpenScad, OpenScadError
+from nicescad.render_cache import RenderCache
+from nicescad.solid_executor import (
+    ConversionError,
+    ConversionTimeoutError,
+    SolidExecutor,
+    sandbox_globals,
+)
 
 
 class SolidConverter:
@@ -27,10 +48,13 @@ class SolidConverter:
         """
         Function to convert the input Python code into OpenSCAD code using SolidPython
 
+        The code is evaluated in the calling process - see SolidExecutor for
+        the pooled and resource limited variant used by the server.
+
         Returns:
         str -- OpenSCAD code
         """
-        d = eval(self.python_code)
+        d = eval(self.python_code, sandbox_globals())
         openscad_code = scad_render(d)
         return openscad_code
 
@@ -39,17 +63,157 @@ class Item(BaseModel):
     python_code: str
 
 
+class RenderItem(BaseModel):
+    # either SolidPython or OpenSCAD source
+    python_code: Optional[str] = None
+    scad_code: Optional[str] = None
+    # stl, asciistl, 3mf, off or amf
+    format: str = "stl"
+    # final or preview
+    mode: str = "final"
+
+
+class JobItem(RenderItem):
+    # optional local url to post the final job state to
+    callback_url: Optional[str] = None
+
+
+class BatchItem(BaseModel):
+    items: List[Item]
+    # stream the results as newline delimited json as they finish
+    stream: bool = False
+
+
+class CleanupStreamingResponse(StreamingResponse):
+    """
+    Streaming response that runs a cleanup however the response ends - also
+    if the client is gone before the body is sent and it is never iterated.
+    """
+
+    def __init__(self, content, cleanup: Callable[[], Awaitable[None]], **kwargs):
+        """
+        constructor
+
+        Arguments:
+        content -- the body iterator
+        cleanup: Callable -- the coroutine function releasing the resources of the body
+        """
+        super().__init__(content, **kwargs)
+        self.cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.cleanup()
+
+
 class FastAPIServer:
     """
     Class for FastAPI server.
     """
 
-    def __init__(self):
-        self.app = FastAPI()
+    # the export formats of the render endpoint with their openscad name and media type
+    RENDER_FORMATS = {
+        "stl": ("binstl", "model/stl"),
+        "asciistl": ("asciistl", "model/stl"),
+        "3mf": ("3mf", "model/3mf"),
+        "off": ("off", "text/plain"),
+        "amf": ("amf", "application/xml"),
+    }
+
+    # the export formats of jobs - derived by openscad from the result file suffix
+    JOB_FORMATS = ["stl", "3mf", "off", "amf"]
+
+    def __init__(
+        self,
+        executor: SolidExecutor = None,
+        cache: LruCache = None,
+        max_batch_size: int = 1000,
+        openscad: OpenScad = None,
+        max_renders: int = None,
+        job_dir: str = None,
+    ):
+        """
+        constructor
+
+        Arguments:
+        executor: SolidExecutor -- the worker pool for the conversions
+        cache: LruCache -- the cache for the conversion results
+        max_batch_size: int -- the maximum number of items of a batch conversion
+        openscad: OpenScad -- the OpenSCAD wrapper for rendering - detected on first use by default
+        max_renders: int -- the maximum number of concurrent renders (default: number of cpus)
+        job_dir: str -- the directory for the job database and results (default: ~/.nicescad/jobs)
+        """
+        self.max_batch_size = max_batch_size
+        self.openscad = openscad
+        # submitted code is rendered from scratch files in a shared directory - relative
+        # include/use names are resolved in this empty directory instead so that they
+        # are reported as missing
+        self.include_dir = tempfile.mkdtemp(prefix="nicescad_includes_")
+        atexit.register(shutil.rmtree, self.include_dir, ignore_errors=True)
+        self.max_renders = max_renders or os.cpu_count() or 1
+        self.render_semaphore = asyncio.Semaphore(self.max_renders)
+        if job_dir is None:
+            job_dir = str(Path.home() / ".nicescad" / "jobs")
+        self.job_dir = job_dir
+        # created with the first job - or at startup to resume the jobs of an earlier run
+        self.job_service: Optional[JobService] = None
+        self.serving = False
+        self.executor = executor if executor is not None else SolidExecutor()
+        self.cache = cache if cache is not None else LruCache(suffix=".scad")
+        # conversion results depend on the solid2 version
+        self.solid2_version = importlib.metadata.version("solidpython2")
+        self.app = FastAPI(lifespan=self.lifespan)
         self.app.post("/convert/")(self.convert)
+        self.app.post("/convert/batch")(self.convert_batch)
+        self.app.post("/render/")(self.render)
+        self.app.post("/jobs/", status_code=202)(self.submit_job)
+        self.app.get("/jobs/{job_id}")(self.get_job)
+        self.app.get("/jobs/{job_id}/result")(self.get_job_result)
+        self.app.delete("/jobs/{job_id}")(self.cancel_job)
         self.app.get("/version/")(self.version)
+        self.app.get("/stats/")(self.stats)
         self.app.get("/", response_class=HTMLResponse)(self.home)
 
+    @asynccontextmanager
+    async def lifespan(self, _app: FastAPI):
+        """
+        start the conversion workers and the job service with the server and stop them at shutdown
+        """
+        self.executor.start()
+        self.serving = True
+        if os.path.isfile(self.job_db_path):
+            self.get_job_service()
+        yield
+        self.serving = False
+        if self.job_service is not None:
+            await self.job_service.stop()
+        self.executor.shutdown()
+
+    @property
+    def job_db_path(self) -> str:
+        return os.path.join(self.job_dir, "jobs.db")
+
+    def get_job_service(self) -> JobService:
+        """
+        get the job service - creating the job database and result directory on first use
+
+        Returns:
+        JobService -- the job service (started if the server is running)
+        """
+        if self.job_service is None:
+            os.makedirs(self.job_dir, exist_ok=True)
+            self.job_service = JobService(
+                JobStore(self.job_db_path),
+                result_dir=os.path.join(self.job_dir, "results"),
+                run_job=self.run_job,
+                workers=self.max_renders,
+            )
+            if self.serving:
+                self.job_service.start()
+        return self.job_service
+
     async def home(self):
         """
         Endpoint to return the homepage with links.
@@ -66,6 +230,7 @@ class FastAPIServer:
                 <h1>Welcome to the nicescad solidpython to scad converter</h1>
                 <ul>
                     <li><a href="/version/">Check the version of nicescad</a></li>
+                    <li><a href="/stats/">Conversion cache statistics</a></li>
                     <li><a href="https://github.com/WolfgangFahl/nicescad/issues/28">nicescad GitHub issue</a></li>
                 </ul>
             </body>
@@ -81,6 +246,43 @@ class FastAPIServer:
         """
         return {"version": nicescad.__version__}
 
+    async def stats(self):
+        """
+        Endpoint to return the statistics of the conversion cache.
+
+        Returns:
+        dict -- the cache size and hit/miss counters
+        """
+        return {"conversion_cache": self.cache.as_dict()}
+
+    async def convert_code(self, python_code: str) -> str:
+        """
+        convert the given Python code to OpenSCAD code using the cache
+
+        Results are cached by a hash of the code. The conversion runs in a
+        worker process of the executor so that it does not block the event loop.
+
+        Arguments:
+        python_code: str -- the Python code
+
+        Returns:
+        str -- the OpenSCAD code
+
+        Raises:
+        HTTPException -- 400 if the code can not be converted, 504 on timeout
+        """
+        key = RenderCache.compute_key("p2scad", self.solid2_version, python_code)
+        openscad_code = self.cache.get(key)
+        if openscad_code is None:
+            try:
+                openscad_code = await self.executor.convert_async(python_code)
+            except ConversionTimeoutError as ex:
+                raise HTTPException(status_code=504, detail=str(ex))
+            except ConversionError as ex:
+                raise HTTPException(status_code=400, detail=str(ex))
+            self.cache.put(key, openscad_code)
+        return openscad_code
+
     async def convert(self, item: Item):
         """
         Endpoint to convert Python code to OpenSCAD code.
@@ -91,10 +293,309 @@ class FastAPIServer:
         Returns:
         dict -- the OpenSCAD code
         """
-        converter = SolidConverter(item.python_code)
-        openscad_code = converter.convert_to_openscad()
+        openscad_code = await self.convert_code(item.python_code)
         return {"openscad_code": openscad_code}
 
+    async def convert_indexed(self, index: int, task: asyncio.Task) -> Dict[str, Any]:
+        """
+        get the result record of a batch item
+
+        Arguments:
+        index: int -- the index of the item in the batch
+        task: asyncio.Task -- the conversion task of the item
+
+        Returns:
+        dict -- the index and either the OpenSCAD code or the error
+        """
+        result = {"index": index}
+        try:
+            result["openscad_code"] = await task
+        except HTTPException as ex:
+            result["error"] = ex.detail
+            result["status_code"] = ex.status_code
+        return result
+
+    async def convert_batch(self, batch: BatchItem):
+        """
+        Endpoint to convert many Python sources in one round trip.
+
+        The items are converted in parallel across the worker pool - identical
+        sources are converted once. Errors are reported per item.
+
+        Arguments:
+        batch: BatchItem -- the input Python codes and whether to stream
+
+        Returns:
+        dict -- the results in item order or, when streaming, newline
+        delimited json records in order of completion
+        """
+        if len(batch.items) > self.max_batch_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"at most {self.max_batch_size} items per batch",
+            )
+        tasks = {}
+        for item in batch.items:
+            if item.python_code not in tasks:
+                tasks[item.python_code] = asyncio.ensure_future(
+                    self.convert_code(item.python_code)
+                )
+        results = [
+            self.convert_indexed(index, tasks[item.python_code])
+            for index, item in enumerate(batch.items)
+        ]
+        if not batch.stream:
+            return {"results": list(await asyncio.gather(*results))}
+
+        async def ndjson() -> AsyncIterator[str]:
+            try:
+                for result in asyncio.as_completed(results):
+                    yield json.dumps(await result) + "\n"
+            finally:
+                # e.g. the client went away
+                for task in tasks.values():
+                    task.cancel()
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    def get_openscad(self) -> OpenScad:
+        """
+        get the OpenSCAD wrapper - detecting the openscad executable on first use
+
+        Returns:
+        OpenScad -- the wrapper
+
+        Raises:
+        HTTPException -- 503 if openscad is not available
+        """
+        if self.openscad is None:
+            try:
+                self.openscad = OpenScad(render_cache=None)
+            except Exception as ex:
+                raise HTTPException(status_code=503, detail=str(ex))
+        return self.openscad
+
+    def check_render_item(self, item: RenderItem, formats: Dict[str, Any]):
+        """
+        check the format, mode and source of the given render request
+
+        Arguments:
+        item: RenderItem -- the render request
+        formats: Dict[str, Any] -- the supported formats by name
+
+        Raises:
+        HTTPException -- 400 if the request is invalid
+        """
+        if item.format not in formats:
+            raise HTTPException(
+                status_code=400,
+                detail=f"format must be one of {', '.join(formats)}",
+            )
+        if item.mode not in (OpenScad.FINAL, OpenScad.PREVIEW):
+            raise HTTPException(status_code=400, detail=f"invalid mode {item.mode}")
+        if item.python_code is None and item.scad_code is None:
+            raise HTTPException(
+                status_code=400, detail="either python_code or scad_code is needed"
+            )
+
+    def check_scad_code(self, scad_code: str):
+        """
+        check the given OpenSCAD code in process before a render slot is spent on it
+
+        Arguments:
+        scad_code: str -- the OpenSCAD code
+
+        Raises:
+        HTTPException -- 400 with the problems found if the code can not be rendered
+        """
+        issues = self.get_openscad().validate(scad_code, base_dir=self.include_dir)
+        if issues:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": f"invalid OpenSCAD code: {issues[0]}",
+                    "issues": [issue.to_dict() for issue in issues],
+                },
+            )
+
+    async def render(self, item: RenderItem):
+        """
+        Endpoint to render SolidPython or OpenSCAD code in one round trip.
+
+        The result is streamed from openscad's standard output with chunked
+        transfer encoding - no result file is written.
+
+        Arguments:
+        item: RenderItem -- the source, export format and render mode
+
+        Returns:
+        StreamingResponse -- the rendered model
+        """
+        self.check_render_item(item, self.RENDER_FORMATS)
+        if item.python_code is not None:
+            scad_code = await self.convert_code(item.python_code)
+        else:
+            scad_code = item.scad_code
+        openscad = self.get_openscad()
+        self.check_scad_code(scad_code)
+        export_format, media_type = self.RENDER_FORMATS[item.format]
+        await self.render_semaphore.acquire()
+        chunks = openscad.render_to_stream_async(scad_code, export_format, item.mode)
+        released = False
+
+        async def cleanup():
+            # kills openscad if it is still running and frees the render slot - once
+            nonlocal released
+            if not released:
+                released = True
+                await chunks.aclose()
+                self.render_semaphore.release()
+
+        try:
+            # wait for the render to succeed before the response is started
+            first_chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        except OpenScadError as ex:
+            await cleanup()
+            raise HTTPException(
+                status_code=400, detail={"error": str(ex), "stderr": ex.stderr}
+            )
+        except BaseException:
+            await cleanup()
+            raise
+
+        async def stream() -> AsyncIterator[bytes]:
+            try:
+                yield first_chunk
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await cleanup()
+
+        filename = f"model.{item.format.replace('ascii', '')}"
+        return CleanupStreamingResponse(
+            stream(),
+            cleanup=cleanup,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    async def run_job(
+        self, job: JobRecord, result_path: str, on_progress: Callable[[str], None]
+    ):
+        """
+        render the given job to the given result path - called by the job service
+
+        Arguments:
+        job: JobRecord -- the job
+        result_path: str -- the path of the result file
+        on_progress: Callable -- callback for each line of openscad's progress output
+
+        Raises:
+        Exception -- if the job could not be rendered
+        """
+        scad_code = job.source
+        try:
+            if job.language == "python":
+                scad_code = await self.convert_code(job.source)
+            openscad = self.get_openscad()
+            self.check_scad_code(scad_code)
+        except HTTPException as ex:
+            # keep the status and the message instead of the repr of a structured detail
+            detail = ex.detail
+            if isinstance(detail, dict):
+                detail = detail.get("error", detail)
+            raise HTTPException(status_code=ex.status_code, detail=detail) from ex
+        async with self.render_semaphore:
+            result = await openscad.openscad_str_to_file(
+                scad_code, result_path, on_progress=on_progress, mode=job.mode
+            )
+        if result.returncode != 0:
+            msg = result.kill_reason or result.stderr.strip() or "render failed"
+            raise OpenScadError(msg, result.returncode, result.stderr)
+
+    def find_job(self, job_id: str) -> JobRecord:
+        """
+        get the job with the given id
+
+        Raises:
+        HTTPException -- 404 if there is no such job
+        """
+        job = None
+        if self.job_service is not None:
+            job = self.job_service.store.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"job {job_id} not found")
+        return job
+
+    async def submit_job(self, item: JobItem):
+        """
+        Endpoint to submit a headless render job.
+
+        Arguments:
+        item: JobItem -- the source, export format, render mode and optional callback url
+
+        Returns:
+        dict -- the state of the queued job including its job_id
+        """
+        self.check_render_item(item, self.JOB_FORMATS)
+        if item.callback_url and not JobService.is_local_url(item.callback_url):
+            raise HTTPException(
+                status_code=400, detail="the callback url must be a local url"
+            )
+        if item.python_code is not None:
+            source, language = item.python_code, "python"
+        else:
+            source, language = item.scad_code, "scad"
+            # invalid code never reaches the job queue
+            self.check_scad_code(source)
+        job = JobRecord(
+            source=source,
+            language=language,
+            format=item.format,
+            mode=item.mode,
+            callback_url=item.callback_url,
+        )
+        self.get_job_service().submit(job)
+        return job.to_dict()
+
+    async def get_job(self, job_id: str):
+        """
+        Endpoint to poll the state and progress of a job.
+
+        Returns:
+        dict -- the state of the job
+        """
+        return self.find_job(job_id).to_dict()
+
+    async def get_job_result(self, job_id: str):
+        """
+        Endpoint to fetch the result of a done job.
+
+        Returns:
+        FileResponse -- the rendered model
+        """
+        job = self.find_job(job_id)
+        if job.status != JobRecord.DONE or not job.result_path:
+            raise HTTPException(status_code=409, detail=f"job {job_id} is {job.status}")
+        media_type = self.RENDER_FORMATS[job.format][1]
+        return FileResponse(
+            job.result_path,
+            media_type=media_type,
+            filename=f"{job_id}.{job.format}",
+        )
+
+    async def cancel_job(self, job_id: str):
+        """
+        Endpoint to cancel a queued or running job.
+
+        Returns:
+        dict -- the state of the job
+        """
+        self.find_job(job_id)
+        return self.job_service.cancel(job_id).to_dict()
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -115,12 +616,63 @@ def main():
     parser.add_argument(
         "--port", default=8000, type=int, help="Port number to bind the server to."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of conversion worker processes (default: number of cpus).",
+    )
+    parser.add_argument(
+        "--timeout",
+        default=10.0,
+        type=float,
+        help="Time limit of a conversion in seconds.",
+    )
+    parser.add_argument(
+        "--job_dir",
+        help="Directory for the render job database and results (default: ~/.nicescad/jobs).",
+    )
+    parser.add_argument(
+        "--cache_size",
+        default=1024,
+        type=int,
+        help="Number of conversion results to keep in memory.",
+    )
+    parser.add_argument(
+        "--cache_ttl",
+        default=24 * 3600,
+        type=float,
+        help="Time to live of a cached conversion result in seconds.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        help="Directory for the on-disk tier of the conversion cache (default: none).",
+    )
+    parser.add_argument(
+        "--memory_limit",
+        default=1024,
+        type=int,
+        help="Memory limit of a conversion worker process in MB.",
+    )
 
     args = parser.parse_args()
 
     if args.serve:
-        server = FastAPIServer()
-        uvicorn.run(server.app, host="0.0.0.0", port=8000)
+        executor = SolidExecutor(
+            max_workers=args.workers,
+            timeout=args.timeout,
+            memory=args.memory_limit * 1024 * 1024,
+        )
+        disk_cache = None
+        if args.cache_dir:
+            disk_cache = RenderCache(args.cache_dir, max_age=args.cache_ttl)
+        cache = LruCache(
+            capacity=args.cache_size,
+            ttl=args.cache_ttl,
+            disk_cache=disk_cache,
+            suffix=".scad",
+        )
+        server = FastAPIServer(executor, cache, job_dir=args.job_dir)
+        uvicorn.run(server.app, host=args.host, port=args.port)
     else:
         if args.file:
             with open(args.file, "r") as f:
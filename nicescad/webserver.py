@@ -4,9 +4,12 @@ Created on 2023-06-19
 @author: wf
 """
 
+import asyncio
 import os
+import time
 import uuid
 from pathlib import Path
+from typing import List, Optional, Set
 
 from ngwidgets.file_selector import FileSelector
 from ngwidgets.input_webserver import InputWebserver, InputWebSolution
@@ -14,9 +17,14 @@ from ngwidgets.local_filepicker import LocalFilePicker
 from ngwidgets.scene_frame import SceneFrame
 from ngwidgets.short_url import ShortUrl
 from ngwidgets.webserver import WebserverConfig
-from nicegui import Client, app, ui
+from nicegui import Client, app, background_tasks, ui
 
+from nicescad.file_watcher import FileWatcher
+from nicescad.mesh import MeshStats
 from nicescad.openscad import OpenScad
+from nicescad.process import Subprocess
+from nicescad.render_index import RenderIndex
+from nicescad.render_scheduler import RenderJob, RenderScheduler
 from nicescad.version import Version
 
 
@@ -49,6 +57,12 @@ class NiceScadWebServer(InputWebserver):
 $fn=30;
 """
         )
+        self.render_scheduler = RenderScheduler()
+        # idle time in seconds before a live preview is rendered
+        self.live_delay = 1.0
+        # prerendered examples and designs - see configure_run
+        self.render_index = None
+        self.prerender_interval = None
         self.design_dir = Path.home() / ".nicescad" / "designs"
         self.design_dir.mkdir(parents=True, exist_ok=True)
         app.add_static_files("/stl", self.oscad.tmp_dir)
@@ -71,6 +85,28 @@ $fn=30;
             else NiceScadWebServer.examples_path()
         )
         self.root_path = os.path.abspath(root_path)
+        if getattr(self.args, "render_workers", None):
+            self.render_scheduler.max_workers = self.args.render_workers
+        if getattr(self.args, "render_queue", None):
+            self.render_scheduler.max_queue_depth = self.args.render_queue
+        if getattr(self.args, "render_timeout", None):
+            self.oscad.limits.timeout = self.args.render_timeout
+            if self.oscad.limits.cpu_time is None:
+                self.oscad.limits.cpu_time = int(self.args.render_timeout)
+        if getattr(self.args, "live_delay", None):
+            self.live_delay = self.args.live_delay
+        if not getattr(self.args, "no_prerender", False):
+            self.render_index = RenderIndex(
+                self.oscad,
+                roots=[self.examples_path(), str(self.design_dir)],
+                scheduler=self.render_scheduler,
+            )
+            self.prerender_interval = getattr(self.args, "prerender_interval", None)
+            app.add_static_files("/index", self.render_index.index_dir)
+            app.on_startup(self.start_prerender)
+        warm_workers = getattr(self.args, "warm_workers", 0)
+        if warm_workers and self.oscad.start_worker_pool(size=warm_workers):
+            app.on_startup(self.oscad.prewarm_async)
         self.allowed_urls = [
             "https://raw.githubusercontent.com/WolfgangFahl/nicescad/main/examples/",
             "https://raw.githubusercontent.com/openscad/openscad/master/examples/",
@@ -78,6 +114,14 @@ $fn=30;
             self.root_path,
         ]
 
+    def start_prerender(self):
+        """
+        prerender the examples and designs in the background
+        """
+        background_tasks.create(
+            self.render_index.run_periodically(self.prerender_interval)
+        )
+
     @classmethod
     def examples_path(cls) -> str:
         # the root directory (default: examples)
@@ -103,9 +147,28 @@ class NiceScadSolution(InputWebSolution):
         super().__init__(webserver, client)  # Call to the superclass constructor
         self.input = "example.scad"
         self.stl_name = f"nicescad_{uuid.uuid4().hex}.stl"
+        self.preview_stl_name = self.stl_name.replace(".stl", "_preview.stl")
+        self.preview_first = True
+        # seconds to wait for the browser to load a level of detail
+        self.lod_load_timeout = 120.0
         self.do_trace = True
         self.html_view = None
         self.oscad = webserver.oscad
+        self.render_job = None
+        self.render_start = None
+        # the background analysis of the last rendered mesh
+        self.analyze_task = None
+        # re-render when the local input file or one of its includes is saved
+        self.watch_file = True
+        self.file_watcher = None
+        # preview render after typing - see code_changed
+        self.live_render = False
+        self.live_delay = webserver.live_delay
+        self.live_task = None
+        self.live_hash = None
+        client.on_disconnect(self.cancel_render)
+        client.on_disconnect(self.stop_watching)
+        client.on_disconnect(self.cancel_live_render)
         self.code = """// nicescad example
 module example() {
   translate([0,0,15]) {
@@ -115,44 +178,353 @@ module example() {
 }
 example();"""
 
+    def show_render_status(self, job: RenderJob):
+        """
+        show the queue position or the spinner and the elapsed time for the given render job
+
+        Args:
+            job (RenderJob): the render job
+        """
+        queued = job.status == RenderJob.QUEUED
+        running = job.status == RenderJob.RUNNING
+        if running:
+            self.render_start = time.time()
+            self.render_timer.activate()
+        else:
+            self.render_timer.deactivate()
+        self.render_status.text = job.message if queued else ""
+        self.render_status.visible = queued or running
+        self.progress_view.visible = running
+        self.update_elapsed()
+
+    def update_elapsed(self):
+        """
+        show the elapsed time of the running render
+        """
+        if self.progress_view.visible and self.render_start is not None:
+            elapsed = time.time() - self.render_start
+            self.render_status.text = f"rendering ... {elapsed:.0f} s"
+
+    def show_render_progress(self, line: str):
+        """
+        show a line of openscad's progress output while rendering
+
+        Args:
+            line (str): the progress line
+        """
+        self.log_view.push(line.rstrip())
+        self.update_elapsed()
+
+    def cancel_render(self):
+        """
+        cancel the render job in flight (if any)
+        """
+        if self.render_job is not None:
+            self.webserver.render_scheduler.cancel(self.render_job)
+
     async def render(self, _click_args=None):
         """Renders the OpenScad string and updates the 3D scene with the result.
 
+        The render job is queued in the render scheduler of the webserver
+        which limits the number of concurrent openscad processes. A render
+        job that is still in flight is cancelled. With preview_first a fast
+        preview is shown first and then refined to full quality. An explicit
+        render always runs openscad - prerendered meshes are only shown on load.
+
         Args:
             click_args (object): The click event arguments.
         """
+        await self.stop_renders()
+        if not self.check_code(self.code):
+            return
+        ui.notify("rendering ...")
+        with self.scene:
+            self.stl_link.visible = False
+            self.scene_frame.color_picker_button.disable()
+        modes = [OpenScad.FINAL]
+        if self.preview_first:
+            modes.insert(0, OpenScad.PREVIEW)
+        for mode in modes:
+            ok = await self.render_mode(self.code, mode)
+            if not ok:
+                break
+
+    def check_code(self, openscad_str: str, with_notify: bool = True) -> bool:
+        """
+        check the given code before a render is queued and show the problems found
+
+        Args:
+            openscad_str (str): the OpenSCAD code
+            with_notify (bool): notify about the problems - otherwise they are only logged
+
+        Returns:
+            bool: True if the code may be rendered
+        """
+        source_path = self.render_source_path(openscad_str)
+        issues = self.oscad.validate(openscad_str, source_path)
+        for issue in issues:
+            self.log_view.push(str(issue))
+        if issues and with_notify:
+            ui.notify(f"not rendered - {len(issues)} problem(s) e.g. {issues[0]}")
+        return not issues
+
+    async def render_mode(self, openscad_str: str, mode: str) -> bool:
+        """
+        render the given OpenScad string in the given mode and load the result into the scene
+
+        Args:
+            openscad_str (str): the OpenSCAD code
+            mode (str): the render mode - final or preview
+
+        Returns:
+            bool: True if the result was loaded into the scene
+        """
+        job = None
+        ok = False
         try:
-            self.progress_view.visible = True
-            ui.notify("rendering ...")
-            with self.scene:
-                self.stl_link.visible = False
-                self.scene_frame.color_picker_button.disable()
-            openscad_str = self.code
-            stl_path = stl_path = os.path.join(self.oscad.tmp_dir, self.stl_name)
+            preview = mode == OpenScad.PREVIEW
+            stl_name = self.preview_stl_name if preview else self.stl_name
+            stl_path = os.path.join(self.oscad.tmp_dir, stl_name)
+            if self.analyze_task is not None:
+                # the stl file is about to be replaced
+                self.analyze_task.cancel()
             if os.path.exists(stl_path):
                 os.remove(stl_path)
-            render_result = await self.oscad.openscad_str_to_file(
-                openscad_str, stl_path
+            source_path = self.render_source_path(openscad_str)
+            job = self.webserver.render_scheduler.submit(
+                self.client.id,
+                lambda: self.oscad.openscad_str_to_file(
+                    openscad_str,
+                    stl_path,
+                    on_progress=self.show_render_progress,
+                    mode=mode,
+                    source_path=source_path,
+                    mesh_stats=False,
+                ),
+                on_update=self.show_render_status,
             )
-            if render_result.returncode == 0:
-                ui.notify("stl created ... loading into scene")
-                self.stl_link.visible = True
-                self.scene_frame.clear()
-                # avoid caching
-                stl_url=f"/stl/{self.stl_name}?v={uuid.uuid4().hex}"
-                self.scene_frame.load_stl(
-                    stl_name=self.stl_name, url=stl_url, scale=0.1
-                )
-                self.scene_frame.update()
+            self.render_job = job
+            if job.status == RenderJob.REJECTED:
+                ui.notify(job.message)
+                return ok
+            try:
+                render_result = await job.wait()
+            except asyncio.CancelledError:
+                if job.status != RenderJob.CANCELLED:
+                    # the render itself has been cancelled e.g. by a newer save
+                    self.webserver.render_scheduler.cancel(job)
+                    raise
+                self.log_view.push("render cancelled")
+                return ok
+            if render_result.killed:
+                ui.notify(f"render killed: {render_result.kill_reason}")
+            elif render_result.returncode == 0:
+                ui.notify(f"{mode} stl created ... loading into scene")
+                self.stl_link.visible = not preview
+                lod_paths = []
+                if not preview and render_result.mesh_stats is not None:
+                    # levels of detail of an earlier view of the same design
+                    lod_paths = await self.oscad.create_lods_async(
+                        render_result, cached_only=True
+                    )
+                stl_names = [os.path.basename(path) for path in lod_paths]
+                stl_names.append(stl_name)
+                self.load_levels(stl_names)
+                if not lod_paths or render_result.mesh_stats is None:
+                    self.analyze_task = background_tasks.create(
+                        self.analyze_mesh(render_result, mode)
+                    )
+                ok = True
             else:
                 ui.notify(
                     f"failed to create stl return code {render_result.returncode}"
                 )
-            # show render result in log
-            self.log_view.push(render_result.stderr)
+            # the progress has already been streamed to the log
+            if render_result.cache_hit or render_result.exception:
+                self.log_view.push(render_result.stderr)
+            if render_result.mesh_stats is not None:
+                self.log_view.push(f"{mode}: {render_result.mesh_stats}")
+        except asyncio.CancelledError:
+            raise
+        except BaseException as ex:
+            self.handle_exception(ex, self.do_trace)
+        finally:
+            # a newer render might already be in flight
+            if self.render_job is job:
+                self.render_job = None
+                self.render_timer.deactivate()
+                self.progress_view.visible = False
+                self.render_status.visible = False
+        return ok
+
+    async def analyze_mesh(self, render_result: Subprocess, mode: str):
+        """
+        compute the statistics and levels of detail of the given render result
+        after it has been shown - the levels of detail are kept in the render
+        cache for the next view
+
+        Args:
+            render_result (Subprocess): the render result
+            mode (str): the render mode - final or preview
+        """
+        try:
+            if render_result.mesh_stats is None:
+                render_result.mesh_stats = await self.oscad.get_mesh_stats_async(
+                    render_result
+                )
+                if render_result.mesh_stats is not None:
+                    self.log_view.push(f"{mode}: {render_result.mesh_stats}")
+            if mode != OpenScad.PREVIEW:
+                await self.oscad.create_lods_async(render_result)
+        except asyncio.CancelledError:
+            raise
         except BaseException as ex:
             self.handle_exception(ex, self.do_trace)
-        self.progress_view.visible = False
+
+    async def show_indexed(self, openscad_str: str) -> bool:
+        """
+        show the prerendered mesh of the given code (if any)
+
+        Args:
+            openscad_str (str): the OpenSCAD code
+
+        Returns:
+            bool: True if a prerendered mesh has been loaded into the scene
+        """
+        index = self.webserver.render_index
+        if index is None:
+            return False
+        entry = await asyncio.to_thread(
+            index.lookup, openscad_str, self.render_source_path(openscad_str)
+        )
+        if entry is None:
+            return False
+        stl_path = os.path.join(self.oscad.tmp_dir, self.stl_name)
+        paths = await asyncio.to_thread(index.copy_to, entry, stl_path)
+        with self.client:
+            self.stl_link.visible = True
+            self.load_levels([os.path.basename(path) for path in paths])
+            if entry.mesh_stats is not None:
+                self.log_view.push(f"index: {MeshStats.from_dict(entry.mesh_stats)}")
+        return True
+
+    async def read_and_optionally_render(self, input_str, with_render: bool = False):
+        """
+        Reads the given input and renders it if requested - otherwise
+        the prerendered mesh of a catalog item is shown right away
+
+        Args:
+            input_str (str): The input string representing a URL or local file.
+            with_render(bool): if True also render
+        """
+        await super().read_and_optionally_render(input_str, with_render)
+        if not (with_render or self.args.render_on_load) and self.code:
+            await self.show_indexed(self.code)
+
+    def render_source_path(self, openscad_str: str) -> Optional[str]:
+        """
+        get the watched file to render in place so that its relative includes
+        resolve - only if the code is unchanged and has include/use dependencies
+
+        Args:
+            openscad_str (str): the OpenSCAD code to render
+
+        Returns:
+            Optional[str]: the path of the file or None to render the code as is
+        """
+        watcher = self.file_watcher
+        if watcher is None or not watcher.watched - {watcher.path}:
+            return None
+        try:
+            with open(watcher.path, "r") as scad_file:
+                unchanged = scad_file.read() == openscad_str
+        except OSError:
+            unchanged = False
+        return watcher.path if unchanged else None
+
+    def load_levels(self, stl_names: List[str]):
+        """
+        load the given levels of detail of a mesh into the scene
+
+        the coarsest level is loaded first - the full resolution mesh is
+        requested once the browser shows the coarse one and replaces it
+        as soon as the browser has loaded it
+
+        Args:
+            stl_names (List[str]): the names of the stl files, coarsest first and full resolution last
+        """
+        self.scene_frame.clear()
+        stl_object = self.load_level(stl_names[0])
+        self.scene_frame.update()
+        if len(stl_names) > 1:
+            background_tasks.create(self.swap_levels(stl_object, stl_names[-1]))
+
+    def load_level(self, stl_name: str) -> object:
+        """
+        load the given stl file into the scene
+
+        Args:
+            stl_name (str): the name of the stl file
+
+        Returns:
+            object: the stl object
+        """
+        # avoid caching
+        stl_url = f"/stl/{stl_name}?v={uuid.uuid4().hex}"
+        stl_object = self.scene_frame.load_stl(
+            stl_name=stl_name, url=stl_url, scale=0.1
+        )
+        return stl_object
+
+    async def wait_loaded(self, stl_object: object) -> bool:
+        """
+        wait until the browser has loaded the mesh of the given stl object
+
+        Args:
+            stl_object (object): the stl object
+
+        Returns:
+            bool: True if the mesh has been loaded - False if the object is gone or
+                the mesh did not load within lod_load_timeout seconds
+        """
+        js = f"""
+        new Promise((resolve) => {{
+          const check = () => {{
+            const object = getElement({self.scene.id})?.objects?.get("{stl_object.id}");
+            if (!object) resolve(false);
+            else if (object.userData.loaded) resolve(true);
+            else setTimeout(check, 100);
+          }};
+          check();
+        }})
+        """
+        try:
+            loaded = await self.client.run_javascript(js, timeout=self.lod_load_timeout)
+        except TimeoutError:
+            loaded = False
+        return bool(loaded)
+
+    async def swap_levels(self, coarse_object: object, stl_name: str):
+        """
+        load the full resolution mesh after the given coarse level of detail
+        and remove the coarse level once the full mesh has been loaded
+
+        Args:
+            coarse_object (object): the stl object of the coarse level
+            stl_name (str): the name of the full resolution stl file
+        """
+        await self.wait_loaded(coarse_object)
+        # the scene might have been cleared by a newer render in the meantime
+        if coarse_object.id not in self.scene.objects:
+            return
+        stl_object = self.load_level(stl_name)
+        self.scene_frame.update()
+        # a full mesh that does not load keeps the coarse level visible
+        if not await self.wait_loaded(stl_object):
+            return
+        if coarse_object.id in self.scene.objects:
+            self.scene_frame.stl_objects.pop(coarse_object.name, None)
+            coarse_object.delete()
 
     def read_input(self, input_str: str):
         """Reads the given input and handles any exceptions.
@@ -167,10 +539,85 @@ example();"""
             self.log_view.clear()
             self.error_msg = None
             self.stl_link.visible = False
+            self.update_watcher(input_str)
         except BaseException as e:
             self.code = None
             self.handle_exception(e)
 
+    def local_file(self, input_str: str) -> Optional[str]:
+        """
+        get the path of the given input if it is a local file that may be watched
+
+        Args:
+            input_str (str): the input URL or path
+
+        Returns:
+            Optional[str]: the absolute path or None
+        """
+        path = None
+        if self.is_local and input_str and os.path.isfile(input_str):
+            path = os.path.abspath(input_str)
+        return path
+
+    def update_watcher(self, input_str: str = None):
+        """
+        watch the given input (if it is a local file) instead of the file watched so far
+
+        Args:
+            input_str (str): the input URL or path - defaults to the current input
+        """
+        if input_str is None:
+            input_str = self.input
+        path = self.local_file(input_str) if self.watch_file else None
+        watcher = self.file_watcher
+        if watcher is not None and watcher.path == path:
+            return
+        if watcher is not None:
+            background_tasks.create(watcher.stop())
+            self.file_watcher = None
+        if path is not None:
+            self.file_watcher = FileWatcher(
+                path,
+                self.on_file_change,
+                dependency_graph=self.oscad.dependency_graph,
+            )
+            self.file_watcher.start()
+
+    def toggle_watch(self, args):
+        """
+        switch watching the input file on or off
+        """
+        self.watch_file = args.value
+        self.update_watcher()
+
+    async def stop_watching(self):
+        """
+        stop watching the input file e.g. when the client disconnects
+        """
+        watcher = self.file_watcher
+        self.file_watcher = None
+        if watcher is not None:
+            await watcher.stop()
+
+    async def on_file_change(self, changed: Set[str]):
+        """
+        reload and render the watched file after it or one of its includes changed
+
+        a render of an earlier save still in flight is cancelled by the watcher
+
+        Args:
+            changed (Set[str]): the changed paths
+        """
+        watcher = self.file_watcher
+        if watcher is None:
+            return
+        names = ", ".join(sorted(os.path.basename(path) for path in changed))
+        with self.client:
+            self.log_view.push(f"{names} changed")
+            with open(watcher.path, "r") as scad_file:
+                self.code = scad_file.read()
+            await self.render()
+
     def save_file(self):
         """Saves the current code to the last input file, if it was a local path."""
         if self.is_local and self.input:
@@ -225,9 +672,59 @@ example();"""
 
     async def code_changed(self, _cargs):
         """
-        react on changed code
+        react on changed code - in live mode a preview is rendered
+        after live_delay seconds without further changes
+        """
+        if not self.live_render:
+            ui.notify("code changed")
+            return
+        await self.stop_renders()
+        self.live_task = background_tasks.create(self.render_live())
+
+    def cancel_live_render(self):
+        """
+        cancel the pending or running live preview (if any)
+        """
+        if self.live_task is not None and not self.live_task.done():
+            self.live_task.cancel()
+
+    async def stop_renders(self):
+        """
+        cancel the live preview and the render job in flight (if any) and wait
+        until the openscad process is gone so that a session never runs two
+        renders at once
+        """
+        job = self.render_job
+        task = self.live_task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if job is not None:
+            self.webserver.render_scheduler.cancel(job)
+            if job.task is not None:
+                await asyncio.gather(job.task, return_exceptions=True)
+
+    async def render_live(self):
         """
-        ui.notify("code changed")
+        render a preview of the current code after the idle period -
+        unless the code is effectively unchanged since the last live preview
+        """
+        await asyncio.sleep(self.live_delay)
+        openscad_str = self.code
+        if not openscad_str:
+            return
+        content_hash = OpenScad.content_hash(openscad_str)
+        if content_hash == self.live_hash:
+            return
+        # a render in flight is replaced by the live preview
+        await self.stop_renders()
+        with self.client:
+            if not self.check_code(openscad_str, with_notify=False):
+                # no retry until the code changes
+                self.live_hash = content_hash
+                return
+            if await self.render_mode(openscad_str, OpenScad.PREVIEW):
+                self.live_hash = content_hash
 
     async def highlight_code(self, _cargs):
         """
@@ -314,6 +811,20 @@ example();"""
                                 icon="play_circle",
                                 handler=self.render,
                             )
+                            ui.checkbox("preview").bind_value(
+                                self, "preview_first"
+                            ).tooltip("show a fast preview before the full render")
+                            ui.checkbox("live").bind_value(self, "live_render").tooltip(
+                                f"render a preview {self.live_delay:.1f} s after typing"
+                            )
+                            if self.is_local:
+                                ui.checkbox(
+                                    "watch",
+                                    value=self.watch_file,
+                                    on_change=self.toggle_watch,
+                                ).tooltip(
+                                    "render again when the file or one of its includes is saved"
+                                )
                             self.stl_link = ui.link(
                                 "stl result", f"/stl/{self.stl_name}", new_tab=True
                             )
@@ -322,6 +833,11 @@ example();"""
                                 "dots", size="lg", color="blue"
                             )
                             self.progress_view.visible = False
+                            self.render_status = ui.label("")
+                            self.render_status.visible = False
+                            self.render_timer = ui.timer(
+                                1.0, self.update_elapsed, active=False
+                            )
                             self.code_area = (
                                 ui.textarea(on_change=self.code_changed)
                                 .bind_value(self, "code")
@@ -337,6 +853,7 @@ example();"""
             try:
                 self.setup_ui()
                 self.code = self.webserver.short_url.load(short_id)
+                background_tasks.create(self.show_indexed(self.code))
             except Exception as _ex:
                 ui.notify(f"invalid design {short_id}")
 
@@ -356,3 +873,9 @@ example();"""
             "cols=80"
         )
         sp_input.bind_value(self.oscad, "scad_prepend")
+        cache = self.oscad.render_cache
+        if cache is not None:
+            stats = cache.stats
+            ui.label(
+                f"render cache {cache.cache_dir}: {stats.hits} hits, {stats.misses} misses ({stats.hit_rate:.0%})"
+            )
@@ -0,0 +1,139 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from nicescad.batch_render import BatchRenderer
+from nicescad.blockscad_converter import BlockscadConverter
+from nicescad.lru_cache import LruCache
+from nicescad.openscad import OpenScad
+from nicescad.render_cache import RenderCache
+from tests.basetest import Basetest
+
+
+class TestBatchRender(Basetest):
+    """
+    test rendering whole directory trees
+    """
+
+    def write(self, path: str, content: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as scad_file:
+            scad_file.write(content)
+
+    def test_render_dir(self):
+        """
+        test rendering a directory tree, skipping up to date outputs and the summary
+        """
+        root = tempfile.mkdtemp()
+        output_dir = os.path.join(root, "out")
+        self.write(os.path.join(root, "cube.scad"), "cube(5);")
+        self.write(
+            os.path.join(root, "parts", "part.scad"), "include <lib.scad>\npart();"
+        )
+        self.write(
+            os.path.join(root, "parts", "lib.scad"), "module part() { sphere(3); }"
+        )
+        self.write(os.path.join(root, "broken.scad"), "syntax_error")
+        # a standalone part used by an assembly and a library of modules only
+        self.write(
+            os.path.join(root, "assembly", "wheel.scad"),
+            "module wheel() cylinder(1, 5);\nwheel();\n",
+        )
+        self.write(
+            os.path.join(root, "assembly", "shapes.scad"), "module axle() cube(1);\n"
+        )
+        self.write(
+            os.path.join(root, "assembly", "car.scad"),
+            "use <wheel.scad>\nuse <shapes.scad>\nwheel();\naxle();\n",
+        )
+        oscad = OpenScad(render_cache=RenderCache(tempfile.mkdtemp()))
+        renderer = BatchRenderer(oscad, root, output_dir, workers=2, blockscad=False)
+        summary = renderer.run()
+        if self.debug:
+            print(json.dumps(summary, indent=2))
+        # no BlockSCAD converter (and cache directory) is needed
+        self.assertIsNone(renderer.blockscad_converter)
+        # lib.scad and shapes.scad are libraries and not rendered on their own
+        self.assertEqual(5, summary["total"])
+        self.assertEqual(4, summary["rendered"])
+        self.assertEqual(1, summary["failed"])
+        libraries = {
+            os.path.basename(library["input_path"]): library["reason"]
+            for library in summary["libraries"]
+        }
+        self.assertEqual({"lib.scad", "shapes.scad"}, set(libraries))
+        self.assertIn("included by", libraries["lib.scad"])
+        self.assertIn("without top level geometry", libraries["shapes.scad"])
+        self.assertTrue(os.path.isfile(os.path.join(output_dir, "parts", "part.stl")))
+        with open(os.path.join(output_dir, "summary.json")) as json_file:
+            self.assertEqual(summary["results"], json.load(json_file)["results"])
+        by_name = {
+            os.path.basename(result["input_path"]): result
+            for result in summary["results"]
+        }
+        self.assertEqual(12, by_name["cube.scad"]["mesh_stats"]["triangle_count"])
+        self.assertIn("error", by_name["broken.scad"]["error"].lower())
+        # up to date outputs are skipped
+        summary = renderer.run()
+        self.assertEqual(4, summary["skipped"])
+        # touching an input without changing it does not trigger a render
+        later = time.time() + 10
+        os.utime(os.path.join(root, "cube.scad"), (later, later))
+        # a new renderer only knows the state of the last run
+        renderer = BatchRenderer(oscad, root, output_dir, blockscad=False)
+        summary = renderer.run()
+        self.assertEqual(4, summary["skipped"])
+        # changing the library only renders the design that includes it
+        lib_path = os.path.join(root, "parts", "lib.scad")
+        self.write(lib_path, "module part() { sphere(4); }")
+        self.assertEqual(
+            [os.path.join(root, "parts", "part.scad")],
+            renderer.changed_inputs([lib_path]),
+        )
+        summary = renderer.run()
+        by_name = {
+            os.path.basename(result["input_path"]): result["status"]
+            for result in summary["results"]
+        }
+        self.assertEqual("rendered", by_name["part.scad"])
+        self.assertEqual("skipped", by_name["cube.scad"])
+
+    def test_render_blockscad(self):
+        """
+        test that the BlockSCAD files of a tree are converted as one batch
+        """
+        root = tempfile.mkdtemp()
+        output_dir = os.path.join(root, "out")
+        examples_dir = os.path.join(
+            os.path.dirname(__file__), "..", "nicescad_examples", "blockscad"
+        )
+        with open(os.path.join(examples_dir, "cube.xml")) as xml_file:
+            self.write(os.path.join(root, "a", "cube.xml"), xml_file.read())
+        # a block the compiler does not support - the same document twice
+        torus = '<xml xmlns="https://blockscad3d.com"><block type="torus" id="1"></block></xml>'
+        for sub_dir in ["a", "b"]:
+            self.write(os.path.join(root, sub_dir, "torus.xml"), torus)
+        requests = []
+
+        class StandInConverter(BlockscadConverter):
+            async def convert_with_llm_async(self, xml_content, name, semaphore):
+                requests.append(name)
+                return "// OpenSCAD\ncube(1);\n", "model"
+
+        oscad = OpenScad(render_cache=None)
+        renderer = BatchRenderer(oscad, root, output_dir)
+        renderer.blockscad_converter = StandInConverter(cache=LruCache(suffix=".scad"))
+        summary = renderer.run()
+        self.assertEqual(3, summary["rendered"], summary)
+        self.assertEqual(1, len(requests))
+        for sub_dir in ["a", "b"]:
+            scad_path = os.path.join(output_dir, sub_dir, "torus.scad")
+            self.assertTrue(os.path.isfile(scad_path))
+        self.assertEqual({}, renderer.conversions)
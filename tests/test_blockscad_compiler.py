@@ -0,0 +1,122 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import tempfile
+from pathlib import Path
+
+from nicescad.blockscad_compiler import (
+    BlockscadCompileError,
+    BlockscadCompiler,
+    UnsupportedBlockError,
+)
+from nicescad.blockscad_converter import BlockscadConverter
+from tests.basetest import Basetest
+
+
+class TestBlockscadCompiler(Basetest):
+    """
+    test the local BlockSCAD XML to OpenSCAD compiler
+    """
+
+    def number(self, name: str, num: str) -> str:
+        return f'<value name="{name}"><shadow type="math_number"><field name="NUM">{num}</field></shadow></value>'
+
+    def var(self, name: str, var: str) -> str:
+        return f'<value name="{name}"><shadow type="math_number"><field name="NUM">1</field></shadow><block type="variables_get"><field name="VAR">{var}</field></block></value>'
+
+    def document(self, blocks: str) -> str:
+        return f'<xml xmlns="https://blockscad3d.com"><version num="1.13.0"></version>{blocks}</xml>'
+
+    def body(self, scad_code: str) -> str:
+        """
+        get the code without the header
+        """
+        lines = scad_code.split("\n")[len(BlockscadCompiler.HEADER) :]
+        return "\n".join(lines).strip()
+
+    def test_compile(self):
+        """
+        test transforms, set operations, statement chains and expressions
+        """
+        # (a - (b - c)) * 2 with a shadowed operand
+        arithmetic = (
+            '<value name="XVAL"><block type="math_arithmetic"><field name="OP">MULTIPLY</field>'
+            '<value name="A"><block type="math_arithmetic"><field name="OP">MINUS</field>'
+            f'{self.var("A", "a")}'
+            '<value name="B"><block type="math_arithmetic"><field name="OP">MINUS</field>'
+            f'{self.var("A", "b")}{self.var("B", "c")}</block></value>'
+            "</block></value>"
+            f'{self.number("B", "2")}'
+            "</block></value>"
+        )
+        xml = self.document(
+            '<block type="variables_set"><field name="VAR">a</field>'
+            f'{self.number("VALUE", "3")}'
+            '<next><block type="color"><field name="COLOR">#ff0000</field>'
+            '<statement name="A"><block type="difference">'
+            f'<statement name="A"><block type="sphere">{self.number("RAD", "5")}</block></statement>'
+            '<statement name="MINUS0"><block type="translate">'
+            f'{arithmetic}{self.number("YVAL", "0")}{self.number("ZVAL", "-1")}'
+            '<statement name="A"><block type="cube"><field name="CENTERDROPDOWN">true</field>'
+            f'{self.number("XVAL", "1")}{self.number("YVAL", "2")}{self.number("ZVAL", "3")}'
+            f'<next><block type="sphere">{self.number("RAD", "1")}</block></next>'
+            "</block></statement></block></statement>"
+            "</block></statement></block></next></block>"
+        )
+        expected = """a = 3;
+color([1, 0, 0]) {
+  difference() {
+    sphere(r = 5);
+    translate([(a - (b - c)) * 2, 0, -1]) {
+      cube([1, 2, 3], center = true);
+      sphere(r = 1);
+    }
+  }
+}"""
+        scad_code = BlockscadCompiler().compile_string(xml)
+        if self.debug:
+            print(scad_code)
+        self.assertEqual(expected, self.body(scad_code))
+        # deterministic
+        self.assertEqual(scad_code, BlockscadCompiler().compile_string(xml))
+
+    def test_errors(self):
+        """
+        test unsupported blocks and documents that are not BlockSCAD XML
+        """
+        with self.assertRaises(UnsupportedBlockError) as context:
+            BlockscadCompiler().compile_string(
+                self.document('<block type="torus"></block>')
+            )
+        self.assertEqual("torus", context.exception.block_type)
+        with self.assertRaises(BlockscadCompileError):
+            BlockscadCompiler().compile_string("<svg></svg>")
+        with self.assertRaises(BlockscadCompileError):
+            BlockscadCompiler().compile_string("<xml")
+
+    def test_llm_fallback(self):
+        """
+        test that only documents with unsupported blocks are sent to the language model
+        """
+        calls = []
+
+        class RecordingConverter(BlockscadConverter):
+            def convert_with_llm(self, xml_content: str, name: str = None) -> str:
+                calls.append(name)
+                return "// OpenSCAD\ntorus();\n"
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name, block in [
+                ("sphere", f'<block type="sphere">{self.number("RAD", "2")}</block>'),
+                ("torus", '<block type="torus"></block>'),
+            ]:
+                xml_path = Path(temp_dir) / f"{name}.xml"
+                xml_path.write_text(self.document(block))
+                scad_path = Path(temp_dir) / f"{name}.scad"
+                RecordingConverter(str(xml_path)).convert_to_scad(str(scad_path))
+                self.assertTrue(scad_path.read_text().startswith("// OpenSCAD"))
+        self.assertEqual(1, len(calls))
+        self.assertTrue(calls[0].endswith("torus.xml"))
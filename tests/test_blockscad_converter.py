@@ -29,10 +29,17 @@ Author: OpenAI ChatGPT
 Date: July 25, 2023
 """
 
+import asyncio
+import json
 import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 from nicescad.blockscad_converter import BlockscadConverter
+from nicescad.lru_cache import LruCache
+from nicescad.render_cache import RenderCache
 from nicescad.webserver import NiceScadWebServer
 from tests.basetest import Basetest
 
@@ -75,12 +82,9 @@ class TestBlockscadConverter(Basetest):
         """
         Test the conversion of BlockSCAD XML files to SCAD files. Compares the content of the output SCAD files
         with the expected content.
+
+        The examples are compiled locally so that the OpenAI API is not used.
         """
-        if self.inPublicCI():
-            return
-        # only comment out when really testing since openai API usage
-        # has a cost
-        return
         blockscad_files = list(self.blockscad_dir.glob("*.xml"))
         self.assertGreater(
             len(blockscad_files), 0, "No BlockSCAD XML files found for testing."
@@ -115,3 +119,93 @@ class TestBlockscadConverter(Basetest):
                     failures.append(expected_scad_file)
 
         self.assertEqual(0, len(failures))
+
+    def test_model_conversion(self):
+        """
+        test the cached and batched conversion of unsupported blocks with a
+        local stand-in for the model endpoint
+        """
+        requests = []
+        in_flight = [0, 0]
+        lock = threading.Lock()
+
+        class StandInHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                request = json.loads(self.rfile.read(length))
+                with lock:
+                    requests.append(request)
+                    in_flight[0] += 1
+                    in_flight[1] = max(in_flight)
+                time.sleep(0.1)
+                with lock:
+                    in_flight[0] -= 1
+                content = "```openscad\n// OpenSCAD\ntorus();\n```"
+                response = {
+                    "id": "stand-in",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{httpd.server_port}/v1"
+        cache_dir = tempfile.mkdtemp()
+
+        def converter() -> BlockscadConverter:
+            cache = LruCache(disk_cache=RenderCache(cache_dir), suffix=".scad")
+            return BlockscadConverter(
+                base_url=base_url, model="stand-in", cache=cache, max_in_flight=2
+            )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_paths = [str(path) for path in self.blockscad_dir.glob("*.xml")]
+            for i in range(5):
+                xml_path = Path(temp_dir) / f"torus{i}.xml"
+                xml_path.write_text(
+                    '<xml xmlns="https://blockscad3d.com">'
+                    f'<block type="torus" id="{i}"></block></xml>'
+                )
+                xml_paths.append(str(xml_path))
+            # identical documents are only sent once
+            xml_paths.append(xml_paths[-1])
+            scad_dir = Path(temp_dir) / "scad"
+            conversions = asyncio.run(
+                converter().convert_batch_async(xml_paths, str(scad_dir))
+            )
+            self.assertEqual([None] * len(xml_paths), [c.error for c in conversions])
+            sources = [conversion.source for conversion in conversions]
+            self.assertEqual(len(xml_paths) - 6, sources.count("compiler"))
+            self.assertEqual(6, sources.count("model"))
+            self.assertEqual(5, len(requests))
+            self.assertLessEqual(in_flight[1], 2)
+            self.assertEqual("stand-in", requests[0]["model"])
+            self.assertEqual(
+                "// OpenSCAD\ntorus();\n", (scad_dir / "torus0.scad").read_text()
+            )
+            # a new converter finds the results on disk - the model is not called again
+            conversions = asyncio.run(
+                converter().convert_batch_async(xml_paths, str(scad_dir))
+            )
+            self.assertEqual(6, [c.source for c in conversions].count("cache"))
+            scad_path = Path(temp_dir) / "single.scad"
+            converter().convert_file(xml_paths[-1], str(scad_path))
+            self.assertEqual(5, len(requests))
+        httpd.shutdown()
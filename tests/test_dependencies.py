@@ -0,0 +1,112 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import os
+import tempfile
+
+from nicescad.dependencies import DependencyGraph
+from nicescad.openscad import OpenScad
+from tests.basetest import Basetest
+
+
+class TestDependencies(Basetest):
+    """
+    test the include/use dependency graph
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.root = tempfile.mkdtemp()
+        self.lib_dir = tempfile.mkdtemp()
+        self.graph = DependencyGraph(library_paths=[self.lib_dir])
+
+    def write(self, path: str, content: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as scad_file:
+            scad_file.write(content)
+        return path
+
+    def test_parse_dependencies(self):
+        """
+        test finding the dependencies in OpenSCAD code
+        """
+        source = """include <parts/gear.scad>
+use<bolts.scad>
+// include <commented.scad>
+/* use <also_commented.scad>
+*/
+echo("include <in_string.scad>");
+import("base.stl");
+surface(file = "height.dat", center = true);
+"""
+        dependencies = DependencyGraph.parse_dependencies(source)
+        self.assertEqual(
+            [
+                ("include", "parts/gear.scad"),
+                ("use", "bolts.scad"),
+                ("import", "base.stl"),
+                ("import", "height.dat"),
+            ],
+            dependencies,
+        )
+
+    def test_graph(self):
+        """
+        test transitive dependencies, fingerprints and dependents
+        """
+        leaf = self.write(os.path.join(self.lib_dir, "leaf.scad"), "module leaf() {}")
+        shared = self.write(
+            os.path.join(self.root, "lib", "shared.scad"),
+            "use <leaf.scad>\nmodule shared() { leaf(); }",
+        )
+        design_a = self.write(
+            os.path.join(self.root, "a.scad"), "include <lib/shared.scad>\nshared();"
+        )
+        design_b = self.write(os.path.join(self.root, "b.scad"), "cube(1);")
+        design_c = self.write(
+            os.path.join(self.root, "c.scad"), "include <missing.scad>\ncube(2);"
+        )
+        self.assertEqual(sorted([leaf, shared]), self.graph.transitive(design_a))
+        self.assertEqual([], self.graph.transitive(design_b))
+        self.assertEqual(["missing.scad"], self.graph.entry(design_c).missing)
+        designs = [design_a, design_b, design_c]
+        self.assertEqual({design_a}, self.graph.dependents([leaf], designs))
+        fingerprints = [self.graph.fingerprint(design) for design in designs]
+        # a change of the leaf library only changes the fingerprint of a
+        self.write(leaf, "module leaf() { cube(1); }")
+        changed = [self.graph.fingerprint(design) for design in designs]
+        self.assertNotEqual(fingerprints[0], changed[0])
+        self.assertEqual(fingerprints[1:], changed[1:])
+        # a missing library that shows up changes the fingerprint
+        self.write(os.path.join(self.root, "missing.scad"), "module m() {}")
+        self.assertNotEqual(changed[2], self.graph.fingerprint(design_c))
+        # the graph survives a round trip
+        graph = DependencyGraph(library_paths=[self.lib_dir])
+        graph.load_dict(self.graph.to_dict())
+        self.assertEqual(self.graph.entries, graph.entries)
+        self.assertEqual(self.graph.fingerprint(design_a), graph.fingerprint(design_a))
+
+    def test_installation_libraries(self):
+        """
+        test that the libraries of the OpenSCAD installation e.g. MCAD are resolved
+        """
+        install_dir = tempfile.mkdtemp()
+        openscad_exec = self.write(os.path.join(install_dir, "bin", "openscad"), "")
+        shapes = self.write(
+            os.path.join(
+                install_dir, "share", "openscad", "libraries", "MCAD", "shapes.scad"
+            ),
+            "module box() cube(1);",
+        )
+        oscad = OpenScad(openscad_exec=openscad_exec, render_cache=None)
+        design = self.write(
+            os.path.join(self.root, "design.scad"), "use <MCAD/shapes.scad>\nbox();"
+        )
+        graph = oscad.dependency_graph
+        self.assertEqual(shapes, graph.resolve("use", "MCAD/shapes.scad", self.root))
+        graph.fingerprint(design)
+        self.assertFalse(graph.entry(shapes).missing)
+        self.assertEqual([], oscad.validate("use <MCAD/shapes.scad>\nbox();", design))
@@ -0,0 +1,70 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import asyncio
+import os
+import tempfile
+
+from nicescad.dependencies import DependencyGraph
+from nicescad.file_watcher import FileWatcher
+from tests.basetest import Basetest
+
+
+class TestFileWatcher(Basetest):
+    """
+    test watching a design and its includes
+    """
+
+    def write(self, path: str, content: str) -> str:
+        with open(path, "w") as scad_file:
+            scad_file.write(content)
+        return path
+
+    def test_watch(self):
+        """
+        test debouncing, watching includes and cancelling outdated callbacks
+        """
+        root = tempfile.mkdtemp()
+        lib_dir = os.path.join(root, "lib")
+        os.makedirs(lib_dir)
+        lib_path = self.write(os.path.join(lib_dir, "lib.scad"), "module part() {}")
+        design_path = self.write(
+            os.path.join(root, "design.scad"), "include <lib/lib.scad>\npart();"
+        )
+        calls = []
+        finished = []
+
+        async def on_change(changed):
+            calls.append(changed)
+            await asyncio.sleep(1.0)
+            finished.append(changed)
+
+        async def run():
+            graph = DependencyGraph(library_paths=[])
+            watcher = FileWatcher(design_path, on_change, graph, debounce=0.1)
+            watcher.start()
+            # give the watcher time to set up
+            await asyncio.sleep(0.5)
+            self.assertEqual({design_path, lib_path}, watcher.watched)
+            # a burst of saves is handled once
+            for i in range(5):
+                self.write(design_path, f"include <lib/lib.scad>\npart();// {i}")
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.5)
+            self.assertEqual([{design_path}], calls)
+            # a newer save of the include cancels the callback in flight
+            self.write(lib_path, "module part() { cube(1); }")
+            await asyncio.sleep(1.5)
+            self.assertEqual([{design_path}, {lib_path}], calls)
+            self.assertEqual([{lib_path}], finished)
+            # unrelated files in the watched directories are ignored
+            self.write(os.path.join(root, "other.scad"), "cube(2);")
+            await asyncio.sleep(0.5)
+            self.assertEqual(2, len(calls))
+            await watcher.stop()
+            self.assertFalse(watcher.running)
+
+        asyncio.run(run())
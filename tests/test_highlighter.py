@@ -0,0 +1,93 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import glob
+import os
+
+from pygments import highlight, lex
+from pygments.formatters.html import HtmlFormatter
+from pygments.token import Error, Keyword, Name, Number
+
+from nicescad.highlighter import OpenSCADLexer, ScadHighlighter
+from tests.basetest import Basetest
+
+
+class TestHighlighter(Basetest):
+    """
+    test the cached and incremental highlighting
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        examples_path = os.path.join(
+            os.path.dirname(__file__), "..", "nicescad_examples"
+        )
+        self.scad_files = sorted(
+            glob.glob(f"{examples_path}/**/*.scad", recursive=True)
+        )
+
+    def full_highlight(self, code: str) -> str:
+        """
+        highlight the given code at once
+        """
+        return highlight(code, OpenSCADLexer(), HtmlFormatter())
+
+    def test_lexer(self):
+        """
+        test that keywords, builtins and numbers are recognized
+        """
+        code = "module m(r=1.5e2) { $fn=30; cube(PI); Size=-.5; }"
+        tokens = [(token, value) for token, value in lex(code, OpenSCADLexer())]
+        self.assertIn((Keyword, "module"), tokens)
+        self.assertIn((Name.Builtin, "cube"), tokens)
+        self.assertIn((Keyword.Constant, "PI"), tokens)
+        self.assertIn((Name.Variable.Magic, "$fn"), tokens)
+        self.assertIn((Name.Variable, "Size"), tokens)
+        self.assertIn((Number, "1.5e2"), tokens)
+        self.assertIn((Number, ".5"), tokens)
+        self.assertNotIn(Error, [token for token, _value in tokens])
+
+    def test_same_as_full_highlight(self):
+        """
+        test that the segmented highlighting gives the same html as highlighting at once
+        """
+        highlighter = ScadHighlighter()
+        codes = [
+            "",
+            "\n\ncube(1);\r\n\n",
+            '/* a\n "b */ x="c\n//d"; // "e\n/* unterminated\ncube(1);',
+        ]
+        for scad_file in self.scad_files:
+            with open(scad_file) as f:
+                codes.append(f.read())
+        for code in codes:
+            self.assertEqual(self.full_highlight(code), highlighter.highlight(code))
+
+    def test_incremental(self):
+        """
+        test that only changed segments are tokenized again
+        """
+        codes = []
+        for scad_file in self.scad_files:
+            with open(scad_file) as f:
+                codes.append(f.read())
+        code = "\n".join(codes)
+        highlighter = ScadHighlighter()
+        highlighter.highlight(code)
+        segment_misses = highlighter.segments.stats.misses
+        lines = code.split("\n")
+        middle = len(lines) // 2
+        # a statement line - not a line comment the change would end up in
+        while not lines[middle].endswith(";") or "/" in lines[middle]:
+            middle += 1
+        lines[middle] += " /* changed\n comment */"
+        changed = "\n".join(lines)
+        self.assertEqual(self.full_highlight(changed), highlighter.highlight(changed))
+        self.assertEqual(1, highlighter.segments.stats.misses - segment_misses)
+        # unchanged code comes from the document cache
+        document_hits = highlighter.documents.stats.hits
+        highlighter.highlight(changed)
+        self.assertEqual(document_hits + 1, highlighter.documents.stats.hits)
@@ -0,0 +1,82 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import asyncio
+import os
+import tempfile
+
+from nicescad.job_service import JobService
+from nicescad.job_store import JobRecord, JobStore
+from tests.basetest import Basetest
+
+
+class TestJobStore(Basetest):
+    """
+    test the persistent store of headless render jobs
+    """
+
+    def test_persistence(self):
+        """
+        test that queued and interrupted jobs survive a restart
+        """
+        db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+        store = JobStore(db_path)
+        first = store.add(JobRecord(source="cube(1);"))
+        second = store.add(JobRecord(source="cube(2)", language="python"))
+        claimed = store.claim_next()
+        self.assertEqual(first.job_id, claimed.job_id)
+        self.assertEqual(JobRecord.RUNNING, store.get(first.job_id).status)
+        store.update(second.job_id, progress="rendering")
+        store.close()
+        # the server stops while the first job is running
+        store = JobStore(db_path)
+        self.assertEqual(1, store.requeue_interrupted())
+        queued = store.jobs(JobRecord.QUEUED)
+        self.assertEqual([first.job_id, second.job_id], [job.job_id for job in queued])
+        job = store.get(second.job_id)
+        self.assertEqual("python", job.language)
+        self.assertEqual("rendering", job.progress)
+        self.assertNotIn("source", job.to_dict())
+        self.assertIsNone(store.get("unknown"))
+
+    def test_expire(self):
+        """
+        test that old finished jobs are removed together with their result files
+        """
+        job_dir = tempfile.mkdtemp()
+        store = JobStore(os.path.join(job_dir, "jobs.db"))
+
+        async def run_job(job, result_path, on_progress):
+            with open(result_path, "w") as result_file:
+                result_file.write("solid")
+
+        service = JobService(store, os.path.join(job_dir, "results"), run_job)
+        done = store.add(JobRecord(source="cube(1);"))
+        queued = store.add(JobRecord(source="cube(2);"))
+        asyncio.run(service.run(store.claim_next()))
+        result_path = service.result_path(done)
+        self.assertTrue(os.path.isfile(result_path))
+        self.assertEqual(0, service.expire())
+        service.max_age = 0
+        self.assertEqual(1, service.expire())
+        self.assertIsNone(store.get(done.job_id))
+        self.assertFalse(os.path.isfile(result_path))
+        # unfinished jobs are kept
+        self.assertIsNotNone(store.get(queued.job_id))
+
+    def test_local_url(self):
+        """
+        test that callbacks are restricted to local urls
+        """
+        for url, expected in [
+            ("http://localhost:8080/done", True),
+            ("http://127.0.0.1/hook", True),
+            ("https://[::1]:9000/", True),
+            ("http://example.com/hook", False),
+            ("http://10.0.0.1/hook", False),
+            ("file:///etc/passwd", False),
+        ]:
+            self.assertEqual(expected, JobService.is_local_url(url), url)
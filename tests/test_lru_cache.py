@@ -0,0 +1,62 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import tempfile
+import time
+
+from nicescad.lru_cache import LruCache
+from nicescad.render_cache import RenderCache
+from tests.basetest import Basetest
+
+
+class TestLruCache(Basetest):
+    """
+    test the in memory least recently used cache with its on-disk tier
+    """
+
+    def test_capacity(self):
+        """
+        test that the least recently used entries are evicted
+        """
+        cache = LruCache(capacity=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual("1", cache.get("a"))
+        cache.put("c", "3")
+        # b is the least recently used entry
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual("1", cache.get("a"))
+        self.assertEqual("3", cache.get("c"))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(3, cache.stats.hits)
+        self.assertEqual(1, cache.stats.misses)
+        self.assertEqual(1, cache.stats.evictions)
+
+    def test_ttl(self):
+        """
+        test that expired entries are not returned
+        """
+        cache = LruCache(ttl=0.05)
+        cache.put("a", "1")
+        self.assertEqual("1", cache.get("a"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, len(cache))
+
+    def test_disk_tier(self):
+        """
+        test that entries survive in the on-disk tier
+        """
+        cache_dir = tempfile.mkdtemp()
+        cache = LruCache(capacity=1, disk_cache=RenderCache(cache_dir), suffix=".scad")
+        cache.put("a", "cube(1);")
+        cache.put("b", "cube(2);")
+        # evicted from memory but still on disk
+        self.assertEqual("cube(1);", cache.get("a"))
+        # a new cache e.g. after a restart
+        cache = LruCache(disk_cache=RenderCache(cache_dir), suffix=".scad")
+        self.assertEqual("cube(2);", cache.get("b"))
+        self.assertEqual(1.0, cache.as_dict()["hit_rate"])
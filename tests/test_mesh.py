@@ -0,0 +1,141 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from nicescad.mesh import Mesh, MeshStats
+from nicescad.webserver import NiceScadWebServer
+from tests.basetest import Basetest
+
+
+class TestMesh(Basetest):
+    """
+    test the NumPy backed mesh loader and statistics
+    """
+
+    def cube_triangles(self, size: float = 2.0) -> np.ndarray:
+        """
+        get the triangle soup of a cube with the given size
+        """
+        v = np.array(
+            [
+                [0, 0, 0],
+                [1, 0, 0],
+                [1, 1, 0],
+                [0, 1, 0],
+                [0, 0, 1],
+                [1, 0, 1],
+                [1, 1, 1],
+                [0, 1, 1],
+            ],
+            dtype=np.float64,
+        )
+        f = np.array(
+            [
+                [0, 2, 1],
+                [0, 3, 2],
+                [4, 5, 6],
+                [4, 6, 7],
+                [0, 1, 5],
+                [0, 5, 4],
+                [1, 2, 6],
+                [1, 6, 5],
+                [2, 3, 7],
+                [2, 7, 6],
+                [3, 0, 4],
+                [3, 4, 7],
+            ]
+        )
+        return v[f] * size
+
+    def test_cube_stats(self):
+        """
+        test the statistics of a cube
+        """
+        mesh = Mesh.from_triangles(self.cube_triangles())
+        stats = mesh.stats()
+        if self.debug:
+            print(stats)
+        self.assertEqual(12, stats.triangle_count)
+        self.assertEqual(8, stats.vertex_count)
+        self.assertAlmostEqual(8.0, stats.volume)
+        self.assertAlmostEqual(24.0, stats.surface_area)
+        self.assertEqual([2.0, 2.0, 2.0], stats.size)
+        self.assertTrue(stats.watertight)
+        # an open box is not watertight
+        open_box = Mesh.from_triangles(self.cube_triangles()[2:])
+        self.assertFalse(open_box.stats().watertight)
+
+    def test_binary_roundtrip(self):
+        """
+        test saving and memory mapped loading of a binary stl file
+        """
+        mesh = Mesh.from_triangles(self.cube_triangles(size=3.0))
+        stl_path = os.path.join(tempfile.mkdtemp(), "cube.stl")
+        mesh.save_binary_stl(stl_path)
+        self.assertTrue(Mesh.is_binary_stl(stl_path))
+        loaded = Mesh.load(stl_path)
+        stats = loaded.stats()
+        self.assertEqual(12, stats.triangle_count)
+        self.assertAlmostEqual(27.0, stats.volume, places=4)
+        self.assertEqual(stats, MeshStats.from_dict(stats.to_dict()))
+
+    def test_ascii_stl(self):
+        """
+        test loading an ascii stl example
+        """
+        stl_path = os.path.join(
+            NiceScadWebServer.examples_path(),
+            "scad",
+            "openscad_examples",
+            "openjscad_logo.stl",
+        )
+        self.assertFalse(Mesh.is_binary_stl(stl_path))
+        mesh = Mesh.load(stl_path)
+        stats = mesh.stats()
+        if self.debug:
+            print(stats)
+        self.assertEqual(5592 // 2, stats.triangle_count)
+        self.assertLess(stats.vertex_count, 3 * stats.triangle_count)
+        self.assertGreater(stats.volume, 0)
+
+    def test_decimate(self):
+        """
+        test reducing a finely tessellated mesh to a triangle budget
+        """
+        # a tessellated sphere
+        theta, phi = np.meshgrid(
+            np.linspace(0, np.pi, 60), np.linspace(0, 2 * np.pi, 120), indexing="ij"
+        )
+        grid = np.stack(
+            [np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)],
+            axis=-1,
+        )
+        a, b, c, d = grid[:-1, :-1], grid[1:, :-1], grid[1:, 1:], grid[:-1, 1:]
+        triangles = np.concatenate(
+            [
+                np.stack([a, b, c], axis=-2).reshape(-1, 3, 3),
+                np.stack([a, c, d], axis=-2).reshape(-1, 3, 3),
+            ]
+        )
+        mesh = Mesh.from_triangles(triangles)
+        stats = mesh.stats()
+        for budget in [500, 2000]:
+            lod = mesh.decimate(budget)
+            lod_stats = lod.stats()
+            if self.debug:
+                print(f"{budget}: {lod_stats}")
+            self.assertLessEqual(lod_stats.triangle_count, budget)
+            # the decimated mesh should still use a good part of its budget
+            self.assertGreater(lod_stats.triangle_count, budget // 4)
+            self.assertAlmostEqual(
+                stats.surface_area, lod_stats.surface_area, delta=1.5
+            )
+        # a mesh within the budget is not touched
+        self.assertIs(mesh, mesh.decimate(len(mesh.faces)))
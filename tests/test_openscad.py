@@ -6,8 +6,11 @@ Created on 2023-07-19
 
 import asyncio
 import os
+import tempfile
 
+from nicescad.mesh import Mesh
 from nicescad.openscad import OpenScad
+from nicescad.render_cache import RenderCache
 from tests.basetest import Basetest
 
 
@@ -41,6 +44,241 @@ class TestOpenScad(Basetest):
         self.assertTrue(os.path.isfile(stl_path))
         pass
 
+    def test_render_cache(self):
+        """
+        test that rendering the same code twice is served from the render cache
+        """
+        oscad = OpenScad(render_cache=RenderCache(tempfile.mkdtemp()))
+        openscad_str = "cube(7);"
+        stl_path = os.path.join(oscad.tmp_dir, "cube7.stl")
+        result1 = asyncio.run(oscad.openscad_str_to_file(openscad_str, stl_path))
+        os.remove(stl_path)
+        result2 = asyncio.run(oscad.openscad_str_to_file(openscad_str, stl_path))
+        self.assertEqual(0, result1.returncode)
+        self.assertFalse(result1.cache_hit)
+        self.assertTrue(result2.cache_hit)
+        self.assertEqual(result1.cache_key, result2.cache_key)
+        self.assertTrue(os.path.isfile(stl_path))
+        stats = oscad.render_cache.stats
+        self.assertEqual(1, stats.hits)
+        self.assertEqual(1, stats.misses)
+
+    def test_render_progress(self):
+        """
+        test that openscad's progress output is streamed to a callback
+        """
+        oscad = OpenScad(render_cache=None)
+        stl_path = os.path.join(oscad.tmp_dir, "cube3.stl")
+        progress = []
+        result = asyncio.run(
+            oscad.openscad_str_to_file(
+                "cube(3);", stl_path, on_progress=progress.append
+            )
+        )
+        self.assertEqual(0, result.returncode)
+        self.assertTrue(len(progress) > 0)
+        self.assertEqual(result.stderr, "".join(progress))
+
+    def test_preview_mode(self):
+        """
+        test the options and the separate cache slot of the preview mode
+        """
+        oscad = OpenScad(render_cache=RenderCache(tempfile.mkdtemp()))
+        oscad.openscad_version = "OpenSCAD version 2021.01"
+        self.assertFalse(oscad.supports_manifold())
+        self.assertEqual([], oscad.get_options("cube.3mf"))
+        options = oscad.get_options("cube.stl", OpenScad.PREVIEW)
+        self.assertIn("$fn=12", options)
+        self.assertNotIn("--backend=manifold", options)
+        oscad.openscad_version = "OpenSCAD version 2025.06.01"
+        self.assertTrue(oscad.supports_manifold())
+        self.assertIn(
+            "--backend=manifold", oscad.get_options("cube.stl", OpenScad.PREVIEW)
+        )
+        openscad_str = "sphere(10);"
+        final_key = asyncio.run(oscad.get_cache_key_async(openscad_str, "s.stl"))
+        preview_key = asyncio.run(
+            oscad.get_cache_key_async(openscad_str, "s.stl", OpenScad.PREVIEW)
+        )
+        self.assertNotEqual(final_key, preview_key)
+        stl_path = os.path.join(oscad.tmp_dir, "sphere_preview.stl")
+        result = asyncio.run(
+            oscad.openscad_str_to_file(openscad_str, stl_path, mode=OpenScad.PREVIEW)
+        )
+        self.assertEqual(0, result.returncode)
+        self.assertEqual(preview_key, result.cache_key)
+
+    def test_binary_stl(self):
+        """
+        test that stl files are rendered in binary format by default
+        """
+        oscad = OpenScad(render_cache=None)
+        self.assertEqual(["--export-format", "binstl"], oscad.get_options("cube.stl"))
+        stl_path = os.path.join(oscad.tmp_dir, "cube_binary.stl")
+        result = asyncio.run(oscad.openscad_str_to_file("cube(4);", stl_path))
+        self.assertEqual(0, result.returncode)
+        with open(stl_path, "rb") as stl_file:
+            header = stl_file.read(84)
+        triangle_count = int.from_bytes(header[80:84], "little")
+        # the size of a binary stl is fully determined by the triangle count
+        self.assertEqual(84 + 50 * triangle_count, os.path.getsize(stl_path))
+        oscad.binary_stl = False
+        self.assertEqual([], oscad.get_options("cube.stl"))
+
+    def test_level_of_detail(self):
+        """
+        test creating decimated level of detail meshes of a render result
+        """
+        cache = RenderCache(tempfile.mkdtemp())
+        oscad = OpenScad(render_cache=cache, lod_budgets=[4, 10000000])
+        stl_path = os.path.join(oscad.tmp_dir, "sphere_lod.stl")
+        result = asyncio.run(oscad.openscad_str_to_file("sphere(10);", stl_path))
+        self.assertEqual(0, result.returncode)
+        lod_paths = asyncio.run(oscad.create_lods_async(result))
+        # the full resolution mesh is within the larger budget
+        self.assertEqual([oscad.lod_path(stl_path, 4)], lod_paths)
+        lod_stats = Mesh.load(lod_paths[0]).stats()
+        self.assertLessEqual(lod_stats.triangle_count, 4)
+        # the second time the decimated mesh comes from the cache
+        hits = cache.stats.hits
+        self.assertEqual(lod_paths, asyncio.run(oscad.create_lods_async(result)))
+        self.assertEqual(hits + 1, cache.stats.hits)
+
+    def test_deferred_mesh_analysis(self):
+        """
+        test showing a render result before its statistics and levels of detail exist
+        """
+        cache = RenderCache(tempfile.mkdtemp())
+        oscad = OpenScad(render_cache=cache, lod_budgets=[4])
+        stl_path = os.path.join(oscad.tmp_dir, "sphere_deferred.stl")
+
+        async def render():
+            return await oscad.openscad_str_to_file(
+                "sphere(11);", stl_path, mesh_stats=False
+            )
+
+        result = asyncio.run(render())
+        self.assertEqual(0, result.returncode)
+        self.assertIsNone(result.mesh_stats)
+        self.assertEqual([], asyncio.run(oscad.create_lods_async(result, True)))
+        # the statistics and the levels of detail share the loaded mesh
+        result.mesh_stats = asyncio.run(oscad.get_mesh_stats_async(result))
+        mesh = result.mesh
+        lod_paths = asyncio.run(oscad.create_lods_async(result))
+        self.assertIs(mesh, result.mesh)
+        self.assertEqual([oscad.lod_path(stl_path, 4)], lod_paths)
+        # the next view finds both in the render cache
+        result = asyncio.run(render())
+        self.assertEqual(mesh.stats(), result.mesh_stats)
+        self.assertEqual(lod_paths, asyncio.run(oscad.create_lods_async(result, True)))
+        self.assertIsNone(getattr(result, "mesh", None))
+
+    def test_warm_workers(self):
+        """
+        test rendering with pre-started openscad processes
+        """
+        oscad = OpenScad(render_cache=None)
+        if not oscad.start_worker_pool(size=1):
+            return
+        pool = oscad.worker_pool
+
+        async def render_all():
+            await oscad.prewarm_async()
+            self.assertEqual(1, pool.idle_count)
+            results = []
+            for i, code in enumerate(["cube(5);", "syntax_error", "sphere(3);"]):
+                stl_path = os.path.join(oscad.tmp_dir, f"warm_{i}.stl")
+                result = await oscad.openscad_str_to_file(code, stl_path)
+                results.append(result)
+            await pool.close_async()
+            return results
+
+        results = asyncio.run(render_all())
+        self.assertEqual([0, 1, 0], [result.returncode for result in results])
+        self.assertTrue(os.path.isfile(results[0].stl_path))
+        self.assertEqual(0, pool.idle_count)
+        # the first render used the prewarmed worker
+        self.assertGreaterEqual(pool.stats.warm, 1)
+        if self.debug:
+            print(pool.stats)
+
+    def test_concurrent_render(self):
+        """
+        test that concurrent renders use their own scratch files
+        """
+        oscad = OpenScad(render_cache=None)
+        scad_file1 = oscad.write_to_tmp_file("cube(1);")
+        scad_file2 = oscad.write_to_tmp_file("cube(2);")
+        self.assertNotEqual(scad_file1, scad_file2)
+        for scad_file in [scad_file1, scad_file2]:
+            os.remove(scad_file)
+
+        async def render_all():
+            tasks = []
+            for i in range(4):
+                stl_path = os.path.join(oscad.tmp_dir, f"cube{i}.stl")
+                tasks.append(oscad.openscad_str_to_file(f"cube({i+1});", stl_path))
+            results = await asyncio.gather(*tasks)
+            return results
+
+        results = asyncio.run(render_all())
+        for result in results:
+            self.assertEqual(0, result.returncode, result.stderr)
+            self.assertTrue(os.path.isfile(result.stl_path))
+        # all scratch files have been cleaned up
+        scad_files = [
+            name for name in os.listdir(oscad.tmp_dir) if name.endswith(".scad")
+        ]
+        self.assertEqual([], scad_files)
+
+    def test_render_in_place(self):
+        """
+        test that the scad_prepend is applied to designs rendered in place
+        """
+        oscad = OpenScad(scad_prepend="$fn=7;", render_cache=None)
+        design_dir = tempfile.mkdtemp()
+        with open(os.path.join(design_dir, "part.scad"), "w") as scad_file:
+            scad_file.write("module part() cylinder(r=1, h=2);\n")
+        source_path = os.path.join(design_dir, "design.scad")
+        openscad_str = "include <part.scad>\npart();\n"
+        with open(source_path, "w") as scad_file:
+            scad_file.write(openscad_str)
+        wrapper_file = oscad.write_wrapper_file(openscad_str, source_path)
+        with open(wrapper_file) as scad_file:
+            wrapper = scad_file.read()
+        os.remove(wrapper_file)
+        self.assertEqual(f"$fn=7;\ninclude <{source_path}>\n", wrapper)
+        # nothing to prepend
+        self.assertIsNone(
+            oscad.write_wrapper_file("//!OpenSCAD\n" + openscad_str, source_path)
+        )
+        stl_path = os.path.join(oscad.tmp_dir, "design.stl")
+        result = asyncio.run(
+            oscad.openscad_str_to_file(openscad_str, stl_path, source_path=source_path)
+        )
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertTrue(os.path.isfile(stl_path))
+        scad_files = [
+            name for name in os.listdir(oscad.tmp_dir) if name.endswith(".scad")
+        ]
+        self.assertEqual([], scad_files)
+
+    def test_content_hash(self):
+        """
+        test that comments and whitespace do not change the content hash
+        """
+        code = 'module m() { text("a , b"); }\nm();'
+        same = 'module m(){\n  // label\n  text("a , b");\n}\n/* call */ m( ) ;'
+        changed = [
+            'module m() { text("a,b"); }\nm();',
+            'modulem() { text("a , b"); }\nm();',
+            'module m() { text("a , b"); }\nm();m();',
+        ]
+        content_hash = OpenScad.content_hash(code)
+        self.assertEqual(content_hash, OpenScad.content_hash(same))
+        for other in changed:
+            self.assertNotEqual(content_hash, OpenScad.content_hash(other), other)
+
     def test_highlight_code(self):
         """
         Tests the 'highlight_code' function by checking if the output starts with
@@ -0,0 +1,82 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import os
+import tempfile
+import time
+
+from nicescad.render_cache import RenderCache
+from tests.basetest import Basetest
+
+
+class TestRenderCache(Basetest):
+    """
+    test the content addressed render cache
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.tmp_dir, "cache"))
+
+    def write_file(self, name: str, content: str) -> str:
+        """
+        write a file with the given content to the tmp dir
+        """
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_key(self):
+        """
+        test that the key depends on all parts
+        """
+        key1 = RenderCache.compute_key("cube(5);", ".stl", "2021.01")
+        key2 = RenderCache.compute_key("cube(5);", ".stl", "2021.01")
+        key3 = RenderCache.compute_key("cube(5);", ".3mf", "2021.01")
+        key4 = RenderCache.compute_key("cube(5);.stl", "", "2021.01")
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+        self.assertNotEqual(key3, key4)
+
+    def test_store_and_fetch(self):
+        """
+        test storing and fetching an entry with hit/miss counting
+        """
+        key = RenderCache.compute_key("cube(5);")
+        target = os.path.join(self.tmp_dir, "out.stl")
+        self.assertFalse(self.cache.fetch(key, ".stl", target))
+        source = self.write_file("cube.stl", "solid cube\nendsolid cube\n")
+        self.cache.store(key, ".stl", source)
+        self.assertTrue(self.cache.fetch(key, ".stl", target))
+        with open(target) as f:
+            self.assertEqual("solid cube\nendsolid cube\n", f.read())
+        stats = self.cache.stats
+        self.assertEqual(1, stats.hits)
+        self.assertEqual(1, stats.misses)
+        self.assertEqual(0.5, stats.hit_rate)
+
+    def test_eviction(self):
+        """
+        test size and age based eviction
+        """
+        self.cache.max_size = 250
+        keys = []
+        for i in range(4):
+            key = RenderCache.compute_key(f"cube({i});")
+            source = self.write_file(f"cube{i}.stl", "x" * 100)
+            path = self.cache.store(key, ".stl", source)
+            # make the order of use deterministic
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+            keys.append(key)
+        # only the two most recently used entries fit
+        self.assertIsNone(self.cache.lookup(keys[0], ".stl"))
+        self.assertIsNone(self.cache.lookup(keys[1], ".stl"))
+        self.assertIsNotNone(self.cache.lookup(keys[3], ".stl"))
+        self.cache.max_age = 10
+        self.assertIsNone(self.cache.lookup(keys[2], ".stl"))
+        self.assertEqual(1, len(self.cache.entries()))
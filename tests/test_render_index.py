@@ -0,0 +1,122 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import asyncio
+import os
+import tempfile
+
+from nicescad.openscad import OpenScad
+from nicescad.render_cache import RenderCache
+from nicescad.render_index import RenderIndex, RenderIndexEntry
+from nicescad.render_scheduler import RenderScheduler
+from tests.basetest import Basetest
+
+
+class TestRenderIndex(Basetest):
+    """
+    test prerendering designs into the render index
+    """
+
+    def write(self, path: str, content: str) -> str:
+        with open(path, "w") as scad_file:
+            scad_file.write(content)
+        return path
+
+    def test_refresh(self):
+        """
+        test prerendering, looking up and dropping designs
+        """
+        root = tempfile.mkdtemp()
+        index_dir = tempfile.mkdtemp()
+        cube = "cube(5);"
+        self.write(os.path.join(root, "cube.scad"), cube)
+        sphere_path = self.write(os.path.join(root, "sphere.scad"), "sphere(3);")
+        self.write(os.path.join(root, "broken.scad"), "syntax_error")
+        oscad = OpenScad(
+            scad_prepend="$fn=30;\n", render_cache=RenderCache(tempfile.mkdtemp())
+        )
+        index = RenderIndex(
+            oscad, [root], index_dir=index_dir, scheduler=RenderScheduler()
+        )
+        self.assertEqual(3, asyncio.run(index.refresh_async()))
+        entry = index.lookup(cube)
+        self.assertIsNotNone(entry)
+        self.assertEqual(12, entry.mesh_stats["triangle_count"])
+        self.assertTrue(os.path.isfile(index.path(entry.thumbnail_name)))
+        # effectively unchanged code is found as well
+        self.assertIs(entry, index.lookup("cube( 5 ); // the cube"))
+        self.assertIsNone(index.lookup("cube(6);"))
+        self.assertIsNone(index.lookup("syntax_error"))
+        # a new server finds the index of the last run
+        index = RenderIndex(oscad, [root], index_dir=index_dir)
+        self.assertEqual(0, asyncio.run(index.refresh_async()))
+        stl_path = os.path.join(tempfile.mkdtemp(), "view.stl")
+        paths = index.copy_to(index.lookup(cube), stl_path)
+        self.assertEqual([stl_path], paths)
+        self.assertTrue(os.path.isfile(stl_path))
+        # removed designs are dropped from the index
+        sphere_entry = index.lookup("sphere(3);")
+        os.remove(sphere_path)
+        asyncio.run(index.refresh_async())
+        self.assertIsNone(index.lookup("sphere(3);"))
+        self.assertFalse(os.path.isfile(index.path(sphere_entry.stl_name)))
+        self.assertEqual(2, len(index.entries))
+
+    def test_retry(self):
+        """
+        test that killed prerenders are retried with backoff and failures of the code are not
+        """
+        root = tempfile.mkdtemp()
+        self.write(os.path.join(root, "cube.scad"), "cube(5);")
+        index = RenderIndex(
+            OpenScad(render_cache=None), [root], index_dir=tempfile.mkdtemp()
+        )
+        key = index.key_for("cube(5);")
+        index.version = asyncio.run(index.oscad.get_version_async())
+        # e.g. a wall clock time limit hit while the server was busy
+        entry = RenderIndexEntry(
+            key=key, source_path="", error="time limit", killed=True, attempts=1
+        )
+        index.entries[key] = entry
+        self.assertFalse(index.needs_render(entry))
+        entry.rendered -= RenderIndex.RETRY_DELAY
+        self.assertTrue(index.needs_render(entry))
+        entry.attempts = 2
+        self.assertFalse(index.needs_render(entry))
+        entry.attempts = RenderIndex.MAX_ATTEMPTS
+        entry.rendered = 0
+        self.assertFalse(index.needs_render(entry))
+        entry.killed = False
+        entry.attempts = 1
+        self.assertFalse(index.needs_render(entry))
+        entry.killed = True
+        self.assertEqual(1, asyncio.run(index.refresh_async()))
+        self.assertIsNotNone(index.lookup("cube(5);"))
+
+    def test_dependencies(self):
+        """
+        test that a changed include is not served from a stale entry
+        """
+        root = tempfile.mkdtemp()
+        part_path = self.write(
+            os.path.join(root, "part.scad"), "module part() cube(1);\n"
+        )
+        design = "include <part.scad>\npart();\n"
+        design_path = self.write(os.path.join(root, "design.scad"), design)
+        oscad = OpenScad(render_cache=None)
+        index = RenderIndex(oscad, [root], index_dir=tempfile.mkdtemp())
+        asyncio.run(index.refresh_async())
+        entry = index.lookup(design)
+        self.assertIsNotNone(entry)
+        self.assertEqual(design_path, entry.source_path)
+        self.assertIs(entry, index.lookup(design, design_path))
+        # the same code in another directory includes another part
+        self.assertIsNone(index.lookup(design, os.path.join(tempfile.mkdtemp(), "x")))
+        self.write(part_path, "module part() cube([1, 2, 3]);\n")
+        self.assertIsNone(index.lookup(design))
+        asyncio.run(index.refresh_async())
+        self.assertIsNotNone(index.lookup(design))
+        self.assertNotEqual(entry.key, index.lookup(design).key)
@@ -0,0 +1,164 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import asyncio
+
+from nicescad.render_scheduler import RenderJob, RenderQueueFullError, RenderScheduler
+from tests.basetest import Basetest
+
+
+class TestRenderScheduler(Basetest):
+    """
+    test the render scheduler
+    """
+
+    def test_bounded_fair_scheduling(self):
+        """
+        test that the number of concurrent jobs is bounded and
+        that the clients are served round robin
+        """
+        scheduler = RenderScheduler(max_workers=2, max_queue_depth=10)
+        started = []
+        active = []
+        max_active = []
+
+        def job_factory(name: str):
+            async def job():
+                started.append(name)
+                active.append(name)
+                max_active.append(len(active))
+                await asyncio.sleep(0.01)
+                active.remove(name)
+                return name
+
+            return job
+
+        async def run_all():
+            jobs = []
+            for i in range(4):
+                jobs.append(scheduler.submit("a", job_factory(f"a{i}")))
+            for i in range(2):
+                jobs.append(scheduler.submit("b", job_factory(f"b{i}")))
+            # a0 and a1 are running - b0 is next
+            positions = [job.position for job in jobs]
+            self.assertEqual([0, 0, 3, 4, 1, 2], positions)
+            results = await asyncio.gather(*[job.wait() for job in jobs])
+            return jobs, results
+
+        jobs, results = asyncio.run(run_all())
+        self.assertEqual(2, max(max_active))
+        self.assertEqual(["a0", "a1", "b0", "a2", "b1", "a3"], started)
+        self.assertEqual(["a0", "a1", "a2", "a3", "b0", "b1"], results)
+        for job in jobs:
+            self.assertEqual(RenderJob.DONE, job.status)
+
+    def test_queue_full(self):
+        """
+        test that jobs are rejected when the queue is full
+        """
+        scheduler = RenderScheduler(max_workers=1, max_queue_depth=1)
+        updates = []
+
+        async def job():
+            await asyncio.sleep(0.01)
+            return True
+
+        async def run_all():
+            job1 = scheduler.submit("a", job)
+            job2 = scheduler.submit(
+                "a", job, on_update=lambda job: updates.append(job.status)
+            )
+            job3 = scheduler.submit("b", job)
+            self.assertEqual(RenderJob.RUNNING, job1.status)
+            self.assertEqual(1, job2.position)
+            self.assertEqual(RenderJob.REJECTED, job3.status)
+            with self.assertRaises(RenderQueueFullError):
+                await job3.wait()
+            await job2.wait()
+            return job2
+
+        job2 = asyncio.run(run_all())
+        self.assertEqual(RenderJob.DONE, job2.status)
+        self.assertEqual([RenderJob.QUEUED, RenderJob.RUNNING, RenderJob.DONE], updates)
+
+    def test_failing_update(self):
+        """
+        test that a failing update listener does not stall the scheduler
+        """
+        scheduler = RenderScheduler(max_workers=1)
+
+        def on_update(job: RenderJob):
+            raise ValueError("ui gone")
+
+        async def job():
+            await asyncio.sleep(0.01)
+            return True
+
+        async def run_all():
+            job1 = scheduler.submit("a", job, on_update=on_update)
+            job2 = scheduler.submit("b", job, on_update=on_update)
+            results = await asyncio.wait_for(
+                asyncio.gather(job1.wait(), job2.wait()), timeout=1
+            )
+            return results
+
+        with self.assertLogs("nicescad.render_scheduler", level="ERROR"):
+            results = asyncio.run(run_all())
+        self.assertEqual([True, True], results)
+        self.assertEqual(0, scheduler.running_count)
+
+    def test_cancel(self):
+        """
+        test cancelling waiting and running jobs
+        """
+        scheduler = RenderScheduler(max_workers=1)
+
+        async def job():
+            await asyncio.sleep(10)
+
+        async def run_all():
+            job1 = scheduler.submit("a", job)
+            job2 = scheduler.submit("a", job)
+            job3 = scheduler.submit("b", job)
+            # b has no running job yet and goes first
+            self.assertEqual(2, job2.position)
+            self.assertTrue(scheduler.cancel(job3))
+            self.assertEqual(RenderJob.CANCELLED, job3.status)
+            self.assertEqual(1, job2.position)
+            self.assertEqual(2, scheduler.cancel_client("a"))
+            for cancelled_job in [job1, job2, job3]:
+                with self.assertRaises(asyncio.CancelledError):
+                    await cancelled_job.wait()
+            return job1, job2
+
+        job1, job2 = asyncio.run(run_all())
+        self.assertEqual(RenderJob.CANCELLED, job1.status)
+        self.assertEqual(RenderJob.CANCELLED, job2.status)
+        self.assertEqual(0, scheduler.running_count)
+
+    def test_cancelled_waiter(self):
+        """
+        test that a job whose waiter has been cancelled still frees its worker
+        """
+        scheduler = RenderScheduler(max_workers=1)
+
+        async def job():
+            await asyncio.sleep(0.05)
+            return True
+
+        async def run_all():
+            job1 = scheduler.submit("a", job)
+            waiter = asyncio.ensure_future(job1.wait())
+            await asyncio.sleep(0.01)
+            # e.g. a client disconnect or a superseded live render
+            waiter.cancel()
+            await asyncio.sleep(0.1)
+            self.assertEqual(RenderJob.DONE, job1.status)
+            self.assertEqual(0, scheduler.running_count)
+            result = await asyncio.wait_for(scheduler.run("b", job), timeout=1)
+            return result
+
+        self.assertTrue(asyncio.run(run_all()))
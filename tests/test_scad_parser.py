@@ -0,0 +1,159 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import glob
+import os
+
+from nicescad.scad_parser import (
+    Assignment,
+    FunctionDef,
+    IfStatement,
+    Include,
+    Instantiation,
+    ModuleDef,
+    ScadParser,
+    split_chunks,
+    tokenize,
+)
+from tests.basetest import Basetest
+
+
+class TestScadParser(Basetest):
+    """
+    test the OpenSCAD parser and its outline index
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        examples_path = os.path.join(
+            os.path.dirname(__file__), "..", "nicescad_examples"
+        )
+        self.scad_files = sorted(
+            glob.glob(f"{examples_path}/**/*.scad", recursive=True)
+        )
+
+    def test_tokenize(self):
+        """
+        test tokens, comments and line numbers
+        """
+        tokens = tokenize('use <lib.scad>\n/* a\nb */ x = 8bit(1e5, "s\\"");')
+        kinds = [(kind, value) for kind, value, _line in tokens]
+        self.assertEqual(("include", "use <lib.scad>"), kinds[0])
+        self.assertIn(("ident", "8bit"), kinds)
+        self.assertIn(("number", "1e5"), kinds)
+        self.assertIn(("string", '"s\\""'), kinds)
+        self.assertEqual(2, tokens[1][2])
+
+    def test_split_chunks(self):
+        """
+        test splitting at the ends of top level statements
+        """
+        code = """include <a.scad>
+module m() { cube(1); }
+if (a) { m(); } else { sphere(1); }
+x = [1, 2]; translate([0,0,1]) m();
+/* ; { */ echo("}");
+cube("""
+        chunks = list(split_chunks(code))
+        self.assertEqual(code, "".join(chunks))
+        self.assertEqual(7, len(chunks))
+        self.assertTrue(chunks[2].strip().endswith("{ sphere(1); }"))
+
+    def test_parse(self):
+        """
+        test the syntax tree of a small design
+        """
+        code = """// demo
+use <MCAD/shapes.scad>
+size = 10;
+function half(x) = x / 2;
+module box(s = size) {
+    difference() {
+        cube(s, center = true);
+        #sphere(half(s) * 1.2);
+    }
+    for (i = [0:2:6]) translate([i, 0, 0]) box2();
+}
+if (size > 5) box(); else cube(1);
+v = [for (i = [1:3]) if (i % 2 == 1) let(j = i ^ 2) j];
+f = function(x) x < 0 ? -x : x;
+"""
+        result = ScadParser().parse(code)
+        self.assertTrue(result.ok, [str(error) for error in result.errors])
+        statements = result.statements
+        self.assertIsInstance(statements[0], Include)
+        self.assertEqual("MCAD/shapes.scad", statements[0].path)
+        self.assertIsInstance(statements[1], Assignment)
+        self.assertIsInstance(statements[2], FunctionDef)
+        box = statements[3]
+        self.assertIsInstance(box, ModuleDef)
+        self.assertEqual(5, box.line)
+        self.assertEqual("s", box.params[0].name)
+        difference = box.body[0]
+        self.assertIsInstance(difference, Instantiation)
+        self.assertEqual("#", difference.children[1].modifiers)
+        self.assertIsInstance(statements[4], IfStatement)
+        self.assertEqual(12, statements[4].line)
+        outline = result.outline
+        self.assertEqual(
+            {"size": 3, "half": 4, "box": 5, "v": 13, "f": 14},
+            outline.symbol_lines(),
+        )
+        self.assertEqual(
+            {"difference", "cube", "sphere", "translate", "box2"},
+            outline.calls["box"],
+        )
+        self.assertEqual({"box", "cube"}, outline.calls[""])
+        self.assertEqual([("use", "MCAD/shapes.scad")], outline.dependencies())
+
+    def test_errors(self):
+        """
+        test that syntax errors are reported with their line and the rest is still parsed
+        """
+        code = "cube(1);\nsphere(1;\nmodule ok() {\n  cube(;\n  sphere(2);\n}\n"
+        result = ScadParser().parse(code)
+        self.assertEqual([2, 4], [error.line for error in result.errors])
+        self.assertIn("expected ')'", str(result.errors[0]))
+        module = result.outline.find("ok")[0].node
+        self.assertEqual(["sphere"], [child.name for child in module.body])
+        # an unclosed bracket must not swallow the following definitions
+        code = "cube(1 2, [3;\nmodule wheel() {\n  cylinder(1);\n}\nwheel();\n"
+        result = ScadParser().parse(code)
+        self.assertEqual([1], [error.line for error in result.errors])
+        self.assertEqual(2, result.outline.find("wheel")[0].line)
+
+    def test_incremental(self):
+        """
+        test that unchanged chunks are reused and their lines follow the edit
+        """
+        parser = ScadParser()
+        code = "module a() cube(1);\nmodule b() a();\nb();\n"
+        parser.parse(code)
+        misses = parser.misses
+        result = parser.parse("// header\n\n" + code)
+        self.assertEqual(misses + 1, parser.misses)
+        self.assertEqual(4, result.outline.find("b")[0].line)
+        self.assertEqual({"a"}, result.outline.calls["b"])
+
+    def test_examples(self):
+        """
+        test parsing the bundled examples
+        """
+        parser = ScadParser()
+        broken = 0
+        for scad_file in self.scad_files:
+            with open(scad_file) as f:
+                code = f.read()
+            result = parser.parse(code)
+            lines = code.split("\n")
+            for symbol in result.outline.symbols:
+                self.assertIn(symbol.name, lines[symbol.line - 1])
+            if not result.ok:
+                broken += 1
+                if self.debug:
+                    print(scad_file, [str(error) for error in result.errors])
+        # a few examples are broken e.g. by html escaping
+        self.assertLessEqual(broken, 3)
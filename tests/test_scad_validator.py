@@ -0,0 +1,96 @@
+"""
+Created on 2026-10-17
+
+@author: wf
+"""
+
+import os
+import tempfile
+import time
+
+from nicescad.dependencies import DependencyGraph
+from nicescad.scad_validator import ScadValidator
+from tests.basetest import Basetest
+
+
+class TestScadValidator(Basetest):
+    """
+    test the static checks before rendering
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.validator = ScadValidator(DependencyGraph(library_paths=[]))
+
+    def kinds(self, code: str, **kwargs):
+        issues = self.validator.validate(code, self.tmp_dir, **kwargs)
+        if self.debug:
+            print([str(issue) for issue in issues])
+        return [(issue.line, issue.kind) for issue in issues]
+
+    def test_valid(self):
+        """
+        test that valid code passes
+        """
+        code = """module ring(r) { difference() { circle(r); circle(r - 1); } }
+linear_extrude(2) ring(5);
+for (i = [0:3]) translate([i * 10, 0, 0]) children();
+"""
+        self.assertEqual([], self.kinds(code))
+
+    def test_brackets_and_syntax(self):
+        """
+        test unbalanced brackets and syntax errors with their lines
+        """
+        self.assertEqual([(2, "brackets")], self.kinds("cube(1);\nmodule m() {\n"))
+        self.assertEqual([(2, "brackets")], self.kinds('echo("{");\n}'))
+        self.assertEqual([(3, "syntax")], self.kinds("a = 1;\n\nb = a +;\n"))
+        self.assertIn((2, "brackets"), self.kinds("x = [1,\n2);\n// ( in a comment\n"))
+
+    def test_modules_and_includes(self):
+        """
+        test unknown modules and missing include files
+        """
+        self.assertEqual([(2, "unknown_module")], self.kinds("cube(1);\nwheel(2);"))
+        # the prelude that is prepended when rendering defines wheel
+        self.assertEqual([], self.kinds("wheel(2);", prelude="module wheel(r) {}"))
+        self.assertEqual(
+            [(1, "missing_include")], self.kinds("use <parts.scad>\nwheel(2);")
+        )
+        with open(os.path.join(self.tmp_dir, "parts.scad"), "w") as scad_file:
+            scad_file.write("include <base.scad>\nmodule wheel(r) { base(); }\n")
+        with open(os.path.join(self.tmp_dir, "base.scad"), "w") as scad_file:
+            scad_file.write("module base() cube(1);\n")
+        self.assertEqual([], self.kinds("use <parts.scad>\nwheel(2);\nbase();"))
+        self.assertEqual(
+            [(3, "unknown_module")],
+            self.kinds("use <parts.scad>\nwheel(2);\naxle();"),
+        )
+
+    def test_syntax_error_before_module(self):
+        """
+        test that a syntax error does not hide the module defined after it
+        """
+        code = "x = 1 [2, (3;\nmodule wheel() cube(1);\nwheel();\n"
+        kinds = [kind for _line, kind in self.kinds(code)]
+        self.assertTrue(kinds)
+        self.assertNotIn("unknown_module", kinds)
+
+    def test_speed(self):
+        """
+        test that checking a large design takes milliseconds
+        """
+        code = "\n".join(
+            f"module m{i}(r = {i}) {{ translate([{i}, 0, 0]) cylinder(r = r, h = 2); }}\nm{i}();"
+            for i in range(1000)
+        )
+        start = time.time()
+        self.assertEqual([], self.kinds(code))
+        first = time.time() - start
+        start = time.time()
+        self.assertEqual([(2001, "syntax")], self.kinds(code + "\na = 1 +;"))
+        again = time.time() - start
+        if self.debug:
+            print(f"{first*1000:.1f} ms - after an edit {again*1000:.1f} ms")
+        self.assertLess(again, 0.5)
@@ -4,12 +4,27 @@ Created on 2023-07-30
 @author: wf
 """
 
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
 
 import nicescad as nicescad
-from nicescad.solidservice import FastAPIServer, SolidConverter
+from nicescad.solid_executor import (
+    ConversionError,
+    ConversionTimeoutError,
+    SolidExecutor,
+    resource,
+)
+from nicescad.solidservice import FastAPIServer, RenderItem, SolidConverter
 from tests.basetest import Basetest
 
 
@@ -76,7 +91,7 @@ class TestSolidConverter(Basetest):
         Test whether the FastAPI endpoint returns the expected OpenSCAD code for a
         given Python code input.
         """
-        self.server = FastAPIServer()
+        self.server = FastAPIServer(job_dir=tempfile.mkdtemp())
         self.client = TestClient(self.server.app)
         if not self.check_server():
             print("Server not available")
@@ -94,6 +109,286 @@ class TestSolidConverter(Basetest):
 
         self.assertEqual(received_openscad_code, expected_openscad_code)
 
+        response = self.client.post("/convert/", json={"python_code": "cube(10"})
+        self.assertEqual(400, response.status_code)
+        # the same code again is a cache hit
+        response = self.client.post("/convert/", json={"python_code": python_code})
+        self.assertEqual(200, response.status_code)
+        stats = self.client.get("/stats/").json()["conversion_cache"]
+        if self.debug:
+            print(stats)
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(2, stats["misses"])
+        self.assertEqual(1, stats["size"])
+        self.server.executor.shutdown()
+
+    def test_batch(self):
+        """
+        test converting many Python sources in one round trip
+        """
+        server = FastAPIServer(SolidExecutor(max_workers=2), job_dir=tempfile.mkdtemp())
+        codes = [f"cube({i})" for i in range(20)]
+        codes.extend(["cube(3)", "cube(", "sphere(2)"])
+        items = [{"python_code": code} for code in codes]
+        with TestClient(server.app) as client:
+            response = client.post("/convert/batch", json={"items": items})
+            self.assertEqual(200, response.status_code)
+            results = response.json()["results"]
+            self.assertEqual(len(codes), len(results))
+            self.assertEqual(list(range(len(codes))), [r["index"] for r in results])
+            self.assertEqual(
+                "cube(size=3);", "".join(results[20]["openscad_code"].split())
+            )
+            self.assertEqual(400, results[21]["status_code"])
+            self.assertIn("error", results[21])
+            # streamed as newline delimited json
+            response = client.post(
+                "/convert/batch", json={"items": items, "stream": True}
+            )
+            self.assertEqual(200, response.status_code)
+            self.assertIn("application/x-ndjson", response.headers["content-type"])
+            records = [json.loads(line) for line in response.text.splitlines()]
+            self.assertEqual(len(codes), len(records))
+            records.sort(key=lambda record: record["index"])
+            self.assertEqual(results, records)
+            # all but the failing item are cache hits now
+            stats = client.get("/stats/").json()["conversion_cache"]
+            self.assertEqual(len(codes) - 2, stats["hits"])
+            server.max_batch_size = 10
+            response = client.post("/convert/batch", json={"items": items})
+            self.assertEqual(413, response.status_code)
+
+    def test_render(self):
+        """
+        test rendering SolidPython and OpenSCAD code in one round trip
+        """
+        server = FastAPIServer(SolidExecutor(max_workers=1), job_dir=tempfile.mkdtemp())
+        try:
+            server.get_openscad()
+        except HTTPException:
+            print("openscad not available")
+            return
+        with TestClient(server.app) as client:
+            for source in [
+                {"scad_code": "cube(10);"},
+                {"python_code": "cube(10)"},
+            ]:
+                response = client.post("/render/", json=source)
+                self.assertEqual(200, response.status_code)
+                self.assertEqual("model/stl", response.headers["content-type"])
+                stl = response.content
+                triangle_count = int.from_bytes(stl[80:84], "little")
+                # a binary stl
+                self.assertEqual(84 + 50 * triangle_count, len(stl))
+            response = client.post(
+                "/render/", json={"scad_code": "cube(10);", "format": "asciistl"}
+            )
+            self.assertEqual(200, response.status_code)
+            self.assertTrue(response.text.startswith("solid"))
+            # rejected by the static checks without running openscad
+            response = client.post("/render/", json={"scad_code": "syntax_error"})
+            self.assertEqual(400, response.status_code)
+            issues = response.json()["detail"]["issues"]
+            self.assertEqual("syntax", issues[0]["kind"])
+            self.assertEqual(1, issues[0]["line"])
+            # relative includes never resolve - not even to other scratch files
+            helper_path = os.path.join(server.get_openscad().tmp_dir, "helper.scad")
+            with open(helper_path, "w") as scad_file:
+                scad_file.write("module helper() cube(1);\n")
+            response = client.post(
+                "/render/", json={"scad_code": "include <helper.scad>\nhelper();"}
+            )
+            os.remove(helper_path)
+            self.assertEqual(400, response.status_code)
+            issues = response.json()["detail"]["issues"]
+            self.assertEqual("missing_include", issues[0]["kind"])
+            # fails when rendered
+            response = client.post(
+                "/render/", json={"scad_code": 'assert(false, "syntax_error");'}
+            )
+            self.assertEqual(400, response.status_code)
+            self.assertIn("stderr", response.json()["detail"])
+            response = client.post(
+                "/render/", json={"scad_code": "cube(10);", "format": "gltf"}
+            )
+            self.assertEqual(400, response.status_code)
+
+    def test_render_client_gone(self):
+        """
+        test that the render slot is freed if the client is gone before the body is sent
+        """
+        server = FastAPIServer(
+            SolidExecutor(max_workers=1), max_renders=1, job_dir=tempfile.mkdtemp()
+        )
+        try:
+            server.get_openscad()
+        except HTTPException:
+            print("openscad not available")
+            return
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(_message):
+            raise OSError("connection reset")
+
+        async def render_and_disconnect():
+            response = await server.render(RenderItem(scad_code="cube(10);"))
+            self.assertTrue(server.render_semaphore.locked())
+            scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+            with self.assertRaises(ClientDisconnect):
+                await response(scope, receive, send)
+            self.assertFalse(server.render_semaphore.locked())
+
+        asyncio.run(render_and_disconnect())
+
+    def test_jobs(self):
+        """
+        test the headless job api with polling and a local callback
+        """
+        callbacks = []
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                callbacks.append(json.loads(self.rfile.read(length)))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        httpd = HTTPServer(("127.0.0.1", 0), CallbackHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        callback_url = f"http://127.0.0.1:{httpd.server_port}/done"
+        job_dir = os.path.join(tempfile.mkdtemp(), "jobs")
+        server = FastAPIServer(SolidExecutor(max_workers=1), job_dir=job_dir)
+        # the job database is only created for the first job
+        self.assertFalse(os.path.exists(job_dir))
+        try:
+            server.get_openscad()
+        except HTTPException:
+            print("openscad not available")
+            return
+        with TestClient(server.app) as client:
+            response = client.post(
+                "/jobs/",
+                json={"python_code": "cube(10)", "callback_url": callback_url},
+            )
+            self.assertEqual(202, response.status_code)
+            job_id = response.json()["job_id"]
+            failing_id = client.post(
+                "/jobs/", json={"scad_code": 'assert(false, "syntax_error");'}
+            ).json()["job_id"]
+            self.assertTrue(os.path.isfile(os.path.join(job_dir, "jobs.db")))
+            broken_id = client.post("/jobs/", json={"python_code": "cube("}).json()[
+                "job_id"
+            ]
+            response = client.post("/jobs/", json={"scad_code": "cube(1;"})
+            self.assertEqual(400, response.status_code)
+            states = {}
+            for _ in range(100):
+                for poll_id in [job_id, failing_id, broken_id]:
+                    states[poll_id] = client.get(f"/jobs/{poll_id}").json()
+                if all(
+                    state["status"] in ("done", "failed") for state in states.values()
+                ):
+                    break
+                time.sleep(0.05)
+            self.assertEqual("done", states[job_id]["status"])
+            self.assertEqual("failed", states[failing_id]["status"])
+            # the status of a rejected conversion is kept
+            self.assertEqual("failed", states[broken_id]["status"])
+            self.assertTrue(states[broken_id]["error"].startswith("400: "))
+            response = client.get(f"/jobs/{job_id}/result")
+            self.assertEqual(200, response.status_code)
+            self.assertEqual("model/stl", response.headers["content-type"])
+            self.assertEqual(409, client.get(f"/jobs/{failing_id}/result").status_code)
+            self.assertEqual(404, client.get("/jobs/unknown").status_code)
+            response = client.post(
+                "/jobs/",
+                json={"scad_code": "cube(1);", "callback_url": "http://example.com/"},
+            )
+            self.assertEqual(400, response.status_code)
+            # a job that is still rendering can be cancelled
+            started = threading.Event()
+
+            async def run_blocking_job(job, result_path, on_progress):
+                started.set()
+                await asyncio.Event().wait()
+
+            server.job_service.run_job = run_blocking_job
+            slow_id = client.post("/jobs/", json={"scad_code": "cube(1);"}).json()[
+                "job_id"
+            ]
+            self.assertTrue(started.wait(timeout=5))
+            self.assertEqual(
+                "cancelled", client.delete(f"/jobs/{slow_id}").json()["status"]
+            )
+        httpd.shutdown()
+        self.assertEqual(1, len(callbacks))
+        self.assertEqual(job_id, callbacks[0]["job_id"])
+        self.assertEqual("done", callbacks[0]["status"])
+
+    def test_executor(self):
+        """
+        test the pooled and resource limited conversion
+        """
+        executor = SolidExecutor(max_workers=2, timeout=1.0)
+
+        async def convert_all():
+            codes = [f"cube({i})" for i in range(1, 5)]
+            codes.extend(
+                [
+                    "undefined_name(1)",
+                    "__import__('os').getcwd()",
+                    "max(x for x in range(10**12))",
+                ]
+            )
+            results = await asyncio.gather(
+                *[executor.convert_async(code) for code in codes],
+                return_exceptions=True,
+            )
+            return results
+
+        try:
+            results = asyncio.run(convert_all())
+        finally:
+            executor.shutdown()
+        if self.debug:
+            for result in results:
+                print(repr(result))
+        for i, result in enumerate(results[:4]):
+            self.assertEqual(f"cube(size={i+1});", "".join(result.split()))
+        self.assertIsInstance(results[4], ConversionError)
+        # no import and other unsafe builtins
+        self.assertIsInstance(results[5], ConversionError)
+        self.assertIsInstance(results[6], ConversionTimeoutError)
+
+    def test_executor_restart(self):
+        """
+        test that a failed pool is only replaced once and that the cpu time is limited per job
+        """
+        executor = SolidExecutor(max_workers=1, timeout=2.0)
+        try:
+            failed = executor.start()
+            executor.restart(failed)
+            replaced = executor.executor
+            self.assertIsNot(failed, replaced)
+            # another conversion of the failed pool reports its failure
+            executor.restart(failed)
+            self.assertIs(replaced, executor.executor)
+            code = asyncio.run(executor.convert_async("cube(1)"))
+            self.assertIn("cube", code)
+            if resource is not None:
+                future = replaced.submit(resource.getrlimit, resource.RLIMIT_CPU)
+                soft, _hard = future.result()
+                # relative to the little cpu time the worker has used so far
+                self.assertNotEqual(resource.RLIM_INFINITY, soft)
+                self.assertLess(soft, 60)
+        finally:
+            executor.shutdown()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,7 +4,15 @@ Created on 2023-07-24
 @author: wf
 """
 
-from nicescad.process import Subprocess
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from nicescad.process import ResourceLimits, Subprocess
 from tests.basetest import Basetest
 
 
@@ -24,3 +32,122 @@ class TestSubprocess(Basetest):
         if debug:
             print(subprocess)
         self.assertEqual(0, subprocess.returncode)
+
+    def test_timeout(self):
+        """
+        test that a process exceeding its wall clock time limit is killed
+        """
+        cmd = [sys.executable, "-c", "import time; time.sleep(10)"]
+        start = time.time()
+        subprocess = Subprocess.run(cmd, limits=ResourceLimits(timeout=0.5))
+        self.assertLess(time.time() - start, 5)
+        self.assertTrue(subprocess.killed)
+        self.assertIn("wall clock", subprocess.kill_reason)
+        self.assertNotEqual(0, subprocess.returncode)
+
+    def test_cpu_limit(self):
+        """
+        test that a process exceeding its cpu time limit is killed
+        """
+        if sys.platform == "win32":
+            return
+        cmd = [sys.executable, "-c", "while True: pass"]
+        limits = ResourceLimits(timeout=10, cpu_time=1)
+        subprocess = Subprocess.run(cmd, limits=limits)
+        self.assertTrue(subprocess.killed)
+        self.assertIn("cpu time", subprocess.kill_reason)
+
+    def test_kill_reason(self):
+        """
+        test that only an actual allocation failure is reported as exceeded memory limit
+        """
+        limits = ResourceLimits(memory=2**32)
+        if sys.platform != "win32":
+            reason = limits.kill_reason(-signal.SIGSEGV, "")
+            self.assertEqual("terminated by signal SIGSEGV", reason)
+            reason = limits.kill_reason(-signal.SIGABRT, "std::bad_alloc")
+            self.assertIn("memory limit", reason)
+        self.assertIsNone(limits.kill_reason(1, "ERROR: syntax error"))
+
+    def test_cancel(self):
+        """
+        test that cancelling the awaiting task kills the process
+        """
+        cmd = [sys.executable, "-c", "import time; time.sleep(10)"]
+
+        async def run_and_cancel():
+            task = asyncio.create_task(Subprocess.run_async(cmd))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        start = time.time()
+        asyncio.run(run_and_cancel())
+        self.assertLess(time.time() - start, 5)
+
+    def test_streaming(self):
+        """
+        test that output lines are streamed while the process is running
+        """
+        script = """
+import sys, time
+for i in range(3):
+    print(f"line {i}", flush=True)
+    sys.stderr.write(f"progress {i}\\n")
+    sys.stderr.flush()
+    time.sleep(0.2)
+"""
+        cmd = [sys.executable, "-c", script]
+        stdout_lines = []
+        stderr_times = []
+        start = time.time()
+        subprocess = Subprocess.run(
+            cmd,
+            on_stdout=stdout_lines.append,
+            on_stderr=lambda line: stderr_times.append(time.time() - start),
+        )
+        elapsed = time.time() - start
+        self.assertEqual(0, subprocess.returncode)
+        self.assertEqual(["line 0\n", "line 1\n", "line 2\n"], stdout_lines)
+        self.assertEqual("".join(stdout_lines), subprocess.stdout)
+        self.assertEqual(3, len(stderr_times))
+        # the first line arrived well before the process finished
+        self.assertLess(stderr_times[0], elapsed - 0.3)
+
+    def test_umask(self):
+        """
+        test that the umask is applied - with the uvloop event loop of the webserver as well
+        """
+        work_dir = tempfile.mkdtemp()
+        cmd = [sys.executable, "-c", "open('result.txt', 'w').close()"]
+        loop_factories = [asyncio.new_event_loop]
+        try:
+            import uvloop
+
+            loop_factories.append(uvloop.new_event_loop)
+        except ImportError:
+            pass
+        for loop_factory in loop_factories:
+            loop = loop_factory()
+            try:
+                result = loop.run_until_complete(
+                    Subprocess.run_async(cmd, umask=0o077, cwd=work_dir)
+                )
+            finally:
+                loop.close()
+            self.assertEqual(0, result.returncode, result.stderr)
+            path = os.path.join(work_dir, "result.txt")
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            os.remove(path)
+
+    def test_preexec_fn_windows(self):
+        """
+        test that no preexec function is used where it is not supported
+        """
+        limits = ResourceLimits(cpu_time=10, memory=2**32)
+        with patch.object(os, "name", "nt"):
+            self.assertIsNone(Subprocess.preexec_fn(limits, 0o077))
+        self.assertIsNone(Subprocess.preexec_fn(ResourceLimits(), None))
+        if os.name == "posix":
+            self.assertIsNotNone(Subprocess.preexec_fn(None, 0o077))